@@ -0,0 +1,41 @@
+"""
+Standalone performance benchmarks for MemVault.
+
+Each module is runnable with ``python -m benchmarks.<name>`` from the project
+root and sets up Django itself.
+"""
+
+import os
+
+
+def setup_django():
+    """Configure Django so benchmarks can use the project's models and code."""
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "memvault.settings")
+    django.setup()
+
+
+class test_database:
+    """
+    Context manager running a benchmark against a throwaway test database.
+
+    Uses Django's test database creation, so the configured database is
+    never touched.
+    """
+
+    def __enter__(self):
+        from django.db import connection
+        from django.test.utils import setup_test_environment
+
+        setup_test_environment()
+        self.old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0)
+        return self
+
+    def __exit__(self, *exc_info):
+        from django.db import connection
+        from django.test.utils import teardown_test_environment
+
+        connection.creation.destroy_test_db(self.old_name, verbosity=0)
+        teardown_test_environment()
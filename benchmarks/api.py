@@ -0,0 +1,206 @@
+"""
+Benchmark the API endpoints against a seeded dataset.
+
+Usage:
+    python -m benchmarks.api [--scale small|medium|large] [--iterations 50]
+                             [--save-baseline FILE] [--baseline FILE]
+                             [--tolerance 0.2] [--only SCENARIO ...]
+
+Seeds a throwaway test database (see benchmarks.seed), then runs each
+scripted scenario through the full middleware, authentication and
+permission stack and reports its latency percentiles and query count.
+--save-baseline writes the results as JSON. --baseline compares against
+such a file and exits with status 1 when a scenario runs more queries, or
+its median latency grows by more than --tolerance.
+"""
+
+import argparse
+import json
+import sys
+import time
+from itertools import count
+
+from . import setup_django, test_database
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from memories.concurrency import percentile  # noqa: E402
+from memories.models import OrganizationMemory, TeamMemory, UserMemory  # noqa: E402
+
+from .seed import SCALES, seed  # noqa: E402
+
+_unique = count()
+
+
+def unique(prefix):
+    return f"{prefix} {next(_unique)}"
+
+
+def get_scenarios(dataset):
+    """
+    Return the scenarios as (name, method, path, payload factory or None).
+
+    Paths are for the dataset's first user, who administers its first
+    organization and is a member of that organization's first team.
+    """
+    user, team = dataset["user"], dataset["team"]
+    organization = dataset["organization"]
+    user_memory = UserMemory.objects.filter(user=user).values_list("pk", flat=True)[0]
+    team_memory = TeamMemory.objects.filter(team=team).values_list("pk", flat=True)[0]
+    organization_memory = OrganizationMemory.objects.filter(
+        organization=organization
+    ).values_list("pk", flat=True)[0]
+
+    memories = "/api/memories"
+    teams = f"/api/user/organizations/{organization.pk}/teams"
+    return [
+        ("user_memory_list", "get", f"{memories}/users/me/", None),
+        (
+            "user_memory_create",
+            "post",
+            f"{memories}/users/me/",
+            lambda: {"content": unique("Benchmark memory")},
+        ),
+        ("user_memory_detail", "get", f"{memories}/users/me/{user_memory}/", None),
+        ("team_memory_list", "get", f"{memories}/teams/{team.pk}/", None),
+        (
+            "team_memory_create",
+            "post",
+            f"{memories}/teams/{team.pk}/",
+            lambda: {"content": unique("Benchmark memory")},
+        ),
+        (
+            "team_memory_detail",
+            "get",
+            f"{memories}/teams/{team.pk}/{team_memory}/",
+            None,
+        ),
+        (
+            "team_memory_update",
+            "patch",
+            f"{memories}/teams/{team.pk}/{team_memory}/",
+            lambda: {"content": unique("Benchmark edit")},
+        ),
+        (
+            "organization_memory_list",
+            "get",
+            f"{memories}/orgs/{organization.pk}/",
+            None,
+        ),
+        (
+            "organization_memory_detail",
+            "get",
+            f"{memories}/orgs/{organization.pk}/{organization_memory}/",
+            None,
+        ),
+        ("user_organizations", "get", "/api/user/organizations/", None),
+        ("team_list", "get", f"{teams}/", None),
+        (
+            "team_create",
+            "post",
+            f"{teams}/",
+            lambda: {"name": unique("Benchmark team")},
+        ),
+        ("team_detail", "get", f"{teams}/{team.pk}/", None),
+        ("team_members", "get", f"{teams}/{team.pk}/members/", None),
+    ]
+
+
+def run_scenario(client, method, path, payload, iterations, warmup=3):
+    """
+    Request a path repeatedly. Returns its latency percentiles and queries.
+
+    Fails on any error response, so a broken scenario is not timed.
+    """
+    latencies, queries = [], 0
+    for iteration in range(warmup + iterations):
+        data = payload() if payload else None
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = getattr(client, method)(path, data, format="json")
+            elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f"{method.upper()} {path} returned {response.status_code}: "
+                f"{response.content[:200]!r}"
+            )
+        if iteration >= warmup:
+            latencies.append(elapsed)
+            queries = max(queries, len(captured))
+    return {
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "queries": queries,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print the change against a baseline. Returns the regressed scenarios."""
+    regressions = []
+    print(f"\n{'scenario':<28} {'p50 ms':>8} {'base':>8} {'change':>7} {'queries':>12}")
+    for name, result in results.items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        change = result["p50_ms"] / base["p50_ms"] - 1 if base["p50_ms"] else 0.0
+        regressed = change > tolerance or result["queries"] > base["queries"]
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:<28} {result['p50_ms']:>8.2f} {base['p50_ms']:>8.2f} "
+            f"{change:>+7.0%} {base['queries']:>5} -> {result['queries']:<4}"
+            f"{'  REGRESSED' if regressed else ''}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--only", nargs="+", help="run only these scenarios")
+    parser.add_argument("--save-baseline", metavar="FILE")
+    parser.add_argument("--baseline", metavar="FILE")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with test_database():
+        start = time.perf_counter()
+        dataset = seed(**SCALES[args.scale])
+        print(f"Seeded the {args.scale} dataset in {time.perf_counter() - start:.1f}s")
+
+        client = APIClient(HTTP_X_API_KEY=dataset["api_key"])
+        results = {}
+        print(f"{'scenario':<28} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8}")
+        for name, method, path, payload in get_scenarios(dataset):
+            if args.only and name not in args.only:
+                continue
+            result = run_scenario(client, method, path, payload, args.iterations)
+            results[name] = result
+            print(
+                f"{name:<28} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                f"{result['queries']:>8}"
+            )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump(
+                {"scale": args.scale, "scenarios": results}, baseline_file, indent=2
+            )
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline["scale"] != args.scale:
+            print(
+                f"Warning: the baseline was recorded at the {baseline['scale']} scale"
+            )
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
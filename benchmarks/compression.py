@@ -0,0 +1,82 @@
+"""
+Benchmark memory content compression: storage size versus CPU cost.
+
+Usage:
+    python -m benchmarks.compression [--iterations 200]
+
+For synthetic transcripts of increasing size, reports the stored size ratio
+and the encode/decode time per memory for each available codec.
+"""
+
+import argparse
+import random
+import time
+
+from . import setup_django
+
+setup_django()
+
+from django.test import override_settings  # noqa: E402
+
+from memories.compression import CODECS, encode_content, decode_content  # noqa: E402
+
+SIZES = [512, 4 * 1024, 32 * 1024, 256 * 1024]
+
+WORDS = (
+    "user assistant memory prefers meeting project deadline team review "
+    "notes follow up tomorrow schedule coffee python deploy budget report "
+    "customer feedback design roadmap quarter launch bug fix release"
+).split()
+
+
+def make_transcript(size, seed=0):
+    """Build a chat-like transcript of roughly size characters."""
+    rng = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        role = rng.choice(["user", "assistant"])
+        line = f"{role}: " + " ".join(
+            rng.choice(WORDS) for _ in range(rng.randint(5, 25))
+        )
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)[:size]
+
+
+def time_per_call(func, value, iterations):
+    """Return the mean wall time of func(value) in microseconds."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(value)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    print(
+        f"{'codec':<6} {'size':>8} {'stored':>8} {'ratio':>6} "
+        f"{'encode us':>10} {'decode us':>10}"
+    )
+    for codec in CODECS:
+        with override_settings(
+            MEMORY_CONTENT_COMPRESSION_THRESHOLD=1,
+            MEMORY_CONTENT_COMPRESSION_CODEC=codec,
+        ):
+            for size in SIZES:
+                text = make_transcript(size)
+                stored = encode_content(text)
+                encode_us = time_per_call(encode_content, text, args.iterations)
+                decode_us = time_per_call(decode_content, stored, args.iterations)
+                print(
+                    f"{codec:<6} {size:>8} {len(stored):>8} "
+                    f"{len(stored) / len(text):>6.2f} "
+                    f"{encode_us:>10.1f} {decode_us:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Local stand-in for the mem0 platform API, for load tests and benchmarks.
+
+Usage:
+    python -m benchmarks.fake_mem0 [--port 8888] [--latency 0.2] [--jitter 0.05]
+                                   [--error-rate 0.0] [--rate-limit 0]
+
+Serves the endpoints MemVault uses (ping, add, update, delete, search, batch
+update and batch delete) from memory, with configurable latency, error rate
+and rate limit. Point MemVault at it with MEM0_HOST=http://localhost:8888
+and any MEM0_API_KEY. GET /stats returns the calls served so far.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MEMORY_PATH = re.compile(r"^/v1/memories/(?P<memory_id>[^/]+)/$")
+SEARCH_PATH = re.compile(r"^/v[12]/memories/search/$")
+
+# mem0 rejects batch calls over this many memories
+MAX_BATCH_SIZE = 1000
+
+
+class FakeMem0:
+    """In-memory mem0 state with latency, errors and a rate limit."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.memories = {}
+        self.stats = {"calls": {}, "errors": 0, "throttled": 0}
+        self.lock = threading.Lock()
+        # Token bucket holding one second of requests
+        self.tokens = float(rate_limit)
+        self.refilled_at = time.monotonic()
+
+    def throttle(self):
+        """Take a request from the rate limit. Returns the seconds to retry after."""
+        if not self.rate_limit:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.rate_limit,
+                self.tokens + (now - self.refilled_at) * self.rate_limit,
+            )
+            self.refilled_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            self.stats["throttled"] += 1
+            return (1 - self.tokens) / self.rate_limit
+
+    def count(self, operation):
+        with self.lock:
+            self.stats["calls"][operation] = self.stats["calls"].get(operation, 0) + 1
+
+    def fail(self):
+        """Decide whether the current call fails, counting failures."""
+        if random.random() >= self.error_rate:
+            return False
+        with self.lock:
+            self.stats["errors"] += 1
+        return True
+
+    def wait(self):
+        time.sleep(max(0.0, self.latency + random.uniform(-1, 1) * self.jitter))
+
+    def add(self, payload):
+        text = "\n".join(message["content"] for message in payload["messages"])
+        memory_id = str(uuid.uuid4())
+        with self.lock:
+            self.memories[memory_id] = {
+                "id": memory_id,
+                "memory": text,
+                "user_id": payload.get("user_id"),
+            }
+        return 200, {"results": [{"id": memory_id, "memory": text, "event": "ADD"}]}
+
+    def update(self, memory_id, text):
+        with self.lock:
+            if memory_id not in self.memories:
+                return 404, {"error": "Memory not found"}
+            self.memories[memory_id]["memory"] = text
+        return 200, {"message": "Memory updated successfully!"}
+
+    def delete(self, memory_id):
+        with self.lock:
+            if self.memories.pop(memory_id, None) is None:
+                return 404, {"error": "Memory not found"}
+        return 200, {"message": "Memory deleted successfully!"}
+
+    def search(self, payload):
+        query = payload.get("query", "").lower()
+        with self.lock:
+            results = [
+                dict(memory, score=1.0)
+                for memory in self.memories.values()
+                if query in memory["memory"].lower()
+                and payload.get("user_id") in (None, memory["user_id"])
+            ]
+        return 200, results[: payload.get("top_k", 10)]
+
+    def batch(self, payload, method):
+        memories = payload.get("memories", [])
+        if len(memories) > MAX_BATCH_SIZE:
+            return 400, {"error": f"At most {MAX_BATCH_SIZE} memories per batch"}
+        for memory in memories:
+            if method == "PUT":
+                status, body = self.update(memory["memory_id"], memory["text"])
+            else:
+                status, body = self.delete(memory["memory_id"])
+            if status != 200:
+                return status, body
+        verb = "updated" if method == "PUT" else "deleted"
+        return 200, {"message": f"Successfully {verb} {len(memories)} memories"}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    mem0 = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def route(self, method):
+        """Return the operation of a request and a function serving it."""
+        path = self.path.split("?")[0]
+        payload = self.read_payload()
+        mem0 = self.mem0
+        if method == "GET" and path == "/v1/ping/":
+            return "ping", lambda: (200, {"status": "ok", "user_email": None})
+        if method == "POST" and path == "/v1/memories/":
+            return "add", lambda: mem0.add(payload)
+        if method == "POST" and SEARCH_PATH.match(path):
+            return "search", lambda: mem0.search(payload)
+        if path == "/v1/batch/" and method in ("PUT", "DELETE"):
+            operation = "batch_update" if method == "PUT" else "batch_delete"
+            return operation, lambda: mem0.batch(payload, method)
+        match = MEMORY_PATH.match(path)
+        if match and method == "PUT":
+            return "update", lambda: mem0.update(match["memory_id"], payload["text"])
+        if match and method == "DELETE":
+            return "delete", lambda: mem0.delete(match["memory_id"])
+        return None, None
+
+    def read_payload(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def handle_method(self, method):
+        if method == "GET" and self.path == "/stats":
+            with self.mem0.lock:
+                stats = json.loads(json.dumps(self.mem0.stats))
+                stats["memories"] = len(self.mem0.memories)
+            return self.send_json(200, stats)
+
+        operation, serve = self.route(method)
+        if operation is None:
+            return self.send_json(404, {"error": "Not found"})
+        if operation != "ping":
+            retry_after = self.mem0.throttle()
+            if retry_after:
+                return self.send_json(
+                    429,
+                    {"error": "Rate limit exceeded"},
+                    {"Retry-After": f"{retry_after:.3f}"},
+                )
+            self.mem0.wait()
+            if self.mem0.fail():
+                return self.send_json(500, {"error": "Injected failure"})
+        self.mem0.count(operation)
+        self.send_json(*serve())
+
+    def do_GET(self):
+        self.handle_method("GET")
+
+    def do_POST(self):
+        self.handle_method("POST")
+
+    def do_PUT(self):
+        self.handle_method("PUT")
+
+    def do_DELETE(self):
+        self.handle_method("DELETE")
+
+
+def serve(host="127.0.0.1", port=8888, **options):
+    """Start a fake mem0 server in a background thread. Returns the server."""
+    handler = type("FakeMem0Handler", (Handler,), {"mem0": FakeMem0(**options)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument(
+        "--latency", type=float, default=0.2, help="mean seconds per call"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.05, help="latency spread in seconds"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="fraction of calls failing"
+    )
+    parser.add_argument(
+        "--rate-limit", type=int, default=0, help="requests per second (0: none)"
+    )
+    args = parser.parse_args()
+
+    server = serve(
+        args.host,
+        args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+    )
+    print(f"Fake mem0 listening on http://{args.host}:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
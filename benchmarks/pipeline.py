@@ -0,0 +1,141 @@
+"""
+Benchmark the mem0 ingestion pipeline end to end.
+
+Usage:
+    python -m benchmarks.pipeline [--memories 1000] [--rate 0] [--relay]
+                                  [--timeout 600] [--keep]
+    python -m benchmarks.pipeline --eager --fake-mem0 [--latency 0.2]
+
+Creates memories through the ORM, so each goes through the signal, the
+outbox relay, the broker, the mem0 tasks, mem0 and the status update, and
+reports throughput and the create-to-completed latency percentiles.
+
+By default the memories are written to the configured database and synced
+by the running Celery workers and outbox relay (--relay runs the relay in
+this process instead). Point the workers at benchmarks/fake_mem0.py with
+MEM0_HOST to run without a mem0 account. With --eager, tasks run in this
+process against a throwaway test database, and --fake-mem0 starts a fake
+mem0 server in this process as well.
+"""
+
+import argparse
+import time
+import uuid
+
+from . import setup_django, test_database
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.db.models import Count  # noqa: E402
+
+from memvault.celery import app  # noqa: E402
+from memories.concurrency import percentile  # noqa: E402
+from memories.models import UserMemory  # noqa: E402
+from memories.outbox import relay_outbox  # noqa: E402
+from user.models import User  # noqa: E402
+
+
+def get_status_counts(user):
+    return dict(
+        UserMemory.objects.filter(user=user)
+        .values_list("status")
+        .annotate(count=Count("id"))
+    )
+
+
+def run(args):
+    """Drive the memories through the pipeline and print the results."""
+    run_id = uuid.uuid4().hex[:8]
+    user = User.objects.create_user(username=f"bench-pipeline-{run_id}")
+    relay = args.relay or args.eager
+
+    start = time.monotonic()
+    for index in range(args.memories):
+        UserMemory.objects.create(
+            user=user,
+            content=f"Benchmark memory {run_id}-{index}: prefers green tea.",
+        )
+        if relay and (index + 1) % settings.MEM0_OUTBOX_BATCH_SIZE == 0:
+            relay_outbox()
+        if args.rate:
+            time.sleep(max(0.0, start + (index + 1) / args.rate - time.monotonic()))
+    created = time.monotonic() - start
+
+    counts = {}
+    while time.monotonic() - start < args.timeout:
+        if relay:
+            relay_outbox()
+        counts = get_status_counts(user)
+        if counts.get("completed", 0) + counts.get("failed", 0) >= args.memories:
+            break
+        time.sleep(args.poll_interval)
+    elapsed = time.monotonic() - start
+
+    latencies = [
+        (updated_at - created_at).total_seconds()
+        for created_at, updated_at in UserMemory.objects.filter(
+            user=user, status="completed"
+        ).values_list("created_at", "updated_at")
+    ]
+    print(
+        f"{'memories':>8} {'completed':>9} {'failed':>6} {'create s':>8} "
+        f"{'total s':>8} {'per s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    print(
+        f"{args.memories:>8} {len(latencies):>9} {counts.get('failed', 0):>6} "
+        f"{created:>8.1f} {elapsed:>8.1f} {len(latencies) / elapsed:>8.1f} "
+        f"{percentile(latencies, 0.5) * 1000:>8.0f} "
+        f"{percentile(latencies, 0.95) * 1000:>8.0f} "
+        f"{percentile(latencies, 0.99) * 1000:>8.0f}"
+    )
+    if len(latencies) + counts.get("failed", 0) < args.memories:
+        print(f"Timed out with {counts} after {args.timeout}s")
+
+    if not args.keep:
+        # Deleting the user deletes its memories, in mem0 too
+        user.delete()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--memories", type=int, default=1000)
+    parser.add_argument(
+        "--rate", type=float, default=0, help="memories created per second (0: max)"
+    )
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument(
+        "--relay", action="store_true", help="run the outbox relay in this process"
+    )
+    parser.add_argument(
+        "--eager", action="store_true", help="run tasks in this process"
+    )
+    parser.add_argument(
+        "--fake-mem0", action="store_true", help="serve a fake mem0 in this process"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.2, help="fake mem0 seconds per call"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="keep the benchmark memories"
+    )
+    args = parser.parse_args()
+
+    if args.fake_mem0:
+        from .fake_mem0 import serve
+
+        server = serve(port=0, latency=args.latency, jitter=args.latency / 4)
+        settings.MEM0_HOST = f"http://127.0.0.1:{server.server_address[1]}"
+        settings.MEM0_API_KEY = settings.MEM0_API_KEY or "fake-mem0"
+
+    if args.eager:
+        app.conf.task_always_eager = True
+        with test_database():
+            run(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Seed a synthetic MemVault dataset with bulk inserts.
+
+Usage:
+    python -m benchmarks.seed [--scale small|medium|large] [--seed 0]
+
+Creates users with API keys, organizations with their teams and team
+memberships, and user, team and organization memories, in batches of
+--batch-size rows. Writes to the configured database; benchmarks.api seeds
+a throwaway test database through seed() instead.
+
+Memories are seeded as completed and in mem0, and bulk inserts send no
+signals, so seeding records no mem0 sync events.
+"""
+
+import argparse
+import random
+import time
+from itertools import islice
+
+from . import setup_django
+
+setup_django()
+
+from authentication.models import APIKey  # noqa: E402
+from memories.dedup import (  # noqa: E402
+    compute_content_hash,
+    compute_raw_content_hash,
+)
+from memories.models import OrganizationMemory, TeamMemory, UserMemory  # noqa: E402
+from user.models import Organization, Team, TeamMembership, User  # noqa: E402
+
+# Row counts per scale: memories per owner are per user, team and organization
+SCALES = {
+    "small": {
+        "users": 200,
+        "organizations": 5,
+        "teams_per_organization": 100,
+        "members_per_team": 5,
+        "memories_per_user": 20,
+        "memories_per_team": 10,
+        "memories_per_organization": 200,
+    },
+    "medium": {
+        "users": 5000,
+        "organizations": 10,
+        "teams_per_organization": 1000,
+        "members_per_team": 10,
+        "memories_per_user": 50,
+        "memories_per_team": 20,
+        "memories_per_organization": 1000,
+    },
+    "large": {
+        "users": 20000,
+        "organizations": 20,
+        "teams_per_organization": 2500,
+        "members_per_team": 20,
+        "memories_per_user": 100,
+        "memories_per_team": 20,
+        "memories_per_organization": 5000,
+    },
+}
+
+WORDS = (
+    "prefers morning meetings green tea quarterly roadmap review deploy "
+    "friday budget customer feedback python design launch onboarding "
+    "travel vegetarian timezone standup retro release hiring"
+).split()
+
+
+def make_content(rng, index):
+    """Build a short synthetic memory, unique by index."""
+    words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30)))
+    return f"Memory {index}: {words}."
+
+
+def insert(model_class, rows, batch_size, keep=True):
+    """
+    Bulk insert rows from an iterable in batches.
+
+    Returns the created rows, or only their count without keep, so millions
+    of rows need not fit in memory.
+    """
+    created, count = [], 0
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        model_class.objects.bulk_create(batch, batch_size=batch_size)
+        count += len(batch)
+        if keep:
+            created.extend(batch)
+    return created if keep else count
+
+
+def insert_memories(model_class, owner_field, owners, per_owner, rng, batch_size):
+    """Bulk insert completed memories for each owner. Returns the count."""
+
+    def rows():
+        index = 0
+        for owner in owners:
+            for _ in range(per_owner):
+                content = make_content(rng, index)
+                yield model_class(
+                    content=content,
+                    content_hash=compute_content_hash(content),
+                    raw_content_hash=compute_raw_content_hash(content),
+                    synced_content_hash=compute_raw_content_hash(content),
+                    status="completed",
+                    mem0_memory_id=f"mem0-{owner_field}-{index}",
+                    **{owner_field: owner},
+                )
+                index += 1
+
+    return insert(model_class, rows(), batch_size, keep=False)
+
+
+def seed(
+    users,
+    organizations,
+    teams_per_organization,
+    members_per_team,
+    memories_per_user,
+    memories_per_team,
+    memories_per_organization,
+    batch_size=5000,
+    random_seed=0,
+):
+    """
+    Seed the dataset and return its first user, organization and team.
+
+    The first user administers every organization and is a member of every
+    organization's first team, so it can reach every endpoint. Returns a
+    dict of the user, its API key, the organization and the team.
+    """
+    rng = random.Random(random_seed)
+    users = insert(
+        User,
+        (User(username=f"seed-user-{index}", password="!") for index in range(users)),
+        batch_size,
+    )
+    api_keys = insert(
+        APIKey,
+        (
+            APIKey(
+                user=user,
+                primary_key=APIKey.generate_key(),
+                secondary_key=APIKey.generate_key(),
+            )
+            for user in users
+        ),
+        batch_size,
+    )
+    organizations = insert(
+        Organization,
+        (
+            Organization(name=f"Organization {index}", admin=users[0])
+            for index in range(organizations)
+        ),
+        batch_size,
+    )
+    teams = insert(
+        Team,
+        (
+            Team(name=f"Team {index}", organization=organization)
+            for organization in organizations
+            for index in range(teams_per_organization)
+        ),
+        batch_size,
+    )
+
+    def memberships():
+        for index, team in enumerate(teams):
+            members = set(rng.sample(users, min(members_per_team, len(users))))
+            if index % teams_per_organization == 0:
+                members.add(users[0])
+            for user in members:
+                yield TeamMembership(user=user, team=team)
+
+    insert(TeamMembership, memberships(), batch_size, keep=False)
+    insert_memories(UserMemory, "user", users, memories_per_user, rng, batch_size)
+    insert_memories(TeamMemory, "team", teams, memories_per_team, rng, batch_size)
+    insert_memories(
+        OrganizationMemory,
+        "organization",
+        organizations,
+        memories_per_organization,
+        rng,
+        batch_size,
+    )
+    return {
+        "user": users[0],
+        "api_key": api_keys[0].primary_key,
+        "organization": organizations[0],
+        "team": teams[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    dataset = seed(
+        **SCALES[args.scale], batch_size=args.batch_size, random_seed=args.seed
+    )
+    print(
+        f"Seeded the {args.scale} dataset in {time.perf_counter() - start:.1f}s; "
+        f"API key of {dataset['user'].username}: {dataset['api_key']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
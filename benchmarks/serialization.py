@@ -0,0 +1,77 @@
+"""
+Benchmark memory list serialization on 100-row pages.
+
+Usage:
+    python -m benchmarks.serialization [--rows 100] [--iterations 50]
+
+Compares the per-row cost of the ModelSerializer path with the stdlib
+JSONRenderer against the values_list() fast path with ORJSONRenderer.
+"""
+
+import argparse
+import time
+
+from . import setup_django, test_database
+
+setup_django()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from memvault.renderers import ORJSONRenderer  # noqa: E402
+from memories.models import UserMemory  # noqa: E402
+from memories.serializers import UserMemorySerializer  # noqa: E402
+from user.models import User  # noqa: E402
+
+
+def serializer_path(queryset):
+    """Full ModelSerializer representation rendered by the stdlib renderer."""
+    return JSONRenderer().render(UserMemorySerializer(list(queryset), many=True).data)
+
+
+def fast_path(queryset):
+    """values_list() rows rendered by orjson."""
+    rows = UserMemorySerializer.fast_values(queryset)
+    return ORJSONRenderer().render(UserMemorySerializer.fast_data(rows))
+
+
+def time_per_row(func, queryset, rows, iterations):
+    """Return the mean wall time per row in microseconds."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(queryset)
+    return (time.perf_counter() - start) / iterations / rows * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    with test_database():
+        user = User.objects.create_user(username="bench", password="bench")
+        UserMemory.objects.bulk_create(
+            UserMemory(
+                user=user,
+                content=f"Memory {index}: prefers morning meetings and green tea.",
+                status="completed",
+                mem0_memory_id=f"mem0-{index}",
+            )
+            for index in range(args.rows)
+        )
+        queryset = UserMemory.objects.filter(user=user).order_by("-created_at")
+
+        if serializer_path(queryset) != fast_path(queryset):
+            print("warning: fast path output differs from the serializer output")
+
+        before = time_per_row(serializer_path, queryset, args.rows, args.iterations)
+        after = time_per_row(fast_path, queryset, args.rows, args.iterations)
+
+    print(f"{'path':<28} {'us/row':>8}")
+    print(f"{'ModelSerializer + JSON':<28} {before:>8.1f}")
+    print(f"{'values_list + orjson':<28} {after:>8.1f}")
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import os
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of an exited worker from the metrics aggregation."""
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:  # Metrics are optional
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import UserMemory, TeamMemory, OrganizationMemory
+from .models import (
+    UserMemory,
+    TeamMemory,
+    OrganizationMemory,
+    ArchivedMemory,
+    Mem0OutboxEvent,
+)
 
 
 @admin.register(UserMemory)
@@ -51,3 +57,25 @@ class OrganizationMemoryAdmin(admin.ModelAdmin):
         return obj.content[:50] + "..." if len(obj.content) > 50 else obj.content
 
     content_preview.short_description = "Content Preview"
+
+
+@admin.register(ArchivedMemory)
+class ArchivedMemoryAdmin(admin.ModelAdmin):
+    """Admin interface for ArchivedMemory model."""
+
+    list_display = ["id", "memory_type", "original_id", "created_at", "archived_at"]
+    list_filter = ["memory_type", "archived_at"]
+    search_fields = ["original_id", "mem0_memory_id"]
+    readonly_fields = ["created_at", "updated_at", "archived_at"]
+    ordering = ["-archived_at"]
+
+
+@admin.register(Mem0OutboxEvent)
+class Mem0OutboxEventAdmin(admin.ModelAdmin):
+    """Admin interface for Mem0OutboxEvent model."""
+
+    list_display = ["id", "operation", "memory_type", "memory_id", "created_at"]
+    list_filter = ["operation", "memory_type"]
+    search_fields = ["memory_id", "mem0_memory_id"]
+    readonly_fields = ["created_at"]
+    ordering = ["id"]
@@ -0,0 +1,116 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F, Q
+from django.db.models.deletion import Collector
+from django.utils import timezone
+
+from user.models import Organization
+from .models import ArchivedMemory, UserMemory, TeamMemory
+
+logger = logging.getLogger(__name__)
+
+
+def get_archive_filter(model_class, now=None):
+    """
+    Build the filter selecting memories of model_class that are due for archival.
+
+    Organizations may override the global MEMORY_ARCHIVE_AFTER_DAYS age; a
+    value of 0 disables archival. Returns None if nothing can be archived.
+    """
+    now = now or timezone.now()
+    default_days = settings.MEMORY_ARCHIVE_AFTER_DAYS
+
+    if model_class is UserMemory:
+        if not default_days:
+            return None
+        return Q(created_at__lt=now - timedelta(days=default_days))
+
+    org_field = "team__organization" if model_class is TeamMemory else "organization"
+    conditions = Q()
+    if default_days:
+        conditions |= Q(
+            **{
+                f"{org_field}__memory_archive_after_days__isnull": True,
+                "created_at__lt": now - timedelta(days=default_days),
+            }
+        )
+
+    # One condition per distinct override keeps the query bounded
+    overrides = (
+        Organization.objects.filter(memory_archive_after_days__gt=0)
+        .values_list("memory_archive_after_days", flat=True)
+        .distinct()
+    )
+    for days in overrides:
+        conditions |= Q(
+            **{
+                f"{org_field}__memory_archive_after_days": days,
+                "created_at__lt": now - timedelta(days=days),
+            }
+        )
+
+    return conditions or None
+
+
+def archive_batch(model_class, batch_size, now=None):
+    """
+    Move one batch of old, completed memories into the archive table.
+
+    Memories edited since their content was sent to mem0 stay hot until
+    their update is synced, as the update is only flushed for hot rows.
+    Linked duplicates share their original's mem0 memory and are always
+    in sync. Returns the number of memories archived.
+    """
+    conditions = get_archive_filter(model_class, now=now)
+    if conditions is None:
+        return 0
+
+    with transaction.atomic():
+        batch = list(
+            # Only the memories: the owners joined for their archive age
+            # stay unlocked, and memories of locked owners are not skipped
+            model_class.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(conditions, status="completed")
+            .filter(
+                Q(raw_content_hash=F("synced_content_hash"))
+                | Q(duplicate_of__isnull=False)
+            )
+            .order_by("created_at")[:batch_size]
+        )
+        if not batch:
+            return 0
+
+        rows = {memory.pk: ArchivedMemory.from_memory(memory) for memory in batch}
+        ArchivedMemory.objects.bulk_create(rows.values(), ignore_conflicts=True)
+
+        # Rows skipped as conflicts, e.g. with an archive row left under the
+        # same id, keep their memory hot rather than losing it
+        stored = ArchivedMemory.objects.filter(
+            memory_type=batch[0].scope, original_id__in=rows
+        ).values_list("original_id", "content_blob")
+        archived_ids = {
+            original_id
+            for original_id, content_blob in stored
+            if bytes(content_blob) == rows[original_id].content_blob
+        }
+        if len(archived_ids) < len(batch):
+            logger.warning(
+                f"Could not archive {len(batch) - len(archived_ids)} "
+                f"{model_class.__name__} rows, an archive row with their id exists"
+            )
+        archived = [memory for memory in batch if memory.pk in archived_ids]
+        if not archived:
+            return 0
+
+        # The memories stay in mem0, so skip the delete signal for each of them
+        for memory in archived:
+            memory._skip_signals = True
+        collector = Collector(using=router.db_for_write(model_class))
+        collector.collect(archived)
+        collector.delete()
+
+    logger.info(f"Archived {len(archived)} {model_class.__name__} rows")
+    return len(archived)
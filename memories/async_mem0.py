@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import threading
+
+import httpx
+from mem0 import AsyncMemoryClient
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMem0Client:
+    """
+    Blocking facade over mem0's AsyncMemoryClient.
+
+    All calls of the process run on one asyncio event loop in a background
+    thread, sharing one keep-alive connection pool, with at most
+    max_in_flight requests at a time. Callers block only on their own
+    result, so a Celery worker with a thread pool keeps hundreds of mem0
+    calls in flight per process. It exposes the same methods as
+    MemoryClient, so tasks work unchanged with either client.
+    """
+
+    def __init__(
+        self,
+        api_key,
+        host=None,
+        max_in_flight=200,
+        max_connections=100,
+        timeout=60,
+        transport=None,
+    ):
+        self.timeout = timeout
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="mem0-event-loop", daemon=True
+        )
+        self.thread.start()
+
+        http_client = httpx.AsyncClient(
+            timeout=timeout,
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        self.client = AsyncMemoryClient(api_key=api_key, host=host, client=http_client)
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        logger.info(f"Started mem0 event loop with {max_in_flight} calls in flight")
+
+    async def _bounded(self, coroutine):
+        async with self.semaphore:
+            return await coroutine
+
+    def run(self, coroutine):
+        """Run a mem0 coroutine on the event loop and wait for its result."""
+        future = asyncio.run_coroutine_threadsafe(self._bounded(coroutine), self.loop)
+        return future.result(timeout=self.timeout)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            # API methods are wrapped by mem0's error handler, so check the
+            # result rather than the method
+            if asyncio.iscoroutine(result):
+                return self.run(result)
+            return result
+
+        return call
+
+    def close(self):
+        """Close the connection pool and stop the event loop."""
+        asyncio.run_coroutine_threadsafe(
+            self.client.async_client.aclose(), self.loop
+        ).result(timeout=self.timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
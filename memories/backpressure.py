@@ -0,0 +1,159 @@
+import heapq
+import time
+from contextvars import ContextVar
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from user.models import Team
+from .models import OrganizationMemory, TeamMemory, UserMemory
+
+# Set while a write's mem0 sync is deferred to the bulk lane
+_mem0_sync_deferred = ContextVar("mem0_sync_deferred", default=False)
+
+# Backlogs of this process by tenant key, with the monotonic time measured
+_backlogs = {}
+# Bounds the cached tenants; the cache is dropped once it is full
+MAX_CACHED_BACKLOGS = 10000
+
+
+class IngestionBacklogged(APIException):
+    """Raised for writes while the mem0 sync backlog is past its limit."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Memory ingestion is backlogged, try again later."
+    default_code = "ingestion_backlogged"
+
+    def __init__(self, wait):
+        super().__init__()
+        # Sent as Retry-After by DRF's exception handler
+        self.wait = wait
+
+
+def get_tenant(memory_type, owner_id):
+    """
+    Return the tenant whose backlog applies to writes in a memory scope.
+
+    User memories are their user's tenant, and team and organization
+    memories their organization's. Returns a key and the lookup of the
+    tenant's memories per memory model.
+    """
+    if memory_type == "user":
+        return f"user:{owner_id}", {UserMemory: {"user_id": owner_id}}
+    organization_id = owner_id
+    if memory_type == "team":
+        organization_id = (
+            Team.objects.filter(pk=owner_id)
+            .values_list("organization_id", flat=True)
+            .first()
+        )
+    return f"organization:{organization_id}", {
+        TeamMemory: {"team__organization_id": organization_id},
+        OrganizationMemory: {"organization_id": organization_id},
+    }
+
+
+def get_waiting_filter(now):
+    """
+    Filter memories waiting for a mem0 sync on the regular path.
+
+    Failed memories, memories stuck past MEMORY_SWEEP_STALE_AFTER and
+    memories the sweeper re-drove on the bulk lane are left to the sweeper.
+    """
+    cutoff = now - timedelta(seconds=settings.MEMORY_SWEEP_STALE_AFTER)
+    return Q(
+        status__in=("pending", "processing"), redriven=False, updated_at__gte=cutoff
+    )
+
+
+def get_backlog(tenant):
+    """
+    Return the mem0 sync backlog of a tenant as (memories waiting, wait).
+
+    The wait is the MEMORY_BACKPRESSURE_AGE_PERCENTILE of the seconds the
+    waiting memories have spent in their status, so a few slow memories do
+    not hold up writes. Each tenant's backlog is measured at most once per
+    MEMORY_BACKPRESSURE_CACHE_SECONDS in each process, through the partial
+    indexes on unsynced memories.
+    """
+    key, lookups = tenant
+    cached = _backlogs.get(key)
+    if (
+        cached is not None
+        and time.monotonic() - cached[0] < settings.MEMORY_BACKPRESSURE_CACHE_SECONDS
+    ):
+        return cached[1]
+
+    now = timezone.now()
+    querysets = [
+        model_class.objects.filter(get_waiting_filter(now), **lookup)
+        for model_class, lookup in lookups.items()
+    ]
+    depth = sum(queryset.count() for queryset in querysets)
+    age = 0.0
+    if depth:
+        # Only the memories waiting longer than the percentile are read
+        rank = int(depth * (1 - settings.MEMORY_BACKPRESSURE_AGE_PERCENTILE))
+        oldest = heapq.merge(
+            *(
+                queryset.order_by("updated_at").values_list("updated_at", flat=True)[
+                    : rank + 1
+                ]
+                for queryset in querysets
+            )
+        )
+        updated_at = next(islice(oldest, rank, None))
+        age = max(0.0, (now - updated_at).total_seconds())
+
+    if len(_backlogs) >= MAX_CACHED_BACKLOGS:
+        _backlogs.clear()
+    _backlogs[key] = (time.monotonic(), (depth, age))
+    return depth, age
+
+
+def is_past(backlog, max_depth, max_age):
+    """Check a backlog against limits on its depth and age (0 disables)."""
+    depth, age = backlog
+    return bool(max_depth and depth >= max_depth) or bool(max_age and age >= max_age)
+
+
+def get_write_action(backlog):
+    """
+    Return how a memory write is handled under a backlog.
+
+    "reject" past the MEMORY_BACKPRESSURE_REJECT limits, "defer" past the
+    MEMORY_BACKPRESSURE_DEFER limits, otherwise "accept".
+    """
+    if is_past(
+        backlog,
+        settings.MEMORY_BACKPRESSURE_REJECT_DEPTH,
+        settings.MEMORY_BACKPRESSURE_REJECT_AGE,
+    ):
+        return "reject"
+    if is_past(
+        backlog,
+        settings.MEMORY_BACKPRESSURE_DEFER_DEPTH,
+        settings.MEMORY_BACKPRESSURE_DEFER_AGE,
+    ):
+        return "defer"
+    return "accept"
+
+
+def is_mem0_sync_deferred():
+    """Check whether mem0 syncs recorded now go to the bulk lane."""
+    return _mem0_sync_deferred.get()
+
+
+def defer_mem0_sync():
+    """Record the mem0 syncs of memory changes on the bulk lane. Returns a token."""
+    return _mem0_sync_deferred.set(True)
+
+
+def end_mem0_sync_deferral(token):
+    """Record mem0 syncs as before the defer_mem0_sync call returning token."""
+    _mem0_sync_deferred.reset(token)
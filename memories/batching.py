@@ -0,0 +1,634 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+from itertools import chain, zip_longest
+from operator import or_
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from memvault.redis_client import get_redis, mark_redis_unavailable
+
+from . import circuit_breaker, concurrency, rate_limit
+from .models import DEFAULT_TENANT
+
+logger = logging.getLogger(__name__)
+
+
+def get_batch_size(operation):
+    """Return how many buffered operations are flushed together."""
+    if operation == "add":
+        return settings.MEM0_BATCH_SIZE
+    # Updates and deletes go through mem0's batch endpoints
+    return settings.MEM0_BULK_BATCH_SIZE
+
+
+def get_task_compression(entries):
+    """Return the compression for a flush task carrying entries, if any."""
+    if not settings.MEM0_TASK_COMPRESSION:
+        return None
+    if len(json.dumps(entries)) < settings.MEM0_TASK_COMPRESSION_THRESHOLD:
+        return None
+    return settings.MEM0_TASK_COMPRESSION
+
+
+def get_queue_key(operation, memory_type, lane="interactive"):
+    if lane == "interactive":
+        return f"mem0:batch:{operation}:{memory_type}"
+    return f"mem0:batch:{lane}:{operation}:{memory_type}"
+
+
+def get_tenant_queue_key(queue_key, tenant):
+    return f"{queue_key}:tenant:{tenant}"
+
+
+def get_tenants_key(queue_key):
+    return f"{queue_key}:tenants"
+
+
+def get_cursor_key(queue_key):
+    return f"{queue_key}:cursor"
+
+
+def get_flush_key(operation, memory_type, lane="interactive"):
+    return f"{get_queue_key(operation, memory_type, lane)}:scheduled"
+
+
+# Pops a batch of up to ARGV[2] entries from the tenant queues of a buffer,
+# taking up to ARGV[3] entries from each tenant in turn, starting after the
+# tenant served last. Tenants whose queue runs empty leave the set of
+# tenants with buffered entries.
+NEXT_BATCH_SCRIPT = """
+local tenants = redis.call("SMEMBERS", KEYS[1])
+table.sort(tenants)
+local cursor = redis.call("GET", KEYS[2])
+local index = 1
+if cursor then
+    for position, tenant in ipairs(tenants) do
+        if tenant > cursor then
+            index = position
+            break
+        end
+    end
+end
+
+local size, quantum = tonumber(ARGV[2]), tonumber(ARGV[3])
+local batch, active = {}, #tenants
+while #batch < size and active > 0 do
+    local tenant = tenants[index]
+    if tenant then
+        local key = ARGV[1] .. tenant
+        local entries = redis.call("LPOP", key, math.min(quantum, size - #batch))
+        if entries then
+            for _, entry in ipairs(entries) do
+                batch[#batch + 1] = entry
+            end
+        end
+        if redis.call("LLEN", key) == 0 then
+            redis.call("SREM", KEYS[1], tenant)
+            tenants[index] = false
+            active = active - 1
+        end
+        redis.call("SET", KEYS[2], tenant)
+    end
+    index = index % #tenants + 1
+end
+return batch
+"""
+
+_next_batch_script = None
+
+
+def get_next_batch_script(client):
+    global _next_batch_script
+    if _next_batch_script is None:
+        _next_batch_script = client.register_script(NEXT_BATCH_SCRIPT)
+    return _next_batch_script
+
+
+def get_lane(entries):
+    """Return the lane of a group of operations published together."""
+    if len(entries) >= settings.MEM0_BULK_LANE_THRESHOLD:
+        return "bulk"
+    return "interactive"
+
+
+def group_by_tenant(groups, lane=None):
+    """
+    Split grouped operations into per-tenant buffers.
+
+    Returns a dict mapping (operation, memory_type, lane) to dicts of the
+    entries of each tenant. Each tenant's operations go to the given lane,
+    or to the bulk lane once they are at least MEM0_BULK_LANE_THRESHOLD,
+    so one organization's backfill is flushed by the bulk workers.
+    """
+    buffers = {}
+    for (operation, memory_type), entries in groups.items():
+        tenants = {}
+        for entry in entries:
+            tenants.setdefault(entry.get("tenant", DEFAULT_TENANT), []).append(entry)
+        for tenant, tenant_entries in tenants.items():
+            key = (operation, memory_type, lane or get_lane(tenant_entries))
+            buffers.setdefault(key, {})[tenant] = tenant_entries
+    return buffers
+
+
+def publish_operations(groups, lane=None):
+    """
+    Publish grouped mem0 operations for batching.
+
+    groups maps (operation, memory_type) to lists of entries, which are
+    buffered per lane and tenant (see group_by_tenant). All entries are
+    appended to their Redis buffers in one pipeline. The first entries of
+    a batch schedule a flush after MEM0_BATCH_WINDOW seconds, and a tenant
+    with a full batch pending has the buffer flushed right away. Without
+    Redis, each buffer is published as flush tasks carrying the entries,
+    alternating between tenants and compressed once they grow large.
+    Either way, all tasks go out over one producer connection.
+    """
+    from .tasks import mem0_flush_batch_task
+
+    buffers = group_by_tenant(groups, lane)
+    client = get_redis()
+    if client is not None:
+        try:
+            pipeline = client.pipeline(transaction=False)
+            for (operation, memory_type, buffer_lane), tenants in buffers.items():
+                queue_key = get_queue_key(operation, memory_type, buffer_lane)
+                for tenant, entries in tenants.items():
+                    pipeline.rpush(
+                        get_tenant_queue_key(queue_key, tenant),
+                        *[json.dumps(entry) for entry in entries],
+                    )
+                pipeline.sadd(get_tenants_key(queue_key), *tenants)
+                pipeline.set(
+                    get_flush_key(operation, memory_type, buffer_lane),
+                    1,
+                    nx=True,
+                    # Expires in case the flush task is lost, so later
+                    # entries schedule a new one
+                    ex=max(int(settings.MEM0_BATCH_WINDOW * 10), 5),
+                )
+            results = iter(pipeline.execute())
+        except redis.RedisError as exc:
+            mark_redis_unavailable(exc)
+        else:
+            with mem0_flush_batch_task.app.producer_or_acquire() as producer:
+                for (operation, memory_type, buffer_lane), tenants in buffers.items():
+                    pending = max(next(results) for _ in tenants)
+                    next(results)
+                    scheduled = next(results)
+                    kwargs = {"lane": buffer_lane}
+                    if pending >= get_batch_size(operation):
+                        mem0_flush_batch_task.apply_async(
+                            (operation, memory_type), kwargs, producer=producer
+                        )
+                    elif scheduled:
+                        mem0_flush_batch_task.apply_async(
+                            (operation, memory_type),
+                            kwargs,
+                            countdown=settings.MEM0_BATCH_WINDOW,
+                            producer=producer,
+                        )
+            return
+
+    with mem0_flush_batch_task.app.producer_or_acquire() as producer:
+        for (operation, memory_type, buffer_lane), tenants in buffers.items():
+            size = max(get_batch_size(operation), 1)
+            chunks = zip_longest(
+                *[chunked(entries, size) for entries in tenants.values()]
+            )
+            for chunk in chain.from_iterable(chunks):
+                if chunk is None:
+                    continue
+                mem0_flush_batch_task.apply_async(
+                    (operation, memory_type, chunk),
+                    {"lane": buffer_lane},
+                    compression=get_task_compression(chunk),
+                    producer=producer,
+                )
+
+
+def get_flush_function(operation):
+    return {
+        "add": flush_add_batch,
+        "update": flush_update_batch,
+        "delete": flush_delete_batch,
+    }[operation]
+
+
+def flush_batches(operation, memory_type, lane="interactive", probe=False):
+    """
+    Drain the buffered operations of a memory type in batches. Returns the count.
+
+    Batches take up to MEM0_TENANT_QUANTUM operations from each tenant with
+    operations buffered in turn, so no tenant's backlog holds back another
+    tenant's operations by more than one quantum per tenant. A flush probing
+    a recovering mem0 sends a single operation and parks itself for the
+    rest.
+    """
+    client = get_redis()
+    if client is None:
+        return 0
+
+    flush_batch = get_flush_function(operation)
+    queue_key = get_queue_key(operation, memory_type, lane)
+    # Entries buffered from now on schedule the next flush
+    client.delete(get_flush_key(operation, memory_type, lane))
+
+    total = 0
+    while True:
+        # Stop hitting mem0 after a probe or once its circuit tripped; the
+        # rest stays buffered
+        if total and (probe or not circuit_breaker.is_closed()):
+            from .tasks import mem0_flush_batch_task
+
+            circuit_breaker.park_task(
+                mem0_flush_batch_task, (operation, memory_type), {"lane": lane}
+            )
+            return total
+        entries = get_next_batch_script(client)(
+            keys=[get_tenants_key(queue_key), get_cursor_key(queue_key)],
+            args=[
+                get_tenant_queue_key(queue_key, ""),
+                1 if probe else get_batch_size(operation),
+                settings.MEM0_TENANT_QUANTUM,
+            ],
+            client=client,
+        )
+        if not entries:
+            return total
+        flush_batch(memory_type, [json.loads(entry) for entry in entries], lane=lane)
+        total += len(entries)
+
+
+def run_concurrently(func, items):
+    """
+    Call func for every item of a dict on a thread pool.
+
+    Returns the results and the error messages, both keyed like items.
+    """
+    results, errors = {}, {}
+    if not items:
+        return results, errors
+
+    workers = min(settings.MEM0_BATCH_CONCURRENCY, len(items))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {key: executor.submit(func, item) for key, item in items.items()}
+
+    for key, future in futures.items():
+        try:
+            results[key] = future.result()
+        except Exception as exc:
+            errors[key] = str(exc)
+    return results, errors
+
+
+def get_batch_failures(response, mem0_ids):
+    """
+    Map the mem0 ids of a batch that its response reports as failed to errors.
+
+    A batch response with per-memory results counts every memory without a
+    successful result as failed. Other responses (a summary message) mean
+    the whole batch was applied.
+    """
+    results = response.get("results") if isinstance(response, dict) else None
+    if not isinstance(results, list):
+        return {}
+
+    succeeded, errors = set(), {}
+    for result in results:
+        if not isinstance(result, dict):
+            continue
+        mem0_id = result.get("memory_id", result.get("id"))
+        error = result.get("error")
+        if error or result.get("status") in ("error", "failed"):
+            errors[mem0_id] = str(error or result["status"])
+        else:
+            succeeded.add(mem0_id)
+    return {
+        mem0_id: errors.get(mem0_id, "Missing from the mem0 batch response")
+        for mem0_id in mem0_ids
+        if mem0_id not in succeeded
+    }
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def claim_for_sync(model_class, pks):
+    """
+    Mark the batch's memories as processing and return them by primary key.
+
+    Memories already being processed are left out, so one memory never has
+    two syncs in flight. Edits made meanwhile are picked up by the check
+    that runs after the in-flight sync completes.
+    """
+    with transaction.atomic():
+        instances = model_class.objects.select_for_update(skip_locked=True).in_bulk(pks)
+        instances = {
+            pk: instance
+            for pk, instance in instances.items()
+            if instance.status in model_class.STATUS_TRANSITIONS["processing"]
+        }
+        model_class.objects.filter(pk__in=instances).update(
+            status="processing", updated_at=timezone.now()
+        )
+    return instances
+
+
+def flush_add_batch(memory_type, entries, lane="interactive"):
+    """
+    Create the mem0 memories of a batch with concurrent calls.
+
+    Every memory has its own mem0 user, so the batch is a set of concurrent
+    add calls rather than one multi-message add. Every result is mapped back
+    to its row and statuses are written with a single bulk UPDATE. Failed
+    adds are retried as individual tasks.
+    """
+    from .tasks import (
+        get_mem0_instance,
+        get_model_class,
+        mem0_add_task,
+        mem0_delete_task,
+        release_db_connection,
+    )
+
+    model_class = get_model_class(memory_type)
+    pks = {entry["pk"] for entry in entries}
+    # Events are delivered at least once, so skip memories already added
+    pks -= set(
+        model_class.objects.filter(
+            pk__in=pks, status="completed", mem0_memory_id__isnull=False
+        ).values_list("pk", flat=True)
+    )
+    instances = claim_for_sync(model_class, pks)
+    if not instances:
+        return
+    release_db_connection()
+
+    client = get_mem0_instance()
+
+    def add(instance):
+        message = [{"role": "user", "content": instance.content}]
+        rate_limit.acquire("add")
+        with concurrency.call_slot("add"):
+            result = client.add(message, user_id=f"{memory_type}_{instance.pk}")
+        if result and "results" in result and len(result["results"]) > 0:
+            return result["results"][0]["id"]
+        raise Exception("Invalid response from mem0")
+
+    completed, failed = run_concurrently(add, instances)
+    circuit_breaker.record_batch_result(completed, failed)
+    synced = apply_sync_results(model_class, instances, completed)
+    logger.info(
+        f"Flushed {len(instances)} {memory_type} mem0 adds: "
+        f"{len(completed)} completed, {len(failed)} failed"
+    )
+
+    # Memories re-driven or deleted while the batch was in flight have no
+    # row referring to the mem0 memory added for them
+    for pk in set(completed) - set(synced):
+        logger.info(
+            f"{memory_type} memory {pk} changed hands during its mem0 add, "
+            f"deleting mem0 memory {completed[pk]}"
+        )
+        mem0_delete_task.apply_async((memory_type, pk, completed[pk]), {"lane": lane})
+
+    for pk, error in failed.items():
+        logger.error(f"Error creating mem0 memory for {memory_type} {pk}: {error}")
+        mem0_add_task.apply_async(
+            (memory_type, pk, instances[pk].version),
+            {"claimed": True, "lane": lane, "generation": instances[pk].generation},
+            countdown=circuit_breaker.get_retry_delay(0),
+        )
+
+
+def flush_update_batch(memory_type, entries, lane="interactive"):
+    """
+    Update the mem0 memories of a batch through mem0's batch update endpoint.
+
+    Repeated updates of a memory collapse into one carrying its current
+    content, and memories whose current content was already sent (e.g. by
+    their add) are skipped. A chunk the batch endpoint rejects is retried
+    item by item, so only the memories that really fail are retried as
+    individual tasks, and so are the memories the batch response reports
+    as failed.
+    """
+    from .tasks import (
+        get_mem0_instance,
+        get_model_class,
+        mem0_update_task,
+        release_db_connection,
+    )
+
+    model_class = get_model_class(memory_type)
+    pks = set(
+        model_class.objects.filter(
+            pk__in={entry["pk"] for entry in entries},
+            # Memories still waiting for their add get the latest content then
+            mem0_memory_id__isnull=False,
+        )
+        .exclude(raw_content_hash=F("synced_content_hash"))
+        .values_list("pk", flat=True)
+    )
+    instances = claim_for_sync(model_class, pks)
+    if not instances:
+        return
+    release_db_connection()
+
+    client = get_mem0_instance()
+
+    def update(instance):
+        rate_limit.acquire("update")
+        with concurrency.call_slot("update"):
+            client.update(memory_id=instance.mem0_memory_id, text=instance.content)
+        return instance.mem0_memory_id
+
+    completed, failed = {}, {}
+    for chunk in chunked(list(instances.values()), settings.MEM0_BULK_BATCH_SIZE):
+        try:
+            rate_limit.acquire("update")
+            with concurrency.call_slot("batch_update"):
+                response = client.batch_update(
+                    [
+                        {"memory_id": instance.mem0_memory_id, "text": instance.content}
+                        for instance in chunk
+                    ]
+                )
+            failures = get_batch_failures(
+                response, [instance.mem0_memory_id for instance in chunk]
+            )
+        except Exception as exc:
+            logger.warning(
+                f"mem0 batch update of {len(chunk)} {memory_type} memories failed, "
+                f"retrying individually: {str(exc)}"
+            )
+            failures = {instance.mem0_memory_id: str(exc) for instance in chunk}
+        else:
+            if failures:
+                logger.warning(
+                    f"mem0 batch update failed for {len(failures)} of {len(chunk)} "
+                    f"{memory_type} memories, retrying them individually"
+                )
+
+        completed.update(
+            {
+                instance.pk: instance.mem0_memory_id
+                for instance in chunk
+                if instance.mem0_memory_id not in failures
+            }
+        )
+        chunk_completed, chunk_failed = run_concurrently(
+            update,
+            {
+                instance.pk: instance
+                for instance in chunk
+                if instance.mem0_memory_id in failures
+            },
+        )
+        completed.update(chunk_completed)
+        failed.update(chunk_failed)
+
+    circuit_breaker.record_batch_result(completed, failed)
+    apply_sync_results(model_class, instances, completed)
+    logger.info(
+        f"Flushed {len(instances)} {memory_type} mem0 updates: "
+        f"{len(completed)} completed, {len(failed)} failed"
+    )
+
+    for pk, error in failed.items():
+        logger.error(f"Error updating mem0 memory for {memory_type} {pk}: {error}")
+        mem0_update_task.apply_async(
+            (memory_type, pk, instances[pk].version),
+            {"claimed": True, "lane": lane, "generation": instances[pk].generation},
+            countdown=circuit_breaker.get_retry_delay(0),
+        )
+
+
+def flush_delete_batch(memory_type, entries, lane="interactive"):
+    """
+    Delete the mem0 memories of a batch through mem0's batch delete endpoint.
+
+    A chunk the batch endpoint rejects, and the memories the batch
+    response reports as failed, are retried item by item. The deletes that
+    still fail are retried as individual tasks.
+    """
+    from .tasks import get_mem0_instance, mem0_delete_task
+
+    pks_by_mem0_id = {entry["mem0_id"]: entry["pk"] for entry in entries}
+    client = get_mem0_instance()
+
+    def delete(mem0_id):
+        rate_limit.acquire("delete")
+        with concurrency.call_slot("delete"):
+            return client.delete(memory_id=mem0_id)
+
+    failed = {}
+    for chunk in chunked(list(pks_by_mem0_id), settings.MEM0_BULK_BATCH_SIZE):
+        try:
+            rate_limit.acquire("delete")
+            with concurrency.call_slot("batch_delete"):
+                response = client.batch_delete(
+                    [{"memory_id": mem0_id} for mem0_id in chunk]
+                )
+            failures = get_batch_failures(response, chunk)
+        except Exception as exc:
+            logger.warning(
+                f"mem0 batch delete of {len(chunk)} {memory_type} memories failed, "
+                f"retrying individually: {str(exc)}"
+            )
+            failures = dict.fromkeys(chunk, str(exc))
+        else:
+            if failures:
+                logger.warning(
+                    f"mem0 batch delete failed for {len(failures)} of {len(chunk)} "
+                    f"{memory_type} memories, retrying them individually"
+                )
+
+        _, chunk_failed = run_concurrently(
+            delete, {mem0_id: mem0_id for mem0_id in failures}
+        )
+        failed.update(chunk_failed)
+
+    circuit_breaker.record_batch_result(len(pks_by_mem0_id) - len(failed), failed)
+    logger.info(
+        f"Flushed {len(pks_by_mem0_id)} {memory_type} mem0 deletes: "
+        f"{len(failed)} failed"
+    )
+
+    for mem0_id, error in failed.items():
+        pk = pks_by_mem0_id[mem0_id]
+        logger.error(f"Error deleting mem0 memory for {memory_type} {pk}: {error}")
+        mem0_delete_task.apply_async(
+            (memory_type, pk, mem0_id),
+            {"lane": lane},
+            countdown=circuit_breaker.get_retry_delay(0),
+        )
+
+
+def apply_sync_results(model_class, instances, completed):
+    """
+    Write the completed memories of a batch with one UPDATE.
+
+    instances are the memories as sent to mem0 and completed maps primary
+    keys to mem0 memory ids. Failed memories stay processing while their
+    retries run, and memories the sweeper re-drove since the batch claimed
+    them are left to their new sync. As in BaseMemory.mark_as_completed,
+    linked duplicates of completed memories share their mem0 memory, and
+    memories edited while their sync was in flight get another update.
+    Returns the primary keys of the memories marked completed.
+    """
+    from .models import Mem0OutboxEvent
+
+    if not completed:
+        return []
+
+    by_generation = {}
+    for pk in completed:
+        by_generation.setdefault(instances[pk].generation, []).append(pk)
+    claimed = reduce(
+        or_,
+        (
+            Q(pk__in=pks, generation=generation)
+            for generation, pks in by_generation.items()
+        ),
+    )
+    with transaction.atomic():
+        synced = list(
+            model_class.objects.select_for_update()
+            .filter(claimed, status__in=model_class.STATUS_TRANSITIONS["completed"])
+            .values_list("pk", flat=True)
+        )
+        if not synced:
+            return []
+        model_class.objects.filter(pk__in=synced).update(
+            status="completed",
+            mem0_memory_id=Case(
+                *[When(pk=pk, then=Value(completed[pk])) for pk in synced],
+            ),
+            error_message="",
+            synced_content_hash=Case(
+                *[
+                    When(pk=pk, then=Value(instances[pk].raw_content_hash))
+                    for pk in synced
+                ],
+            ),
+            updated_at=timezone.now(),
+        )
+
+    model_class.objects.filter(duplicate_of__in=synced).update(
+        mem0_memory_id=Case(
+            *[When(duplicate_of=pk, then=Value(completed[pk])) for pk in synced]
+        ),
+        status="completed",
+        synced_content_hash=F("raw_content_hash"),
+    )
+    Mem0OutboxEvent.record_stale_updates(model_class, synced)
+    return synced
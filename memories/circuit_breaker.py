@@ -0,0 +1,233 @@
+import json
+import logging
+import random
+from contextlib import contextmanager
+
+import redis
+from django.conf import settings
+
+from memvault.redis_client import get_redis, mark_redis_unavailable
+
+logger = logging.getLogger(__name__)
+
+# Failures within the current failure window
+FAILURES_KEY = "mem0:circuit:failures"
+# Present while the circuit is open; expires after MEM0_CIRCUIT_RESET_TIMEOUT
+OPEN_KEY = "mem0:circuit:open"
+# Present from tripping until a call succeeds; half-open once OPEN_KEY expired
+TRIPPED_KEY = "mem0:circuit:tripped"
+# Held by the single call probing mem0 while half-open
+PROBE_KEY = "mem0:circuit:probe"
+# Tasks parked while the circuit was open
+PARKED_KEY = "mem0:circuit:parked"
+# Parked tasks released per drain while ramping up after recovery
+RAMP_KEY = "mem0:circuit:ramp"
+
+# Permits returned by acquire_permit
+CLOSED = "closed"
+PROBE = "probe"
+
+
+def acquire_permit():
+    """
+    Check whether, and how, a mem0 call may be made.
+
+    The circuit is shared by all workers through Redis. It is closed until
+    MEM0_CIRCUIT_FAILURE_THRESHOLD calls fail within
+    MEM0_CIRCUIT_FAILURE_WINDOW seconds, then open for
+    MEM0_CIRCUIT_RESET_TIMEOUT seconds. After that, one probing call is let
+    through at a time until a call succeeds. Without Redis the circuit is
+    always closed.
+
+    Returns CLOSED, PROBE for the single call probing mem0 while half-open,
+    or None while no call may be made.
+    """
+    client = get_redis()
+    if client is None:
+        return CLOSED
+    try:
+        is_open, tripped = client.mget(OPEN_KEY, TRIPPED_KEY)
+        if is_open:
+            return None
+        if tripped:
+            probing = client.set(
+                PROBE_KEY, 1, nx=True, ex=settings.MEM0_CIRCUIT_RESET_TIMEOUT
+            )
+            return PROBE if probing else None
+    except redis.RedisError as exc:
+        mark_redis_unavailable(exc)
+    return CLOSED
+
+
+def allow_request():
+    """Check whether a mem0 call may be made; see acquire_permit."""
+    return acquire_permit() is not None
+
+
+def release_permit(permit):
+    """
+    Release a permit once its holder is done with mem0.
+
+    A probe whose holder made no mem0 call, e.g. because its memory was
+    claimed elsewhere meanwhile, is released for the next call to probe
+    mem0 rather than blocking probes until it expires. Recording the
+    outcome of a call releases the probe already.
+    """
+    if permit != PROBE:
+        return
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.delete(PROBE_KEY)
+    except redis.RedisError as exc:
+        mark_redis_unavailable(exc)
+
+
+def is_closed():
+    """Check whether the circuit is closed, without taking a probe permit."""
+    client = get_redis()
+    if client is None:
+        return True
+    try:
+        return not any(client.mget(OPEN_KEY, TRIPPED_KEY))
+    except redis.RedisError as exc:
+        mark_redis_unavailable(exc)
+    return True
+
+
+def record_success():
+    """Close the circuit after a successful mem0 call."""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        if client.delete(TRIPPED_KEY):
+            client.delete(PROBE_KEY, FAILURES_KEY)
+            logger.info("mem0 recovered, closing circuit")
+    except redis.RedisError as exc:
+        mark_redis_unavailable(exc)
+
+
+def record_failure():
+    """Count a failed mem0 call, opening the circuit past the threshold."""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        pipeline = client.pipeline(transaction=False)
+        pipeline.incr(FAILURES_KEY)
+        pipeline.exists(TRIPPED_KEY)
+        failures, tripped = pipeline.execute()
+        if failures == 1:
+            client.expire(FAILURES_KEY, settings.MEM0_CIRCUIT_FAILURE_WINDOW)
+        # A failed probe reopens the circuit right away
+        if tripped or failures >= settings.MEM0_CIRCUIT_FAILURE_THRESHOLD:
+            pipeline = client.pipeline(transaction=False)
+            pipeline.set(OPEN_KEY, 1, ex=settings.MEM0_CIRCUIT_RESET_TIMEOUT)
+            pipeline.set(TRIPPED_KEY, 1)
+            pipeline.set(RAMP_KEY, settings.MEM0_PARKED_RAMP_START)
+            pipeline.delete(PROBE_KEY)
+            pipeline.execute()
+            logger.warning(
+                f"mem0 failing ({failures} failures), opening circuit for "
+                f"{settings.MEM0_CIRCUIT_RESET_TIMEOUT}s"
+            )
+    except redis.RedisError as exc:
+        mark_redis_unavailable(exc)
+
+
+def record_batch_result(completed, failed):
+    """Record a batch of mem0 calls as one success or failure."""
+    if completed:
+        record_success()
+    elif failed:
+        record_failure()
+
+
+@contextmanager
+def guard():
+    """Record the outcome of the mem0 call made in the block."""
+    try:
+        yield
+    except Exception:
+        record_failure()
+        raise
+    record_success()
+
+
+def get_retry_delay(retries):
+    """
+    Return the countdown for a retry with exponential backoff and full jitter.
+
+    Random delays spread the retries of tasks that failed together.
+    """
+    ceiling = min(
+        settings.MEM0_RETRY_MAX_DELAY, settings.MEM0_RETRY_BASE_DELAY * 2**retries
+    )
+    return random.uniform(0, ceiling)
+
+
+def park_task(task, args=(), kwargs=None):
+    """
+    Park a task while the circuit is open. Returns whether it was parked.
+
+    Parked tasks are sent again by drain_parked_tasks once mem0 recovers.
+    """
+    client = get_redis()
+    if client is None:
+        return False
+    try:
+        client.rpush(
+            PARKED_KEY,
+            json.dumps({"task": task.name, "args": args, "kwargs": kwargs or {}}),
+        )
+    except redis.RedisError as exc:
+        mark_redis_unavailable(exc)
+        return False
+    logger.info(f"mem0 circuit open, parked {task.name}{tuple(args)}")
+    return True
+
+
+def drain_parked_tasks(app):
+    """
+    Send parked tasks again, ramping up after mem0 recovers. Returns the count.
+
+    While the circuit is open nothing is sent, and while half-open a single
+    task is sent to probe mem0. Once closed, the number of tasks sent per
+    drain starts at MEM0_PARKED_RAMP_START and doubles with every drain up
+    to MEM0_PARKED_RAMP_MAX. Each drain's tasks are spread over
+    MEM0_PARKED_DRAIN_INTERVAL seconds, so the backlog does not reach mem0
+    all at once.
+    """
+    client = get_redis()
+    if client is None:
+        return 0
+    try:
+        is_open, tripped = client.mget(OPEN_KEY, TRIPPED_KEY)
+        if is_open:
+            return 0
+        if tripped:
+            allowance = 1
+        else:
+            allowance = int(client.get(RAMP_KEY) or settings.MEM0_PARKED_RAMP_MAX)
+            client.set(RAMP_KEY, min(allowance * 2, settings.MEM0_PARKED_RAMP_MAX))
+        entries = client.lpop(PARKED_KEY, allowance) or []
+    except redis.RedisError as exc:
+        mark_redis_unavailable(exc)
+        return 0
+
+    interval = settings.MEM0_PARKED_DRAIN_INTERVAL
+    with app.producer_or_acquire() as producer:
+        for index, entry in enumerate(entries):
+            entry = json.loads(entry)
+            app.tasks[entry["task"]].apply_async(
+                entry["args"],
+                entry["kwargs"],
+                countdown=index * interval / len(entries),
+                producer=producer,
+            )
+
+    if entries:
+        logger.info(f"Released {len(entries)} parked mem0 tasks")
+    return len(entries)
@@ -0,0 +1,154 @@
+import base64
+import zlib
+
+from django.conf import settings
+from django.db.models import Q
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # lz4 is an optional, faster codec
+    lz4_frame = None
+
+# zlib level 6 is the stdlib default and a good size/CPU trade-off for text
+ZLIB_LEVEL = 6
+
+# Stored content starting with this marker is in encoded form: compressed,
+# or plain content that itself starts with the marker, escaped behind
+# ESCAPED_CODEC so it is never mistaken for compressed content
+COMPRESSED_PREFIX = "\x01mvz:"
+ESCAPED_CODEC = "raw"
+
+
+def zlib_decompress(data, max_length):
+    return zlib.decompressobj().decompress(data, max_length)
+
+
+CODECS = {
+    "zlib": (
+        lambda data: zlib.compress(data, ZLIB_LEVEL),
+        zlib_decompress,
+    ),
+}
+if lz4_frame is not None:
+    CODECS["lz4"] = (
+        lz4_frame.compress,
+        lambda data, max_length: lz4_frame.LZ4FrameDecompressor().decompress(
+            data, max_length=max_length
+        ),
+    )
+
+
+class StoredContent(str):
+    """
+    Content in its stored form, as loaded from the database.
+
+    Only values loaded from the database are decoded, so content assigned
+    in Python is never mistaken for an encoded value.
+    """
+
+
+def decompress(decompress_func, data):
+    """
+    Decompress data, refusing output over MEMORY_CONTENT_MAX_DECOMPRESSED_BYTES.
+    """
+    limit = settings.MEMORY_CONTENT_MAX_DECOMPRESSED_BYTES
+    output = decompress_func(data, limit + 1)
+    if len(output) > limit:
+        raise ValueError(f"Decompressed content exceeds {limit} bytes")
+    return output
+
+
+def compress_text(text):
+    """Compress a text value into zlib bytes."""
+    return zlib.compress(text.encode("utf-8"), ZLIB_LEVEL)
+
+
+def decompress_text(data):
+    """Decompress zlib bytes produced by compress_text back into text."""
+    return decompress(zlib_decompress, bytes(data)).decode("utf-8")
+
+
+def get_codec_name():
+    """Return the configured content codec, falling back to zlib."""
+    codec = getattr(settings, "MEMORY_CONTENT_COMPRESSION_CODEC", "zlib")
+    return codec if codec in CODECS else "zlib"
+
+
+def is_compressed(value):
+    """Check whether a stored content value is in encoded form."""
+    return isinstance(value, str) and value.startswith(COMPRESSED_PREFIX)
+
+
+def encode_content(text):
+    """
+    Convert memory content into its stored form.
+
+    Content at or above MEMORY_CONTENT_COMPRESSION_THRESHOLD characters is
+    compressed and base64 encoded behind COMPRESSED_PREFIX, so it still fits
+    a text column. Smaller content, or content that does not shrink, is
+    stored as is, unless it starts with COMPRESSED_PREFIX itself, in which
+    case it is escaped.
+    """
+    if not isinstance(text, str):
+        return text
+
+    threshold = settings.MEMORY_CONTENT_COMPRESSION_THRESHOLD
+    if threshold and len(text) >= threshold:
+        codec = get_codec_name()
+        compress, _ = CODECS[codec]
+        payload = base64.b64encode(compress(text.encode("utf-8"))).decode("ascii")
+        encoded = f"{COMPRESSED_PREFIX}{codec}:{payload}"
+        if len(encoded) < len(text):
+            return encoded
+
+    if is_compressed(text):
+        return f"{COMPRESSED_PREFIX}{ESCAPED_CODEC}:{text}"
+    return text
+
+
+def decode_content(value):
+    """Convert a stored content value back into plain text."""
+    if not is_compressed(value):
+        return value
+
+    codec, payload = value[len(COMPRESSED_PREFIX) :].split(":", 1)
+    if codec == ESCAPED_CODEC:
+        return payload
+    if codec not in CODECS:
+        raise ValueError(f"Unsupported content codec: {codec}")
+    _, decompress_func = CODECS[codec]
+    return decompress(decompress_func, base64.b64decode(payload)).decode("utf-8")
+
+
+def load_content(value):
+    """Return the plain text of a content attribute value."""
+    return decode_content(value) if isinstance(value, StoredContent) else value
+
+
+def get_search_prefix(text):
+    """
+    Return the plain text kept searchable for content stored compressed.
+
+    Content long enough to be compressed, or escaped, keeps its first
+    MEMORY_CONTENT_SEARCH_PREFIX characters in plain text. Other content
+    is searched directly and keeps none.
+    """
+    if not isinstance(text, str):
+        return ""
+    threshold = settings.MEMORY_CONTENT_COMPRESSION_THRESHOLD
+    if (not threshold or len(text) < threshold) and not is_compressed(text):
+        return ""
+    return text[: settings.MEMORY_CONTENT_SEARCH_PREFIX]
+
+
+def get_content_search_filter(search):
+    """
+    Build a filter of memories whose content contains search, like icontains.
+
+    The database cannot match inside compressed content, so compressed rows
+    are matched on their search prefix, without decompressing anything.
+    Text past the prefix of compressed content is not searched.
+    """
+    return (
+        Q(content__icontains=search) & ~Q(content__startswith=COMPRESSED_PREFIX)
+    ) | Q(content_search_prefix__icontains=search)
@@ -0,0 +1,223 @@
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import redis
+from celery.signals import task_postrun
+from django.conf import settings
+
+from memvault import metrics
+from memvault.redis_client import get_redis, mark_redis_unavailable
+
+logger = logging.getLogger(__name__)
+
+# Sorted set of in-flight call leases, scored by their expiry
+LEASES_KEY = "mem0:concurrency:leases"
+# Current cluster-wide limit of concurrent mem0 calls
+LIMIT_KEY = "mem0:concurrency:limit"
+# Present while another decrease would be too soon after the last one
+DECREASE_KEY = "mem0:concurrency:decreased"
+
+# Takes a lease unless the leases not yet expired reach the limit
+ACQUIRE_SCRIPT = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", now)
+local limit = tonumber(redis.call("GET", KEYS[2]) or ARGV[3])
+if redis.call("ZCARD", KEYS[1]) < math.floor(limit) then
+    redis.call("ZADD", KEYS[1], now + tonumber(ARGV[2]), ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# Returns a lease and adjusts the limit: +1/limit per healthy call, so the
+# limit grows by about one per round of calls, or times the decrease factor
+# on congestion, at most once per cooldown so one slow burst cuts it once
+RELEASE_SCRIPT = """
+redis.call("ZREM", KEYS[1], ARGV[1])
+local limit = tonumber(redis.call("GET", KEYS[2]) or ARGV[3])
+if ARGV[2] == "1" then
+    if redis.call("SET", KEYS[3], 1, "NX", "PX", ARGV[7]) then
+        limit = math.max(tonumber(ARGV[4]), limit * tonumber(ARGV[6]))
+    end
+else
+    limit = math.min(tonumber(ARGV[5]), limit + 1 / limit)
+end
+redis.call("SET", KEYS[2], tostring(limit))
+return tostring(limit)
+"""
+
+_scripts = {}
+
+# Recent call latencies and queue waits of this process, in seconds
+_latencies = deque(maxlen=1000)
+_queue_waits = deque(maxlen=1000)
+_samples_lock = threading.Lock()
+
+# Monotonic time of the last stats report in this process
+_last_report = 0.0
+
+
+def get_script(client, source):
+    if source not in _scripts:
+        _scripts[source] = client.register_script(source)
+    return _scripts[source]
+
+
+def acquire_lease():
+    """
+    Wait for a slot under the cluster-wide limit. Returns the lease id.
+
+    Returns None without waiting when adaptive concurrency is disabled or
+    Redis is unavailable. Leases expire after MEM0_CONCURRENCY_LEASE_TIMEOUT
+    seconds, so slots of crashed workers are not lost.
+    """
+    if not settings.MEM0_ADAPTIVE_CONCURRENCY:
+        return None
+    client = get_redis()
+    if client is None:
+        return None
+
+    lease = uuid.uuid4().hex
+    script = get_script(client, ACQUIRE_SCRIPT)
+    delay = 0.01
+    while True:
+        try:
+            acquired = script(
+                keys=[LEASES_KEY, LIMIT_KEY],
+                args=[
+                    lease,
+                    settings.MEM0_CONCURRENCY_LEASE_TIMEOUT,
+                    settings.MEM0_CONCURRENCY_INITIAL,
+                ],
+                client=client,
+            )
+        except redis.RedisError as exc:
+            mark_redis_unavailable(exc)
+            return None
+        if acquired:
+            return lease
+        # Poll with jittered backoff, so waiting workers do not hammer Redis
+        time.sleep(random.uniform(0, delay))
+        delay = min(delay * 2, 0.5)
+
+
+def release_lease(lease, congested):
+    """Return a lease and increase or decrease the limit. Returns the limit."""
+    client = get_redis()
+    if lease is None or client is None:
+        return None
+    try:
+        limit = get_script(client, RELEASE_SCRIPT)(
+            keys=[LEASES_KEY, LIMIT_KEY, DECREASE_KEY],
+            args=[
+                lease,
+                int(congested),
+                settings.MEM0_CONCURRENCY_INITIAL,
+                settings.MEM0_CONCURRENCY_MIN,
+                settings.MEM0_CONCURRENCY_MAX,
+                settings.MEM0_CONCURRENCY_DECREASE_FACTOR,
+                int(settings.MEM0_CONCURRENCY_DECREASE_COOLDOWN * 1000),
+            ],
+            client=client,
+        )
+    except redis.RedisError as exc:
+        mark_redis_unavailable(exc)
+        return None
+    return float(limit)
+
+
+@contextmanager
+def call_slot(operation):
+    """
+    Run the mem0 call in the block under the adaptive concurrency limit.
+
+    Calls that fail or take longer than MEM0_CONCURRENCY_LATENCY_TARGET
+    seconds decrease the limit multiplicatively, and other calls increase
+    it additively, so the number of calls in flight across all workers
+    tracks what mem0 can currently take. The call and its wait for a slot
+    are recorded in the metrics of its operation.
+    """
+    queued_at = time.monotonic()
+    lease = acquire_lease()
+    started_at = time.monotonic()
+    metrics.observe_mem0_slot_wait(operation, started_at - queued_at)
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        latency = time.monotonic() - started_at
+        with _samples_lock:
+            _queue_waits.append(started_at - queued_at)
+            _latencies.append(latency)
+        metrics.observe_mem0_call(operation, latency, failed)
+        release_lease(
+            lease,
+            congested=failed or latency > settings.MEM0_CONCURRENCY_LATENCY_TARGET,
+        )
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def get_concurrency_stats():
+    """
+    Return the concurrency stats of mem0 calls.
+
+    "limit" and "in_flight" are cluster-wide, or None without Redis.
+    Latency and queue wait percentiles, in milliseconds, cover the recent
+    calls of this process.
+    """
+    with _samples_lock:
+        latencies, queue_waits = list(_latencies), list(_queue_waits)
+
+    stats = {"limit": None, "in_flight": None, "calls": len(latencies)}
+    for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+        stats[f"latency_{name}_ms"] = percentile(latencies, fraction) * 1000
+        stats[f"queue_wait_{name}_ms"] = percentile(queue_waits, fraction) * 1000
+
+    client = get_redis() if settings.MEM0_ADAPTIVE_CONCURRENCY else None
+    if client is not None:
+        try:
+            limit, in_flight = client.get(LIMIT_KEY), client.zcard(LEASES_KEY)
+        except redis.RedisError as exc:
+            mark_redis_unavailable(exc)
+        else:
+            stats["limit"] = float(limit or settings.MEM0_CONCURRENCY_INITIAL)
+            stats["in_flight"] = in_flight
+    return stats
+
+
+def report_concurrency_stats(force=False):
+    """Log the concurrency stats of mem0 calls, at most once per interval."""
+    global _last_report
+    now = time.monotonic()
+    if not force and now - _last_report < settings.MEM0_CONCURRENCY_STATS_INTERVAL:
+        return
+    _last_report = now
+
+    stats = get_concurrency_stats()
+    if not stats["calls"]:
+        return
+    logger.info(
+        f"mem0 concurrency: limit {stats['limit']}, {stats['in_flight']} in flight, "
+        f"latency p50/p95/p99 {stats['latency_p50_ms']:.0f}/"
+        f"{stats['latency_p95_ms']:.0f}/{stats['latency_p99_ms']:.0f}ms, "
+        f"queue wait p50/p95/p99 {stats['queue_wait_p50_ms']:.0f}/"
+        f"{stats['queue_wait_p95_ms']:.0f}/{stats['queue_wait_p99_ms']:.0f}ms"
+    )
+
+
+@task_postrun.connect
+def report_concurrency_stats_after_task(**kwargs):
+    report_concurrency_stats()
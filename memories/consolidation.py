@@ -0,0 +1,118 @@
+import logging
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import NearDuplicateCluster
+from .neardup import compute_simhashes, find_clusters
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_signatures(model_class, batch_size):
+    """Compute SimHash signatures for memories saved before they existed."""
+    total = 0
+    while True:
+        batch = list(
+            model_class.objects.filter(simhash__isnull=True).order_by("pk")[:batch_size]
+        )
+        if not batch:
+            return total
+        signatures = compute_simhashes([memory.content for memory in batch])
+        for memory, signature in zip(batch, signatures):
+            memory.simhash = signature
+        model_class.objects.bulk_update(batch, ["simhash"])
+        total += len(batch)
+
+
+def detect_near_duplicates(model_class, memory_type):
+    """
+    Find near-duplicate clusters in every scope of model_class.
+
+    Open clusters that are found again keep their id, clusters that vanished
+    are removed and clusters a reviewer dismissed are not reopened.
+    Returns the number of open clusters.
+    """
+    backfill_signatures(model_class, settings.NEAR_DUPLICATE_BATCH_SIZE)
+
+    owner_field = f"{model_class.OWNER_FIELD}_id"
+    clusters = NearDuplicateCluster.objects.filter(
+        memory_type=memory_type, status__in=["open", "dismissed"]
+    )
+    existing = {}
+    dismissed = set()
+    for cluster in clusters:
+        key = (getattr(cluster, owner_field), tuple(cluster.member_ids))
+        if cluster.status == "dismissed":
+            dismissed.add(key)
+        else:
+            existing[key] = cluster
+
+    rows = (
+        model_class.objects.filter(duplicate_of__isnull=True, simhash__isnull=False)
+        .order_by(owner_field, "pk")
+        .values_list(owner_field, "pk", "simhash")
+        .iterator(chunk_size=settings.NEAR_DUPLICATE_BATCH_SIZE)
+    )
+
+    found = set()
+    new_clusters = []
+    for owner_id, group in groupby(rows, key=lambda row: row[0]):
+        group = list(group)
+        ids = [row[1] for row in group]
+        signatures = [row[2] for row in group]
+        for member_ids in find_clusters(
+            ids, signatures, settings.NEAR_DUPLICATE_MAX_DISTANCE
+        ):
+            key = (owner_id, tuple(member_ids))
+            if key in dismissed:
+                continue
+            found.add(key)
+            if key not in existing:
+                new_clusters.append(
+                    NearDuplicateCluster(
+                        memory_type=memory_type,
+                        canonical_id=member_ids[0],
+                        member_ids=member_ids,
+                        **{owner_field: owner_id},
+                    )
+                )
+
+    stale = [cluster.pk for key, cluster in existing.items() if key not in found]
+    with transaction.atomic():
+        NearDuplicateCluster.objects.filter(pk__in=stale).delete()
+        NearDuplicateCluster.objects.bulk_create(new_clusters)
+
+    logger.info(
+        f"Near-duplicate scan for {memory_type}: {len(found)} open clusters, "
+        f"{len(new_clusters)} new, {len(stale)} removed"
+    )
+    return len(found)
+
+
+def merge_cluster(cluster, model_class, keep_id):
+    """
+    Collapse a cluster into the memory keep_id, deleting the other members.
+
+    Deleting goes through the regular delete signal, so the redundant mem0
+    memories are removed as well. Returns the kept memory.
+    """
+    owner_field = f"{model_class.OWNER_FIELD}_id"
+    scope_filter = {owner_field: getattr(cluster, owner_field)}
+
+    with transaction.atomic():
+        kept = model_class.objects.get(pk=keep_id, **scope_filter)
+        redundant = model_class.objects.filter(
+            pk__in=cluster.member_ids, **scope_filter
+        ).exclude(pk=keep_id)
+        for memory in redundant:
+            memory.delete()
+        cluster.status = "merged"
+        cluster.save(update_fields=["status", "updated_at"])
+
+    logger.info(
+        f"Merged near-duplicate cluster {cluster.pk} into {cluster.memory_type} "
+        f"memory {keep_id}"
+    )
+    return kept
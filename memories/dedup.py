@@ -0,0 +1,56 @@
+import hashlib
+import re
+import unicodedata
+
+from django.conf import settings
+
+DEDUP_MODES = ("off", "return", "link")
+
+_whitespace_re = re.compile(r"\s+")
+
+
+def normalize_content(text):
+    """Normalize content so trivially different submissions hash the same."""
+    text = unicodedata.normalize("NFKC", text or "")
+    return _whitespace_re.sub(" ", text).strip().casefold()
+
+
+def compute_content_hash(text):
+    """Return the hex SHA-256 digest of the normalized content."""
+    return hashlib.sha256(normalize_content(text).encode("utf-8")).hexdigest()
+
+
+def compute_raw_content_hash(text):
+    """Return the hex SHA-256 digest of the content exactly as written."""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def get_dedup_mode(requested=None, organization=None):
+    """
+    Resolve the dedup mode for a create request.
+
+    A mode passed with the request wins, then the organization's setting,
+    then MEMORY_DEDUP_MODE.
+    """
+    if requested:
+        return requested
+    if organization is not None and organization.memory_dedup_mode:
+        return organization.memory_dedup_mode
+    return settings.MEMORY_DEDUP_MODE
+
+
+def find_duplicate(model_class, scope_filter, content):
+    """
+    Return the original memory in the scope with the same normalized content.
+
+    Uses the (owner, content_hash) index, so this is a single index probe.
+    """
+    return (
+        model_class.objects.filter(
+            content_hash=compute_content_hash(content),
+            duplicate_of__isnull=True,
+            **scope_filter,
+        )
+        .order_by("pk")
+        .first()
+    )
@@ -0,0 +1,45 @@
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+from .compression import StoredContent, decode_content, encode_content, is_compressed
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """
+    Decompress the stored value the first time the attribute is read.
+
+    Rows are loaded with their raw (possibly compressed) value, so fetching
+    memories never pays for decompression unless content is accessed.
+    """
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, StoredContent):
+            value = decode_content(value)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+    def __set__(self, instance, value):
+        # Defining __set__ makes this a data descriptor, so reads always go
+        # through __get__ even once the value is in the instance __dict__
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.TextField):
+    """
+    TextField that transparently compresses large values.
+
+    Values at or above MEMORY_CONTENT_COMPRESSION_THRESHOLD are stored
+    compressed; see memories.compression for the storage format.
+    """
+
+    descriptor_class = CompressedTextDescriptor
+
+    def from_db_value(self, value, expression, connection):
+        # Only encoded values are marked, so plain content is not copied
+        return StoredContent(value) if is_compressed(value) else value
+
+    def get_prep_value(self, value):
+        return encode_content(super().get_prep_value(value))
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from memories.compression import encode_content, decode_content, get_search_prefix
+from memories.models import MEMORY_MODELS
+
+
+class Command(BaseCommand):
+    """
+    Rewrite stored memory content into the current compression format.
+
+    Compresses existing rows above MEMORY_CONTENT_COMPRESSION_THRESHOLD and
+    decompresses rows that fall below it, e.g. after the threshold changes,
+    and refreshes their search prefix.
+    """
+
+    help = "Backfill memory content into the configured compressed storage format"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows to scan per batch",
+        )
+        parser.add_argument(
+            "--memory-type",
+            choices=sorted(MEMORY_MODELS),
+            help="Only process one memory type",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would change without writing",
+        )
+
+    def handle(self, *args, **options):
+        memory_types = (
+            [options["memory_type"]] if options["memory_type"] else MEMORY_MODELS
+        )
+        for memory_type in memory_types:
+            self.backfill(
+                MEMORY_MODELS[memory_type], options["batch_size"], options["dry_run"]
+            )
+
+    def backfill(self, model_class, batch_size, dry_run):
+        """Scan model_class in primary key order and rewrite stale rows."""
+        last_pk = 0
+        scanned = rewritten = bytes_before = bytes_after = 0
+
+        while True:
+            # values_list returns the raw stored value, so nothing is decoded
+            # unless the row actually needs rewriting
+            rows = list(
+                model_class.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", "content", "content_search_prefix")[:batch_size]
+            )
+            if not rows:
+                break
+
+            with transaction.atomic():
+                for pk, stored, search_prefix in rows:
+                    text = decode_content(stored)
+                    target = encode_content(text)
+                    target_prefix = get_search_prefix(text)
+                    if target == stored and target_prefix == search_prefix:
+                        continue
+                    rewritten += 1
+                    bytes_before += len(stored) + len(search_prefix)
+                    bytes_after += len(target) + len(target_prefix)
+                    if not dry_run:
+                        model_class.objects.filter(pk=pk).update(
+                            content=text, content_search_prefix=target_prefix
+                        )
+
+            scanned += len(rows)
+            last_pk = rows[-1][0]
+
+        self.stdout.write(
+            f"{model_class.__name__}: scanned {scanned}, rewrote {rewritten} "
+            f"({bytes_before} -> {bytes_after} chars)"
+            + (" [dry run]" if dry_run else "")
+        )
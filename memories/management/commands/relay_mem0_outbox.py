@@ -0,0 +1,53 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from memories.outbox import relay_outbox
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Drain the mem0 outbox to the broker.
+
+    Runs continuously by default, polling every MEM0_OUTBOX_POLL_INTERVAL
+    seconds while the outbox is empty, and backing off as long after a
+    broker or database error. Several relays can run side by side.
+    """
+
+    help = "Publish mem0 outbox events to the broker in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.MEM0_OUTBOX_BATCH_SIZE,
+            help="Number of events to publish per batch",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the outbox once and exit",
+        )
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            relayed = relay_outbox(options["batch_size"])
+            self.stdout.write(f"Relayed {relayed} events")
+            return
+
+        self.stdout.write("Relaying mem0 outbox events")
+        while True:
+            close_old_connections()
+            try:
+                relayed = relay_outbox(options["batch_size"])
+            except Exception:
+                # Unpublished events stay in the outbox for the next attempt
+                logger.exception("Relaying mem0 outbox events failed, backing off")
+                relayed = 0
+            if not relayed:
+                time.sleep(settings.MEM0_OUTBOX_POLL_INTERVAL)
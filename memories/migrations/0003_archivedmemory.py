@@ -0,0 +1,102 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memories", "0002_initial"),
+        ("user", "0002_organization_memory_archive_after_days"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedMemory",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "memory_type",
+                    models.CharField(
+                        choices=[
+                            ("user", "User"),
+                            ("team", "Team"),
+                            ("organization", "Organization"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "original_id",
+                    models.BigIntegerField(
+                        help_text="ID of the memory before archival"
+                    ),
+                ),
+                (
+                    "content_blob",
+                    models.BinaryField(help_text="zlib-compressed memory content"),
+                ),
+                (
+                    "mem0_memory_id",
+                    models.CharField(blank=True, max_length=255, null=True),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processing", "Processing"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                ("error_message", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_memories",
+                        to="user.organization",
+                    ),
+                ),
+                (
+                    "team",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_memories",
+                        to="user.team",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_memories",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("memory_type", "original_id"),
+                        name="archivedmemory_unique_original",
+                    )
+                ],
+            },
+        ),
+    ]
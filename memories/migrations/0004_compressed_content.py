@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:04
+
+import memories.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memories", "0003_archivedmemory"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="organizationmemory",
+            name="content",
+            field=memories.fields.CompressedTextField(
+                help_text="The actual memory content"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="teammemory",
+            name="content",
+            field=memories.fields.CompressedTextField(
+                help_text="The actual memory content"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="usermemory",
+            name="content",
+            field=memories.fields.CompressedTextField(
+                help_text="The actual memory content"
+            ),
+        ),
+    ]
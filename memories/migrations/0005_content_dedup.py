@@ -0,0 +1,122 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from memories.dedup import compute_content_hash
+
+
+def backfill_content_hashes(apps, schema_editor):
+    """Compute content hashes for memories created before deduplication."""
+    for model_name in ["UserMemory", "TeamMemory", "OrganizationMemory"]:
+        model_class = apps.get_model("memories", model_name)
+        batch = []
+        for memory in model_class.objects.filter(content_hash="").iterator(
+            chunk_size=1000
+        ):
+            memory.content_hash = compute_content_hash(memory.content)
+            batch.append(memory)
+            if len(batch) >= 1000:
+                model_class.objects.bulk_update(batch, ["content_hash"])
+                batch = []
+        if batch:
+            model_class.objects.bulk_update(batch, ["content_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memories", "0004_compressed_content"),
+        ("user", "0003_organization_memory_dedup_mode"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organizationmemory",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="SHA-256 of the normalized content",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="organizationmemory",
+            name="duplicate_of",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Original memory whose mem0 memory this one shares",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="duplicates",
+                to="memories.organizationmemory",
+            ),
+        ),
+        migrations.AddField(
+            model_name="teammemory",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="SHA-256 of the normalized content",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="teammemory",
+            name="duplicate_of",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Original memory whose mem0 memory this one shares",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="duplicates",
+                to="memories.teammemory",
+            ),
+        ),
+        migrations.AddField(
+            model_name="usermemory",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="SHA-256 of the normalized content",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="usermemory",
+            name="duplicate_of",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Original memory whose mem0 memory this one shares",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="duplicates",
+                to="memories.usermemory",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="organizationmemory",
+            index=models.Index(
+                fields=["organization", "content_hash"],
+                name="memories_or_organiz_daf7b3_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="teammemory",
+            index=models.Index(
+                fields=["team", "content_hash"], name="memories_te_team_id_36f127_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="usermemory",
+            index=models.Index(
+                fields=["user", "content_hash"], name="memories_us_user_id_819d87_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_content_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,126 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memories", "0005_content_dedup"),
+        ("user", "0003_organization_memory_dedup_mode"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organizationmemory",
+            name="simhash",
+            field=models.BigIntegerField(
+                blank=True,
+                editable=False,
+                help_text="64-bit SimHash signature for near-duplicate detection",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="teammemory",
+            name="simhash",
+            field=models.BigIntegerField(
+                blank=True,
+                editable=False,
+                help_text="64-bit SimHash signature for near-duplicate detection",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="usermemory",
+            name="simhash",
+            field=models.BigIntegerField(
+                blank=True,
+                editable=False,
+                help_text="64-bit SimHash signature for near-duplicate detection",
+                null=True,
+            ),
+        ),
+        migrations.CreateModel(
+            name="NearDuplicateCluster",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "memory_type",
+                    models.CharField(
+                        choices=[
+                            ("user", "User"),
+                            ("team", "Team"),
+                            ("organization", "Organization"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "canonical_id",
+                    models.BigIntegerField(help_text="Oldest memory in the cluster"),
+                ),
+                (
+                    "member_ids",
+                    models.JSONField(
+                        help_text="Sorted IDs of all memories in the cluster"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("open", "Open"),
+                            ("merged", "Merged"),
+                            ("dismissed", "Dismissed"),
+                        ],
+                        default="open",
+                        max_length=20,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="near_duplicate_clusters",
+                        to="user.organization",
+                    ),
+                ),
+                (
+                    "team",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="near_duplicate_clusters",
+                        to="user.team",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="near_duplicate_clusters",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["memory_type", "status"],
+                        name="memories_ne_memory__e56650_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memories", "0006_near_duplicates"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Mem0OutboxEvent",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "operation",
+                    models.CharField(
+                        choices=[
+                            ("add", "Add"),
+                            ("update", "Update"),
+                            ("delete", "Delete"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "memory_type",
+                    models.CharField(
+                        choices=[
+                            ("user", "User"),
+                            ("team", "Team"),
+                            ("organization", "Organization"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("memory_id", models.BigIntegerField()),
+                (
+                    "mem0_memory_id",
+                    models.CharField(blank=True, max_length=255, null=True),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+    ]
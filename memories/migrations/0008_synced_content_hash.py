@@ -0,0 +1,53 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:35
+
+from django.db import migrations, models
+
+
+def backfill_synced_content_hashes(apps, schema_editor):
+    """Treat completed memories as synced with their current content."""
+    for model_name in ("UserMemory", "TeamMemory", "OrganizationMemory"):
+        model_class = apps.get_model("memories", model_name)
+        model_class.objects.filter(
+            status="completed", mem0_memory_id__isnull=False
+        ).update(synced_content_hash=models.F("content_hash"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memories", "0007_mem0_outbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organizationmemory",
+            name="synced_content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="content_hash of the content last sent to mem0",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="teammemory",
+            name="synced_content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="content_hash of the content last sent to mem0",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="usermemory",
+            name="synced_content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="content_hash of the content last sent to mem0",
+                max_length=64,
+            ),
+        ),
+        migrations.RunPython(backfill_synced_content_hashes, migrations.RunPython.noop),
+    ]
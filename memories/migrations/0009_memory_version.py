@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memories", "0008_synced_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organizationmemory",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=1,
+                editable=False,
+                help_text="Incremented on every content change",
+            ),
+        ),
+        migrations.AddField(
+            model_name="teammemory",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=1,
+                editable=False,
+                help_text="Incremented on every content change",
+            ),
+        ),
+        migrations.AddField(
+            model_name="usermemory",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=1,
+                editable=False,
+                help_text="Incremented on every content change",
+            ),
+        ),
+    ]
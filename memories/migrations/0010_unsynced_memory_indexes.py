@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memories", "0009_memory_version"),
+        ("user", "0003_organization_memory_dedup_mode"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="organizationmemory",
+            index=models.Index(
+                condition=models.Q(("status", "completed"), _negated=True),
+                fields=["updated_at"],
+                name="organizationmemory_unsynced",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="teammemory",
+            index=models.Index(
+                condition=models.Q(("status", "completed"), _negated=True),
+                fields=["updated_at"],
+                name="teammemory_unsynced",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="usermemory",
+            index=models.Index(
+                condition=models.Q(("status", "completed"), _negated=True),
+                fields=["updated_at"],
+                name="usermemory_unsynced",
+            ),
+        ),
+    ]
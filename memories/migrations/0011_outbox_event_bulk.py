@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memories", "0010_unsynced_memory_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mem0outboxevent",
+            name="bulk",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memories", "0011_outbox_event_bulk"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mem0outboxevent",
+            name="tenant",
+            field=models.CharField(default="default", max_length=32),
+        ),
+    ]
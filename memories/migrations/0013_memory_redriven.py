@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memories", "0012_outbox_event_tenant"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organizationmemory",
+            name="redriven",
+            field=models.BooleanField(
+                default=False,
+                editable=False,
+                help_text="Re-enqueued by the sweeper and not synced since",
+            ),
+        ),
+        migrations.AddField(
+            model_name="teammemory",
+            name="redriven",
+            field=models.BooleanField(
+                default=False,
+                editable=False,
+                help_text="Re-enqueued by the sweeper and not synced since",
+            ),
+        ),
+        migrations.AddField(
+            model_name="usermemory",
+            name="redriven",
+            field=models.BooleanField(
+                default=False,
+                editable=False,
+                help_text="Re-enqueued by the sweeper and not synced since",
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memories", "0013_memory_redriven"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organizationmemory",
+            name="generation",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Incremented when the sweeper re-drives the memory",
+            ),
+        ),
+        migrations.AddField(
+            model_name="teammemory",
+            name="generation",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Incremented when the sweeper re-drives the memory",
+            ),
+        ),
+        migrations.AddField(
+            model_name="usermemory",
+            name="generation",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Incremented when the sweeper re-drives the memory",
+            ),
+        ),
+    ]
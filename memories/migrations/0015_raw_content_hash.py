@@ -0,0 +1,102 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:53
+
+from django.db import migrations, models
+
+from memories.dedup import compute_raw_content_hash
+
+
+def backfill_raw_content_hashes(apps, schema_editor):
+    """
+    Compute raw content hashes, and move sync tracking over to them.
+
+    Memories synced with their normalized content are treated as synced
+    with their current content; the others stay out of sync.
+    """
+    for model_name in ["UserMemory", "TeamMemory", "OrganizationMemory"]:
+        model_class = apps.get_model("memories", model_name)
+        batch = []
+        for memory in model_class.objects.iterator(chunk_size=1000):
+            memory.raw_content_hash = compute_raw_content_hash(memory.content)
+            if memory.synced_content_hash == memory.content_hash:
+                memory.synced_content_hash = memory.raw_content_hash
+            batch.append(memory)
+            if len(batch) >= 1000:
+                model_class.objects.bulk_update(
+                    batch, ["raw_content_hash", "synced_content_hash"]
+                )
+                batch = []
+        if batch:
+            model_class.objects.bulk_update(
+                batch, ["raw_content_hash", "synced_content_hash"]
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memories", "0014_memory_generation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organizationmemory",
+            name="raw_content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="SHA-256 of the content as written",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="teammemory",
+            name="raw_content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="SHA-256 of the content as written",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="usermemory",
+            name="raw_content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="SHA-256 of the content as written",
+                max_length=64,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="organizationmemory",
+            name="synced_content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="raw_content_hash of the content last sent to mem0",
+                max_length=64,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="teammemory",
+            name="synced_content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="raw_content_hash of the content last sent to mem0",
+                max_length=64,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="usermemory",
+            name="synced_content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="raw_content_hash of the content last sent to mem0",
+                max_length=64,
+            ),
+        ),
+        migrations.RunPython(backfill_raw_content_hashes, migrations.RunPython.noop),
+    ]
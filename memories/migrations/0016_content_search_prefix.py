@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:20
+
+from django.db import migrations, models
+
+from memories.compression import COMPRESSED_PREFIX, get_search_prefix
+
+
+def backfill_search_prefixes(apps, schema_editor):
+    """Keep the search prefix of content stored compressed before it existed."""
+    for model_name in ["UserMemory", "TeamMemory", "OrganizationMemory"]:
+        model_class = apps.get_model("memories", model_name)
+        batch = []
+        for memory in model_class.objects.filter(
+            content__startswith=COMPRESSED_PREFIX
+        ).iterator(chunk_size=1000):
+            memory.content_search_prefix = get_search_prefix(memory.content)
+            batch.append(memory)
+            if len(batch) >= 1000:
+                model_class.objects.bulk_update(batch, ["content_search_prefix"])
+                batch = []
+        if batch:
+            model_class.objects.bulk_update(batch, ["content_search_prefix"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memories", "0015_raw_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organizationmemory",
+            name="content_search_prefix",
+            field=models.TextField(
+                blank=True,
+                editable=False,
+                help_text="Leading plain text of content stored compressed, for search",
+            ),
+        ),
+        migrations.AddField(
+            model_name="teammemory",
+            name="content_search_prefix",
+            field=models.TextField(
+                blank=True,
+                editable=False,
+                help_text="Leading plain text of content stored compressed, for search",
+            ),
+        ),
+        migrations.AddField(
+            model_name="usermemory",
+            name="content_search_prefix",
+            field=models.TextField(
+                blank=True,
+                editable=False,
+                help_text="Leading plain text of content stored compressed, for search",
+            ),
+        ),
+        migrations.RunPython(backfill_search_prefixes, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,21 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Cast
 from django.forms import ValidationError
+from django.utils import timezone
 from user.models import User, Team, Organization
+from .compression import (
+    compress_text,
+    decompress_text,
+    load_content,
+    get_search_prefix,
+)
+from .fields import CompressedTextField
+from .dedup import compute_content_hash, compute_raw_content_hash
+from .neardup import compute_simhash
+
+# Tenant of memories owned by no organization; other tenants are keyed by
+# organization id
+DEFAULT_TENANT = "default"
 
 
 class BaseMemory(models.Model):
@@ -12,15 +27,94 @@ class BaseMemory(models.Model):
         ("completed", "Completed"),
         ("failed", "Failed"),
     ]
+    # Statuses each status can be reached from. Only one worker can claim a
+    # memory for processing, and only the claiming worker completes it.
+    STATUS_TRANSITIONS = {
+        "processing": ["pending", "completed", "failed"],
+        "completed": ["processing"],
+        "failed": ["processing"],
+    }
+    # Lookup of the organization owning a memory, the tenant its mem0 syncs
+    # are scheduled under, or None for the default tenant
+    TENANT_FIELD = None
+    # Columns a save of an existing memory writes. The sync state (status,
+    # mem0_memory_id) is left to conditional updates, so an instance loaded
+    # before a sync finished cannot undo the sync when saved.
+    CONTENT_FIELDS = {
+        "content",
+        "content_search_prefix",
+        "content_hash",
+        "raw_content_hash",
+        "simhash",
+        "duplicate_of",
+        "version",
+        "redriven",
+        "updated_at",
+    }
 
     id = models.BigAutoField(primary_key=True)
 
     # Memory content
-    content = models.TextField(help_text="The actual memory content")
+    content = CompressedTextField(help_text="The actual memory content")
+    content_search_prefix = models.TextField(
+        blank=True,
+        editable=False,
+        help_text="Leading plain text of content stored compressed, for search",
+    )
     mem0_memory_id = models.CharField(
         max_length=255, null=True, blank=True, help_text="ID from mem0 ai"
     )
 
+    # Deduplication
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        help_text="SHA-256 of the normalized content",
+    )
+    duplicate_of = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="duplicates",
+        help_text="Original memory whose mem0 memory this one shares",
+    )
+    simhash = models.BigIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="64-bit SimHash signature for near-duplicate detection",
+    )
+    # Sync tracking
+    raw_content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        help_text="SHA-256 of the content as written",
+    )
+    synced_content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        help_text="raw_content_hash of the content last sent to mem0",
+    )
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        help_text="Incremented on every content change",
+    )
+    redriven = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Re-enqueued by the sweeper and not synced since",
+    )
+    generation = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Incremented when the sweeper re-drives the memory",
+    )
+
     # Status and error handling
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default="pending")
     error_message = models.TextField(blank=True)
@@ -37,35 +131,234 @@ class BaseMemory(models.Model):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Track original content for change detection
-        self._original_content = self.content
+        # Track original content for change detection. The raw value is kept
+        # so loading a row does not decompress its content.
+        self._original_content_raw = self.__dict__.get("content")
 
-    def mark_as_processing(self):
-        """Mark memory as being processed."""
-        self._skip_signals = True
-        self.status = "processing"
-        self.save(update_fields=["status", "updated_at"])
-        delattr(self, "_skip_signals")
+    @property
+    def _original_content(self):
+        return load_content(self._original_content_raw)
+
+    @_original_content.setter
+    def _original_content(self, value):
+        self._original_content_raw = value
+
+    def save(self, *args, **kwargs):
+        # The mem0 outbox event written by the post_save signal, and the
+        # duplicates detached from an edited memory, commit or roll back
+        # together with the memory
+        with transaction.atomic():
+            needs_own_mem0_memory = self._prepare_content_change(kwargs)
+            super().save(*args, **kwargs)
+            if needs_own_mem0_memory:
+                # Only while the memory is at this edit's version and has
+                # not been re-driven since the edited instance was loaded
+                type(self).objects.filter(
+                    pk=self.pk, version=self.version, generation=self.generation
+                ).update(status="pending", mem0_memory_id=None)
+
+    def _prepare_content_change(self, kwargs):
+        """
+        Update the content-derived columns before a save.
+
+        Unless the caller names update_fields, a save of an existing memory
+        only writes CONTENT_FIELDS, whether or not the content changed.
+        Returns whether the edit needs a mem0 memory of its own.
+        """
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "content" not in update_fields:
+            return False
+        if update_fields is None and not self._state.adding:
+            update_fields = self.CONTENT_FIELDS
+        content_hash = compute_content_hash(self.content)
+        raw_content_hash = compute_raw_content_hash(self.content)
+        needs_own_mem0_memory = False
+        if not self._state.adding and content_hash != self.content_hash:
+            # An edited duplicate no longer matches its original, and an
+            # edited original no longer matches the mem0 memory its
+            # duplicates share, so either needs its own mem0 memory
+            if self.detach_duplicates() or self.duplicate_of_id:
+                self.duplicate_of = None
+                self.mem0_memory_id = None
+                self.status = "pending"
+                self._needs_mem0_add = True
+                needs_own_mem0_memory = True
+        elif self.duplicate_of_id:
+            # A duplicate matching its original shares the original's mem0
+            # memory, which its own content never updates
+            self.synced_content_hash = raw_content_hash
+            if update_fields is not None:
+                update_fields = set(update_fields) | {"synced_content_hash"}
+        if not self._state.adding and raw_content_hash != self.raw_content_hash:
+            # Queued mem0 tasks of older versions are superseded, and the
+            # edit, even one of case or whitespace only, syncs like any other
+            self.version += 1
+            self.redriven = False
+        if content_hash != self.content_hash or self.simhash is None:
+            self.simhash = compute_simhash(self.content)
+        self.content_hash = content_hash
+        self.raw_content_hash = raw_content_hash
+        self.content_search_prefix = get_search_prefix(self.content)
+        if update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | self.CONTENT_FIELDS
+        return needs_own_mem0_memory
+
+    def detach_duplicates(self):
+        """
+        Leave the memory's mem0 memory to the duplicates linked to it.
+
+        Duplicates keep the content they were linked with when the memory is
+        edited. The oldest becomes the original of the others, and is added
+        to mem0 itself if the memory has no mem0 memory yet. Returns whether
+        other memories, hot or archived, still use the memory's mem0 memory.
+        """
+        model_class = type(self)
+        duplicates = list(model_class.objects.filter(duplicate_of=self).order_by("pk"))
+        if duplicates:
+            original, *others = duplicates
+            model_class.objects.filter(pk__in=[other.pk for other in others]).update(
+                duplicate_of=original
+            )
+            original.duplicate_of = None
+            update_fields = ["duplicate_of"]
+            if not original.mem0_memory_id:
+                original.status = "pending"
+                original._needs_mem0_add = True
+                update_fields.append("status")
+            original.save(update_fields=update_fields)
+
+        if not self.mem0_memory_id:
+            return False
+        owner_field = f"{self.OWNER_FIELD}_id"
+        owner = {owner_field: getattr(self, owner_field)}
+        return (
+            model_class.objects.filter(mem0_memory_id=self.mem0_memory_id, **owner)
+            .exclude(pk=self.pk)
+            .exists()
+            or ArchivedMemory.objects.filter(
+                memory_type=self.scope, mem0_memory_id=self.mem0_memory_id, **owner
+            ).exists()
+        )
 
-    def mark_as_completed(self, mem0_memory_id=None):
-        """Mark memory as successfully processed."""
-        self._skip_signals = True
-        self.status = "completed"
-        self.error_message = ""
+    @property
+    def tenant(self):
+        """Return the tenant the memory's mem0 syncs are scheduled under."""
+        if self.TENANT_FIELD is None:
+            return DEFAULT_TENANT
+        value = self
+        for name in self.TENANT_FIELD.split("__"):
+            value = getattr(value, name)
+        return str(value)
+
+    @classmethod
+    def get_tenant_expression(cls):
+        """Return the query expression of a memory's tenant."""
+        if cls.TENANT_FIELD is None:
+            return models.Value(DEFAULT_TENANT)
+        return Cast(cls.TENANT_FIELD, models.CharField())
+
+    @classmethod
+    def transition(
+        cls, pk, status, version=None, condition=None, generation=None, **fields
+    ):
+        """
+        Move a memory to status with one conditional UPDATE.
+
+        The memory is only updated if its status is one STATUS_TRANSITIONS
+        allows moving from, and if it is at version, at generation and
+        matches condition when given. Concurrent workers therefore cannot
+        both make the same transition, and syncs claimed before the sweeper
+        re-drove the memory cannot finish it. Returns the number of updated
+        rows.
+        """
+        queryset = cls.objects.filter(pk=pk, status__in=cls.STATUS_TRANSITIONS[status])
+        if version is not None:
+            queryset = queryset.filter(version=version)
+        if generation is not None:
+            queryset = queryset.filter(generation=generation)
+        if condition is not None:
+            queryset = queryset.filter(condition)
+        return queryset.update(status=status, updated_at=timezone.now(), **fields)
+
+    def mark_as_processing(self, version=None, condition=None):
+        """Claim the memory for a mem0 sync. Returns whether it was claimed."""
+        if not self.transition(self.pk, "processing", version, condition):
+            return False
+        self.status = "processing"
+        return True
+
+    def mark_as_completed(
+        self, mem0_memory_id=None, synced_content=None, generation=None
+    ):
+        """
+        Mark memory as successfully processed.
+
+        synced_content is the content that was sent to mem0. If the memory
+        was edited meanwhile, an update is recorded so the edit is not lost.
+        Returns whether the memory was still processing, at generation when
+        given.
+        """
+        fields = {"error_message": ""}
         if mem0_memory_id:
-            self.mem0_memory_id = mem0_memory_id
-        self.save(
-            update_fields=["status", "mem0_memory_id", "error_message", "updated_at"]
+            fields["mem0_memory_id"] = mem0_memory_id
+        if synced_content is not None:
+            fields["synced_content_hash"] = compute_raw_content_hash(synced_content)
+        if not self.transition(self.pk, "completed", generation=generation, **fields):
+            return False
+        self.status = "completed"
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+        # Duplicates linked while this memory was still processing share its
+        # mem0 memory once it exists
+        if self.mem0_memory_id:
+            type(self).objects.filter(duplicate_of=self).update(
+                mem0_memory_id=self.mem0_memory_id,
+                status="completed",
+                synced_content_hash=models.F("raw_content_hash"),
+            )
+
+        if synced_content is not None:
+            Mem0OutboxEvent.record_stale_updates(type(self), [self.pk])
+        return True
+
+    def copy_original_sync_state(self):
+        """
+        Take over the sync state of the original of a linked duplicate.
+
+        The original may have completed between the duplicate lookup and the
+        insert, after its completion updated the duplicates it had. Returns
+        whether the state changed.
+        """
+        model_class = type(self)
+        original = (
+            model_class.objects.filter(pk=self.duplicate_of_id)
+            .values("status", "mem0_memory_id")
+            .first()
+        )
+        if original is None or not original["mem0_memory_id"]:
+            return False
+        updated = model_class.objects.filter(
+            pk=self.pk, duplicate_of=self.duplicate_of_id
+        ).update(
+            mem0_memory_id=original["mem0_memory_id"],
+            status="completed",
+            synced_content_hash=models.F("raw_content_hash"),
         )
-        delattr(self, "_skip_signals")
+        if not updated:
+            return False
+        self.mem0_memory_id = original["mem0_memory_id"]
+        self.status = "completed"
+        self.synced_content_hash = self.raw_content_hash
+        return True
 
     def mark_as_failed(self, error_message=""):
-        """Mark memory as failed with optional error message."""
-        self._skip_signals = True
+        """Mark memory as failed. Returns whether it was still processing."""
+        if not self.transition(self.pk, "failed", error_message=error_message):
+            return False
         self.status = "failed"
         self.error_message = error_message
-        self.save(update_fields=["status", "error_message", "updated_at"])
-        delattr(self, "_skip_signals")
+        return True
 
 
 class UserMemory(BaseMemory):
@@ -73,10 +366,19 @@ class UserMemory(BaseMemory):
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="memories")
 
+    OWNER_FIELD = "user"
+
     class Meta:
         indexes = [
             models.Index(fields=["user", "-created_at"]),
             models.Index(fields=["user", "status"]),
+            models.Index(fields=["user", "content_hash"]),
+            # Memories still waiting for a mem0 sync, for the sweeper
+            models.Index(
+                fields=["updated_at"],
+                condition=~models.Q(status="completed"),
+                name="usermemory_unsynced",
+            ),
         ]
 
     def __str__(self):
@@ -96,10 +398,20 @@ class TeamMemory(BaseMemory):
 
     team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="memories")
 
+    OWNER_FIELD = "team"
+    TENANT_FIELD = "team__organization_id"
+
     class Meta:
         indexes = [
             models.Index(fields=["team", "-created_at"]),
             models.Index(fields=["team", "status"]),
+            models.Index(fields=["team", "content_hash"]),
+            # Memories still waiting for a mem0 sync, for the sweeper
+            models.Index(
+                fields=["updated_at"],
+                condition=~models.Q(status="completed"),
+                name="teammemory_unsynced",
+            ),
         ]
 
     def __str__(self):
@@ -121,10 +433,20 @@ class OrganizationMemory(BaseMemory):
         Organization, on_delete=models.CASCADE, related_name="memories"
     )
 
+    OWNER_FIELD = "organization"
+    TENANT_FIELD = "organization_id"
+
     class Meta:
         indexes = [
             models.Index(fields=["organization", "-created_at"]),
             models.Index(fields=["organization", "status"]),
+            models.Index(fields=["organization", "content_hash"]),
+            # Memories still waiting for a mem0 sync, for the sweeper
+            models.Index(
+                fields=["updated_at"],
+                condition=~models.Q(status="completed"),
+                name="organizationmemory_unsynced",
+            ),
         ]
 
     def __str__(self):
@@ -137,3 +459,267 @@ class OrganizationMemory(BaseMemory):
     @property
     def owner(self):
         return self.organization
+
+
+class ArchivedMemory(models.Model):
+    """
+    Cold storage for old, completed memories moved out of the primary tables.
+
+    Content is kept zlib-compressed and the row keeps the original memory id,
+    so archived memories can still be served through the detail views.
+    """
+
+    MEMORY_TYPE_CHOICES = [
+        ("user", "User"),
+        ("team", "Team"),
+        ("organization", "Organization"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    memory_type = models.CharField(max_length=20, choices=MEMORY_TYPE_CHOICES)
+    original_id = models.BigIntegerField(help_text="ID of the memory before archival")
+
+    # Exactly one owner is set, matching memory_type
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="archived_memories",
+    )
+    team = models.ForeignKey(
+        Team,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="archived_memories",
+    )
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="archived_memories",
+    )
+
+    content_blob = models.BinaryField(help_text="zlib-compressed memory content")
+    mem0_memory_id = models.CharField(max_length=255, null=True, blank=True)
+    status = models.CharField(max_length=50, choices=BaseMemory.STATUS_CHOICES)
+    error_message = models.TextField(blank=True)
+
+    # Timestamps of the original memory
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["memory_type", "original_id"],
+                name="archivedmemory_unique_original",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Archived {self.memory_type} memory {self.original_id}"
+
+    @property
+    def content(self):
+        return decompress_text(self.content_blob)
+
+    @property
+    def tenant(self):
+        if self.organization_id:
+            return str(self.organization_id)
+        if self.team_id:
+            return str(self.team.organization_id)
+        return DEFAULT_TENANT
+
+    @classmethod
+    def from_memory(cls, memory):
+        """Build an (unsaved) archive row from a hot memory instance."""
+        return cls(
+            memory_type=memory.scope,
+            original_id=memory.pk,
+            user_id=getattr(memory, "user_id", None),
+            team_id=getattr(memory, "team_id", None),
+            organization_id=getattr(memory, "organization_id", None),
+            content_blob=compress_text(memory.content),
+            mem0_memory_id=memory.mem0_memory_id,
+            status=memory.status,
+            error_message=memory.error_message,
+            created_at=memory.created_at,
+            updated_at=memory.updated_at,
+        )
+
+    def to_memory(self):
+        """Rehydrate an unsaved memory instance so serializers can render it."""
+        model_class = MEMORY_MODELS[self.memory_type]
+        owner_field = f"{model_class.OWNER_FIELD}_id"
+        return model_class(
+            id=self.original_id,
+            content=self.content,
+            mem0_memory_id=self.mem0_memory_id,
+            status=self.status,
+            error_message=self.error_message,
+            created_at=self.created_at,
+            updated_at=self.updated_at,
+            **{owner_field: getattr(self, owner_field)},
+        )
+
+    def restore(self):
+        """
+        Move the memory back to its hot table under its original id.
+
+        Its mem0 memory is kept, so neither the move nor the archive row's
+        deletion records a mem0 sync. Returns the restored memory.
+        """
+        memory = self.to_memory()
+        memory.content_hash = compute_content_hash(memory.content)
+        memory.raw_content_hash = memory.synced_content_hash = (
+            compute_raw_content_hash(memory.content)
+        )
+        memory._skip_signals = True
+        self._skip_signals = True
+        with transaction.atomic():
+            memory.save(force_insert=True)
+            # Inserting sets created_at, but the memory keeps its age
+            type(memory).objects.filter(pk=memory.pk).update(created_at=self.created_at)
+            self.delete()
+        memory.created_at = self.created_at
+        del memory._skip_signals
+        return memory
+
+
+class NearDuplicateCluster(models.Model):
+    """A group of near-duplicate memories within one scope, awaiting review."""
+
+    STATUS_CHOICES = [
+        ("open", "Open"),
+        ("merged", "Merged"),
+        ("dismissed", "Dismissed"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    memory_type = models.CharField(
+        max_length=20, choices=ArchivedMemory.MEMORY_TYPE_CHOICES
+    )
+
+    # Scope owner, matching memory_type
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="near_duplicate_clusters",
+    )
+    team = models.ForeignKey(
+        Team,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="near_duplicate_clusters",
+    )
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="near_duplicate_clusters",
+    )
+
+    canonical_id = models.BigIntegerField(help_text="Oldest memory in the cluster")
+    member_ids = models.JSONField(help_text="Sorted IDs of all memories in the cluster")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="open")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["memory_type", "status"]),
+        ]
+
+    def __str__(self):
+        return f"Near-duplicate {self.memory_type} cluster {self.id}"
+
+
+class Mem0OutboxEvent(models.Model):
+    """
+    A pending mem0 sync operation.
+
+    Written by the memory signals in the same transaction as the memory
+    change and drained by the outbox relay, so the broker is never on the
+    request path and events exist only for committed changes.
+    """
+
+    OPERATION_CHOICES = [
+        ("add", "Add"),
+        ("update", "Update"),
+        ("delete", "Delete"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES)
+    memory_type = models.CharField(
+        max_length=20, choices=ArchivedMemory.MEMORY_TYPE_CHOICES
+    )
+    memory_id = models.BigIntegerField()
+    mem0_memory_id = models.CharField(max_length=255, null=True, blank=True)
+    # Published to the bulk lane rather than with interactive changes
+    bulk = models.BooleanField(default=False)
+    # Tenant whose fair share of mem0 syncs the event is scheduled in
+    tenant = models.CharField(max_length=32, default=DEFAULT_TENANT)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"mem0 {self.operation} for {self.memory_type} {self.memory_id}"
+
+    @classmethod
+    def record_stale_updates(cls, model_class, pks):
+        """
+        Record updates for synced memories edited since their content was sent.
+
+        Edits made while a memory's add or update is in flight are skipped
+        by the batches, so checking after every sync keeps them from being
+        lost. Returns the number of updates recorded.
+        """
+        memory_type = next(
+            name for name, model in MEMORY_MODELS.items() if model is model_class
+        )
+        stale = (
+            model_class.objects.filter(pk__in=pks, mem0_memory_id__isnull=False)
+            .exclude(raw_content_hash=models.F("synced_content_hash"))
+            .annotate(tenant=model_class.get_tenant_expression())
+            .values_list("pk", "mem0_memory_id", "tenant")
+        )
+        events = cls.objects.bulk_create(
+            cls(
+                operation="update",
+                memory_type=memory_type,
+                memory_id=pk,
+                mem0_memory_id=mem0_memory_id,
+                tenant=tenant,
+            )
+            for pk, mem0_memory_id, tenant in stale
+        )
+        return len(events)
+
+    def to_entry(self):
+        """Return the batch entry published for this event."""
+        entry = {"pk": self.memory_id}
+        if self.operation != "add":
+            entry["mem0_id"] = self.mem0_memory_id
+        if self.tenant != DEFAULT_TENANT:
+            entry["tenant"] = self.tenant
+        return entry
+
+
+MEMORY_MODELS = {
+    "user": UserMemory,
+    "team": TeamMemory,
+    "organization": OrganizationMemory,
+}
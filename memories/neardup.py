@@ -0,0 +1,255 @@
+import hashlib
+import logging
+import re
+from itertools import combinations
+
+import numpy as np
+
+from .dedup import normalize_content
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_BITS = 64
+
+# Near duplicates are signatures at most this many bits apart
+DEFAULT_MAX_DISTANCE = 6
+
+# Buckets larger than this are dominated by trivial content (e.g. single
+# words) and would make candidate generation quadratic again, so they are
+# split further before their pairs are expanded
+MAX_BUCKET_SIZE = 500
+
+_token_re = re.compile(r"\w+")
+_bit_shifts = np.arange(SIGNATURE_BITS, dtype=np.uint64)
+
+
+def get_features(text):
+    """Return the word bigram shingles (or single words) of the normalized text."""
+    words = _token_re.findall(normalize_content(text))
+    if len(words) < 2:
+        return words
+    return [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def hash_feature(feature):
+    """Hash a feature to an unsigned 64-bit integer."""
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def compute_simhashes(texts):
+    """
+    Compute 64-bit SimHash signatures for a batch of texts.
+
+    Feature hashes of the whole batch are expanded into one bit matrix and
+    summed per text with NumPy, so the per-text Python work is only
+    tokenization. Returns signed 64-bit integers, matching BigIntegerField.
+    """
+    feature_hashes = []
+    owners = []
+    for index, text in enumerate(texts):
+        for feature in get_features(text):
+            feature_hashes.append(hash_feature(feature))
+            owners.append(index)
+
+    if not feature_hashes:
+        return [0] * len(texts)
+
+    hashes = np.array(feature_hashes, dtype=np.uint64)
+    owners = np.array(owners, dtype=np.intp)
+    bits = ((hashes[:, None] >> _bit_shifts) & np.uint64(1)).astype(np.int32)
+
+    # Per text and bit: +1 for each feature with the bit set, -1 otherwise
+    votes = np.zeros((len(texts), SIGNATURE_BITS), dtype=np.int32)
+    np.add.at(votes, owners, bits * 2 - 1)
+
+    signatures = ((votes > 0).astype(np.uint64) << _bit_shifts).sum(
+        axis=1, dtype=np.uint64
+    )
+    return signatures.view(np.int64).tolist()
+
+
+def compute_simhash(text):
+    """Compute the SimHash signature of a single text."""
+    return compute_simhashes([text])[0]
+
+
+def hamming_distances(left, right):
+    """Vectorized Hamming distance between two arrays of 64-bit signatures."""
+    xor = np.bitwise_xor(left.view(np.uint64), right.view(np.uint64))
+    return np.unpackbits(xor.view(np.uint8)).reshape(-1, SIGNATURE_BITS).sum(axis=1)
+
+
+def get_lsh_masks(max_distance):
+    """
+    Return the bit masks of the LSH tables for max_distance.
+
+    The 64 bits are split into blocks, and every table keys on all but
+    max_distance of them. Signatures within max_distance bits differ in at
+    most max_distance blocks, so they match exactly in at least one table
+    (pigeonhole). Using about 4/3 * max_distance blocks keeps every key at
+    16 bits or more, so buckets stay small.
+    """
+    block_count = max(max_distance + 1, -(-4 * max_distance // 3))
+    blocks = np.array_split(np.arange(SIGNATURE_BITS), block_count)
+    block_masks = [sum(1 << int(bit) for bit in block) for block in blocks]
+
+    return [
+        sum(block_masks[index] for index in chosen)
+        for chosen in combinations(range(block_count), block_count - max_distance)
+    ]
+
+
+def get_buckets(keys):
+    """Group indices by key. Returns the sorted indices, bucket starts and sizes."""
+    order = np.argsort(keys, kind="stable")
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys[order])) + 1))
+    sizes = np.diff(np.append(starts, len(order)))
+    return order, starts, sizes
+
+
+def get_band_masks(mask, band_count):
+    """Split the bits outside mask into band_count disjoint band masks."""
+    free = [bit for bit in range(SIGNATURE_BITS) if not mask >> bit & 1]
+    if len(free) < band_count:
+        return []
+    return [
+        sum(1 << int(bit) for bit in band) for band in np.array_split(free, band_count)
+    ]
+
+
+def get_bucket_pairs(members):
+    """Return all pairs of a bucket's members, as two arrays."""
+    first, second = np.triu_indices(len(members), k=1)
+    left, right = members[first], members[second]
+    return np.minimum(left, right), np.maximum(left, right)
+
+
+def split_bucket(members, unsigned, mask, max_distance, capped, split=True):
+    """
+    Return the candidate pairs of a bucket larger than MAX_BUCKET_SIZE.
+
+    Members with equal signatures are paired with one representative only.
+    Representatives are split once more on max_distance + 1 bands of the
+    bits outside mask: pairs within max_distance differ in at most
+    max_distance of those bands, so they still share a sub-bucket in one of
+    them. Sub-buckets still too large are capped at MAX_BUCKET_SIZE members
+    and their sizes appended to capped. Returns a list of (lefts, rights)
+    arrays.
+    """
+    _, first, inverse = np.unique(
+        unsigned[members], return_index=True, return_inverse=True
+    )
+    representatives = members[first]
+    copies = members != representatives[inverse]
+    pairs = []
+    if copies.any():
+        left, right = representatives[inverse][copies], members[copies]
+        pairs.append((np.minimum(left, right), np.maximum(left, right)))
+
+    if len(representatives) <= MAX_BUCKET_SIZE:
+        if len(representatives) > 1:
+            pairs.append(get_bucket_pairs(representatives))
+        return pairs
+
+    bands = get_band_masks(mask, max_distance + 1) if split else []
+    if not bands:
+        capped.append(len(representatives))
+        pairs.append(get_bucket_pairs(representatives[:MAX_BUCKET_SIZE]))
+        return pairs
+
+    for band in bands:
+        keys = unsigned[representatives] & np.uint64(band)
+        order, starts, sizes = get_buckets(keys)
+        for start, size in zip(starts[sizes > 1], sizes[sizes > 1]):
+            pairs.extend(
+                split_bucket(
+                    representatives[order[start : start + size]],
+                    unsigned,
+                    mask | band,
+                    max_distance,
+                    capped,
+                    split=False,
+                )
+            )
+    return pairs
+
+
+def find_candidate_pairs(signatures, max_distance):
+    """
+    Return index pairs sharing a bucket in at least one LSH table, as two arrays.
+    """
+    unsigned = signatures.view(np.uint64)
+    lefts, rights = [], []
+    capped = []
+
+    for mask in get_lsh_masks(max_distance):
+        keys = unsigned & np.uint64(mask)
+        order, starts, sizes = get_buckets(keys)
+        # Expand all buckets of the same size at once
+        for size in np.unique(sizes[(sizes > 1) & (sizes <= MAX_BUCKET_SIZE)]):
+            bucket_starts = starts[sizes == size][:, None]
+            first, second = np.triu_indices(size, k=1)
+            left = order[bucket_starts + first].ravel()
+            right = order[bucket_starts + second].ravel()
+            lefts.append(np.minimum(left, right))
+            rights.append(np.maximum(left, right))
+        oversized = sizes > MAX_BUCKET_SIZE
+        for start, size in zip(starts[oversized], sizes[oversized]):
+            for left, right in split_bucket(
+                order[start : start + size], unsigned, mask, max_distance, capped
+            ):
+                lefts.append(left)
+                rights.append(right)
+
+    if capped:
+        logger.warning(
+            f"Capped {len(capped)} LSH buckets of up to {max(capped)} signatures "
+            f"at {MAX_BUCKET_SIZE}, near duplicates in them may be missed"
+        )
+    if not lefts:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    # Pairs found in several tables are reported once
+    count = len(signatures)
+    encoded = np.unique(np.concatenate(lefts) * count + np.concatenate(rights))
+    return encoded // count, encoded % count
+
+
+def find_clusters(ids, signatures, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    Group memories whose signatures are within max_distance bits.
+
+    Candidates come from LSH tables that guarantee every pair within
+    max_distance is found, are verified with a vectorized Hamming distance
+    and are then merged with union-find. Returns a list of
+    sorted id lists with at least two members each.
+    """
+    if len(ids) < 2:
+        return []
+
+    signatures = np.asarray(signatures, dtype=np.int64)
+    lefts, rights = find_candidate_pairs(signatures, max_distance)
+    if not len(lefts):
+        return []
+
+    close = hamming_distances(signatures[lefts], signatures[rights]) <= max_distance
+
+    parent = list(range(len(ids)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for left, right in zip(lefts[close].tolist(), rights[close].tolist()):
+        root_left, root_right = find(left), find(right)
+        if root_left != root_right:
+            parent[max(root_left, root_right)] = min(root_left, root_right)
+
+    groups = {}
+    for index, memory_id in enumerate(ids):
+        groups.setdefault(find(index), []).append(memory_id)
+
+    return [sorted(group) for group in groups.values() if len(group) > 1]
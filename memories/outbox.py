@@ -0,0 +1,88 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .batching import publish_operations
+from .models import Mem0OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+
+def relay_outbox_batch(batch_size=None):
+    """
+    Publish the oldest outbox events and delete them. Returns the count.
+
+    Events are locked with SKIP LOCKED, so several relays can run at once,
+    and are only deleted once published. A failed publish rolls back and
+    leaves them for the next attempt, so events are delivered at least once.
+
+    Updates are held back for MEM0_UPDATE_DEBOUNCE seconds, so rapid edits
+    of a memory collapse into one update of its latest content. Bulk events,
+    such as the sweeper's re-drives, are published to the bulk lane.
+    """
+    batch_size = batch_size or settings.MEM0_OUTBOX_BATCH_SIZE
+    debounce_cutoff = timezone.now() - timedelta(seconds=settings.MEM0_UPDATE_DEBOUNCE)
+    with transaction.atomic():
+        events = list(
+            Mem0OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(~Q(operation="update") | Q(created_at__lte=debounce_cutoff))
+            .order_by("id")[:batch_size]
+        )
+        if not events:
+            return 0
+
+        interactive = [event for event in events if not event.bulk]
+        bulk = [event for event in events if event.bulk]
+        if interactive:
+            publish_operations(collapse_events(interactive))
+        if bulk:
+            publish_operations(collapse_events(bulk), lane="bulk")
+        Mem0OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+
+    logger.info(f"Relayed {len(events)} mem0 outbox events")
+    return len(events)
+
+
+def collapse_events(events):
+    """
+    Group events into batch entries per (operation, memory_type).
+
+    Syncs read the current content when they run, so repeated updates of a
+    memory collapse into one, and updates of a memory whose add is in the
+    same batch are folded into the add.
+    """
+    groups = {}
+    seen = set()
+    added = {
+        (event.memory_type, event.memory_id)
+        for event in events
+        if event.operation == "add"
+    }
+    for event in events:
+        key = (event.operation, event.memory_type, event.memory_id)
+        if key in seen:
+            continue
+        if event.operation == "update" and key[1:] in added:
+            continue
+        seen.add(key)
+        groups.setdefault((event.operation, event.memory_type), []).append(
+            event.to_entry()
+        )
+    return groups
+
+
+def relay_outbox(batch_size=None, max_batches=None):
+    """Relay outbox batches until the outbox is drained. Returns the count."""
+    batch_size = batch_size or settings.MEM0_OUTBOX_BATCH_SIZE
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        relayed = relay_outbox_batch(batch_size)
+        total += relayed
+        batches += 1
+        if relayed < batch_size:
+            break
+    return total
@@ -0,0 +1,102 @@
+import logging
+import time
+
+import redis
+from django.conf import settings
+
+from memvault.redis_client import get_redis, mark_redis_unavailable
+
+logger = logging.getLogger(__name__)
+
+# Token bucket refilled at ARGV[1] tokens per second up to ARGV[2] tokens.
+# Takes ARGV[3] tokens, letting the bucket go negative so callers queue up
+# behind each other, and returns {1, wait} with the seconds until the taken
+# tokens are covered. Returns {0, wait} without taking any when wait would
+# exceed ARGV[4] (negative for no limit). Redis time keeps every worker on
+# the same clock.
+ACQUIRE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local max_wait = tonumber(ARGV[4])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+
+local wait = math.max(0, (requested - tokens) / rate)
+if max_wait >= 0 and wait > max_wait then
+    return {0, tostring(wait)}
+end
+
+tokens = tokens - requested
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated_at", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil((capacity - tokens) / rate) + 1)
+return {1, tostring(wait)}
+"""
+
+_acquire_script = None
+
+
+class QuotaExhausted(Exception):
+    """Raised when a mem0 call would wait longer than allowed for quota."""
+
+    def __init__(self, operation, wait):
+        super().__init__(f"mem0 {operation} quota exhausted for {wait:.1f}s")
+        self.wait = wait
+
+
+def get_bucket_key(operation):
+    return f"mem0:ratelimit:{operation}"
+
+
+def get_acquire_script(client):
+    global _acquire_script
+    if _acquire_script is None:
+        _acquire_script = client.register_script(ACQUIRE_SCRIPT)
+    return _acquire_script
+
+
+def reserve(operation, tokens=1, max_wait=None):
+    """
+    Reserve mem0 quota for an operation. Returns the seconds to wait.
+
+    Quotas are MEM0_RATE_LIMITS requests per second, shared by all workers
+    through a token bucket in Redis. Reservations queue up behind each
+    other, so a sustained backlog goes out at exactly the quota. Raises
+    QuotaExhausted, reserving nothing, when the wait would exceed max_wait.
+    Operations without a quota, or calls made without Redis, never wait.
+    """
+    rate = settings.MEM0_RATE_LIMITS.get(operation)
+    if not rate:
+        return 0
+    client = get_redis()
+    if client is None:
+        return 0
+
+    capacity = max(rate * settings.MEM0_RATE_LIMIT_BURST, tokens)
+    try:
+        reserved, wait = get_acquire_script(client)(
+            keys=[get_bucket_key(operation)],
+            args=[rate, capacity, tokens, -1 if max_wait is None else max_wait],
+            client=client,
+        )
+    except redis.RedisError as exc:
+        mark_redis_unavailable(exc)
+        return 0
+
+    wait = float(wait)
+    if not reserved:
+        raise QuotaExhausted(operation, wait)
+    return wait
+
+
+def acquire(operation, tokens=1, max_wait=None):
+    """Reserve mem0 quota for an operation and wait until it is available."""
+    wait = reserve(operation, tokens, max_wait)
+    if wait > 0:
+        logger.debug(f"Waiting {wait:.2f}s for mem0 {operation} quota")
+        time.sleep(wait)
@@ -1,10 +1,55 @@
 from rest_framework import serializers
 from django.db import models
-from .models import UserMemory, TeamMemory, OrganizationMemory
+from .models import (
+    UserMemory,
+    TeamMemory,
+    OrganizationMemory,
+    NearDuplicateCluster,
+    MEMORY_MODELS,
+)
 from user.models import User, Team, Organization
+from .compression import decode_content
 
 
-class UserMemorySerializer(serializers.ModelSerializer):
+class FastListSerializerMixin:
+    """
+    Read-only fast path for list responses.
+
+    Builds rows straight from values_list() tuples instead of model
+    instances and per-field serializer objects. Datetimes are left as
+    datetime objects for the renderer to format. Only for plain model
+    fields listed in Meta.fields.
+    """
+
+    @classmethod
+    def get_fast_columns(cls):
+        """Return the database column attribute for each field in Meta.fields."""
+        if "_fast_columns" not in cls.__dict__:
+            opts = cls.Meta.model._meta
+            cls._fast_columns = [
+                opts.get_field(name).attname for name in cls.Meta.fields
+            ]
+        return cls._fast_columns
+
+    @classmethod
+    def fast_values(cls, queryset):
+        """Return queryset as tuples of the serialized columns."""
+        return queryset.values_list(*cls.get_fast_columns())
+
+    @classmethod
+    def fast_data(cls, rows):
+        """Turn values_list() tuples into response dictionaries."""
+        fields = cls.Meta.fields
+        content_index = fields.index("content")
+        data = []
+        for row in rows:
+            item = dict(zip(fields, row))
+            item["content"] = decode_content(row[content_index])
+            data.append(item)
+        return data
+
+
+class UserMemorySerializer(FastListSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for user-scoped memories.
     """
@@ -15,6 +60,7 @@ class UserMemorySerializer(serializers.ModelSerializer):
             "id",
             "content",
             "mem0_memory_id",
+            "duplicate_of",
             "status",
             "error_message",
             "created_at",
@@ -25,6 +71,7 @@ class UserMemorySerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
             "mem0_memory_id",
+            "duplicate_of",
             "status",
             "error_message",
         ]
@@ -35,7 +82,7 @@ class UserMemorySerializer(serializers.ModelSerializer):
         return UserMemory.objects.create(**validated_data)
 
 
-class TeamMemorySerializer(serializers.ModelSerializer):
+class TeamMemorySerializer(FastListSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for team-scoped memories.
     """
@@ -47,6 +94,7 @@ class TeamMemorySerializer(serializers.ModelSerializer):
             "team",
             "content",
             "mem0_memory_id",
+            "duplicate_of",
             "status",
             "error_message",
             "created_at",
@@ -58,6 +106,7 @@ class TeamMemorySerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
             "mem0_memory_id",
+            "duplicate_of",
             "status",
             "error_message",
         ]
@@ -67,7 +116,9 @@ class TeamMemorySerializer(serializers.ModelSerializer):
         return TeamMemory.objects.create(**validated_data)
 
 
-class OrganizationMemorySerializer(serializers.ModelSerializer):
+class OrganizationMemorySerializer(
+    FastListSerializerMixin, serializers.ModelSerializer
+):
     """
     Serializer for organization-scoped memories.
     """
@@ -79,6 +130,7 @@ class OrganizationMemorySerializer(serializers.ModelSerializer):
             "organization",
             "content",
             "mem0_memory_id",
+            "duplicate_of",
             "status",
             "error_message",
             "created_at",
@@ -90,6 +142,7 @@ class OrganizationMemorySerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
             "mem0_memory_id",
+            "duplicate_of",
             "status",
             "error_message",
         ]
@@ -97,3 +150,56 @@ class OrganizationMemorySerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         """Create organization memory."""
         return OrganizationMemory.objects.create(**validated_data)
+
+
+class NearDuplicateClusterSerializer(serializers.ModelSerializer):
+    """
+    Serializer for near-duplicate clusters, including a preview of each member.
+    """
+
+    members = serializers.SerializerMethodField()
+
+    class Meta:
+        model = NearDuplicateCluster
+        fields = [
+            "id",
+            "memory_type",
+            "canonical_id",
+            "member_ids",
+            "members",
+            "status",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+    def get_members(self, obj):
+        """Return the members that still exist, using prefetched rows if given."""
+        memories = self.context.get("members")
+        if memories is None:
+            model_class = MEMORY_MODELS[obj.memory_type]
+            memories = model_class.objects.in_bulk(obj.member_ids)
+        return [
+            {
+                "id": memory.pk,
+                "content": memory.content,
+                "status": memory.status,
+                "created_at": memory.created_at,
+            }
+            for memory in (memories.get(pk) for pk in obj.member_ids)
+            if memory is not None
+        ]
+
+
+class NearDuplicateMergeSerializer(serializers.Serializer):
+    """Serializer for merging a near-duplicate cluster."""
+
+    keep = serializers.IntegerField(
+        required=False, help_text="Memory to keep, defaults to the oldest one"
+    )
+
+    def validate_keep(self, value):
+        """Validate that the memory to keep belongs to the cluster."""
+        if value not in self.context["cluster"].member_ids:
+            raise serializers.ValidationError("Memory is not part of this cluster.")
+        return value
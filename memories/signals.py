@@ -2,7 +2,15 @@ import logging
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
-from .models import UserMemory, TeamMemory, OrganizationMemory
+from .backpressure import is_mem0_sync_deferred
+from .models import (
+    UserMemory,
+    TeamMemory,
+    OrganizationMemory,
+    ArchivedMemory,
+    Mem0OutboxEvent,
+    MEMORY_MODELS,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,16 +23,60 @@ def get_memory_type(instance):
         return "team"
     elif isinstance(instance, OrganizationMemory):
         return "organization"
+    elif isinstance(instance, ArchivedMemory):
+        return instance.memory_type
     return None
 
 
+def is_mem0_memory_shared(sender, instance):
+    """
+    Check whether other memories in the scope still use the mem0 memory.
+
+    Linked duplicates may be in the hot table or the archive.
+    """
+    model_class = MEMORY_MODELS[get_memory_type(instance)]
+    owner_field = f"{model_class.OWNER_FIELD}_id"
+    owner = {owner_field: getattr(instance, owner_field)}
+    archived = ArchivedMemory.objects.filter(
+        memory_type=get_memory_type(instance),
+        mem0_memory_id=instance.mem0_memory_id,
+        **owner,
+    )
+    if sender is ArchivedMemory:
+        archived = archived.exclude(pk=instance.pk)
+    return (
+        model_class.objects.filter(
+            mem0_memory_id=instance.mem0_memory_id, **owner
+        ).exists()
+        or archived.exists()
+    )
+
+
+def record_outbox_event(operation, memory_type, instance):
+    """Write a mem0 sync event in the transaction of the memory change."""
+    Mem0OutboxEvent.objects.create(
+        operation=operation,
+        memory_type=memory_type,
+        # Archive rows keep the id the memory had in its hot table
+        memory_id=(
+            instance.original_id
+            if isinstance(instance, ArchivedMemory)
+            else instance.pk
+        ),
+        mem0_memory_id=instance.mem0_memory_id,
+        tenant=instance.tenant,
+        # Writes accepted under backpressure sync on the bulk lane
+        bulk=is_mem0_sync_deferred(),
+    )
+
+
 @receiver(post_save, sender=UserMemory)
 @receiver(post_save, sender=TeamMemory)
 @receiver(post_save, sender=OrganizationMemory)
 def handle_memory_save(sender, instance, created, **kwargs):
     """
     Handle memory creation and updates.
-    Triggers appropriate mem0 tasks when memories are saved.
+    Records mem0 outbox events when memories are saved.
     """
     memory_type = get_memory_type(instance)
     if not memory_type:
@@ -35,73 +87,42 @@ def handle_memory_save(sender, instance, created, **kwargs):
     if hasattr(instance, "_skip_signals"):
         return
 
-    try:
-        # Import tasks here to avoid circular imports
-        from .tasks import mem0_add_task, mem0_update_task
-
-        if created:
-            # New memory - create in mem0
-            logger.info(f"Creating new {memory_type} memory {instance.pk} in mem0")
-            mem0_add_task.delay(memory_type, instance.pk, instance.content)
-        else:
-            # Updated memory - only sync if content changed and we have a mem0_id
-            if instance.mem0_memory_id:
-                # Check if content was actually changed
-                # We need to compare with the database version
-                try:
-                    db_instance = sender.objects.get(pk=instance.pk)
-                    if (
-                        hasattr(instance, "_original_content")
-                        and instance._original_content != instance.content
-                    ):
-                        logger.info(
-                            f"Updating {memory_type} memory {instance.pk} in mem0"
-                        )
-                        mem0_update_task.delay(
-                            memory_type,
-                            instance.pk,
-                            instance.mem0_memory_id,
-                            instance.content,
-                        )
-                except sender.DoesNotExist:
-                    pass
-    except Exception as e:
-        logger.error(
-            f"Failed to queue Celery task for {memory_type} memory {instance.pk}: {str(e)}"
+    if created and instance.duplicate_of_id:
+        # Linked duplicate - reuses the original's mem0 memory
+        logger.info(
+            f"Linked {memory_type} memory {instance.pk} to duplicate "
+            f"{instance.duplicate_of_id}, skipping mem0"
         )
-        # If we can't queue the task, mark the memory as failed
-        try:
-            instance._skip_signals = True
-            instance.status = "failed"
-            instance.error_message = f"Failed to queue Celery task: {str(e)}"
-            instance.save(update_fields=["status", "error_message"])
-        except:
-            pass
+    elif created or getattr(instance, "_needs_mem0_add", False):
+        # New memory - create in mem0
+        logger.info(f"Creating new {memory_type} memory {instance.pk} in mem0")
+        record_outbox_event("add", memory_type, instance)
+    elif instance._original_content != instance.content:
+        # Updated memory - the edited instance may predate the mem0 add, so
+        # the update is recorded either way and skipped by the flush while
+        # the memory has no mem0 memory; its add completing checks for edits
+        logger.info(f"Updating {memory_type} memory {instance.pk} in mem0")
+        record_outbox_event("update", memory_type, instance)
 
 
 @receiver(post_delete, sender=UserMemory)
 @receiver(post_delete, sender=TeamMemory)
 @receiver(post_delete, sender=OrganizationMemory)
+@receiver(post_delete, sender=ArchivedMemory)
 def handle_memory_delete(sender, instance, **kwargs):
     """
     Handle memory deletion.
-    Triggers mem0 delete task when memories are deleted.
+    Records a mem0 delete outbox event when memories are deleted.
     """
     memory_type = get_memory_type(instance)
     if not memory_type:
         logger.error(f"Unknown memory type for instance {instance}")
         return
 
-    if instance.mem0_memory_id:
-        try:
-            # Import tasks here to avoid circular imports
-            from .tasks import mem0_delete_task
-
-            logger.info(f"Deleting {memory_type} memory {instance.pk} from mem0")
-            mem0_delete_task.delay(memory_type, instance.pk, instance.mem0_memory_id)
-        except Exception as e:
-            logger.error(
-                f"Failed to queue Celery delete task for {memory_type} memory {instance.pk}: {str(e)}"
-            )
-            # For deletions, we can't update the instance since it's being deleted
-            # Just log the error
+    # Memories moved to the archive are still present in mem0
+    if hasattr(instance, "_skip_signals"):
+        return
+
+    if instance.mem0_memory_id and not is_mem0_memory_shared(sender, instance):
+        logger.info(f"Deleting {memory_type} memory {instance.pk} from mem0")
+        record_outbox_event("delete", memory_type, instance)
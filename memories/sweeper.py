@@ -0,0 +1,122 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .models import Mem0OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# Statuses of memories whose mem0 sync has not completed. Every memory
+# model has a partial index on updated_at limited to these rows.
+UNSYNCED_FILTER = ~Q(status="completed")
+
+
+def get_stale_filter(now=None):
+    """Filter memories stuck without a completed mem0 sync."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=settings.MEMORY_SWEEP_STALE_AFTER)
+    # Linked duplicates complete together with their original
+    return UNSYNCED_FILTER & Q(updated_at__lt=cutoff, duplicate_of__isnull=True)
+
+
+def sweep_batch(model_class, memory_type, batch_size, now=None):
+    """
+    Re-drive one batch of stuck memories through the mem0 outbox.
+
+    Stale memories are locked with SKIP LOCKED, so concurrent sweepers and
+    workers never block each other. Memories not in mem0 get an add event
+    and memories whose content mem0 lacks get an update event, both on the
+    bulk lane. Both are reset to pending in a new generation, so syncs
+    still in flight from before cannot complete them, and memories already
+    in sync are marked completed.
+    Returns the number of memories swept.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        batch = list(
+            # Only lock the memories, not the teams joined for their tenant
+            model_class.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(get_stale_filter(now))
+            .order_by("updated_at")
+            .annotate(tenant=model_class.get_tenant_expression())
+            .values_list(
+                "pk",
+                "mem0_memory_id",
+                "raw_content_hash",
+                "synced_content_hash",
+                "tenant",
+            )[:batch_size]
+        )
+        if not batch:
+            return 0
+
+        events, synced = [], []
+        for pk, mem0_memory_id, raw_content_hash, synced_content_hash, tenant in batch:
+            if not mem0_memory_id:
+                events.append(
+                    Mem0OutboxEvent(
+                        operation="add",
+                        memory_type=memory_type,
+                        memory_id=pk,
+                        bulk=True,
+                        tenant=tenant,
+                    )
+                )
+            elif raw_content_hash != synced_content_hash:
+                events.append(
+                    Mem0OutboxEvent(
+                        operation="update",
+                        memory_type=memory_type,
+                        memory_id=pk,
+                        mem0_memory_id=mem0_memory_id,
+                        bulk=True,
+                        tenant=tenant,
+                    )
+                )
+            else:
+                synced.append(pk)
+
+        Mem0OutboxEvent.objects.bulk_create(events)
+        # Marked so their backlog does not apply backpressure to new writes
+        model_class.objects.filter(pk__in=[event.memory_id for event in events]).update(
+            status="pending",
+            error_message="",
+            updated_at=now,
+            redriven=True,
+            generation=F("generation") + 1,
+        )
+        model_class.objects.filter(pk__in=synced).update(
+            status="completed", error_message="", updated_at=now
+        )
+
+    logger.info(
+        f"Swept {len(batch)} stuck {memory_type} memories: "
+        f"{len(events)} re-enqueued, {len(synced)} already in sync"
+    )
+    return len(batch)
+
+
+def get_backlog_stats(model_class, now=None):
+    """
+    Return the unsynced memories of a model by status.
+
+    Maps each status to its count and the age in seconds of its oldest
+    memory since its last status change.
+    """
+    now = now or timezone.now()
+    rows = (
+        model_class.objects.filter(UNSYNCED_FILTER)
+        .values("status")
+        .annotate(count=Count("id"), oldest=Min("updated_at"))
+    )
+    return {
+        row["status"]: {
+            "count": row["count"],
+            "oldest_age": (now - row["oldest"]).total_seconds(),
+        }
+        for row in rows
+    }
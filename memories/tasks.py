@@ -1,28 +1,63 @@
 import logging
+import threading
 from celery import shared_task
 from mem0 import MemoryClient
 from django.apps import apps
 from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from . import circuit_breaker, concurrency, rate_limit
 
 logger = logging.getLogger(__name__)
 
 # Shared Memory instance per worker process
 _mem0_instance = None
+# Worker threads (--pool=threads) must not create the instance twice
+_mem0_instance_lock = threading.Lock()
 
 
 def get_mem0_instance():
     """Get or create a shared MemoryClient instance for the current worker."""
+    with _mem0_instance_lock:
+        return _get_or_create_mem0_instance()
+
+
+def _get_or_create_mem0_instance():
     global _mem0_instance
     if _mem0_instance is None:
         if not settings.MEM0_API_KEY:
             raise ValueError(
                 "MEM0_API_KEY must be set in settings to create MemoryClient instance"
             )
-        _mem0_instance = MemoryClient(api_key=settings.MEM0_API_KEY)
+        if settings.MEM0_ASYNC_CLIENT:
+            from .async_mem0 import AsyncMem0Client
+
+            _mem0_instance = AsyncMem0Client(
+                api_key=settings.MEM0_API_KEY,
+                host=settings.MEM0_HOST,
+                max_in_flight=settings.MEM0_MAX_IN_FLIGHT,
+                max_connections=settings.MEM0_MAX_CONNECTIONS,
+                timeout=settings.MEM0_TIMEOUT,
+            )
+        else:
+            _mem0_instance = MemoryClient(
+                api_key=settings.MEM0_API_KEY, host=settings.MEM0_HOST
+            )
         logger.info("Created new MemoryClient instance for worker")
     return _mem0_instance
 
 
+def release_db_connection():
+    """
+    Return the thread's database connection to the pool before a mem0 call.
+
+    Worker threads far outnumber pooled connections, so none is held while
+    waiting on mem0; the next query checks one out again.
+    """
+    if not connection.in_atomic_block:
+        connection.close()
+
+
 def get_model_class(memory_type):
     """Get the model class based on memory type."""
     if memory_type == "user":
@@ -35,31 +70,79 @@ def get_model_class(memory_type):
         raise ValueError(f"Invalid memory type: {memory_type}")
 
 
-@shared_task(bind=True, max_retries=3)
-def mem0_add_task(self, memory_type, pk, content):
+@shared_task(bind=True, max_retries=3, ignore_result=True)
+def mem0_add_task(
+    self, memory_type, pk, version, claimed=False, lane="interactive", generation=None
+):
     """
     Create a new memory in mem0 and update the status.
+
+    The task carries the memory version rather than its content, and sends
+    the content the memory has when the task runs. Retries keep the memory
+    claimed, so its status is only written once the add succeeds or finally
+    fails, and stay in the task's lane. They also carry the generation of
+    their claim: once the sweeper has re-driven the memory they stop, and a
+    mem0 memory added meanwhile is deleted again.
     """
+    model_class = get_model_class(memory_type)
+    permit = circuit_breaker.acquire_permit()
+    if permit is None and circuit_breaker.park_task(
+        self,
+        (memory_type, pk, version),
+        {"claimed": claimed, "lane": lane, "generation": generation},
+    ):
+        return
+
     try:
-        # Get the appropriate model class
-        model_class = get_model_class(memory_type)
-        # Get the instance and mark as processing
+        # Edits before the add queue no sync of their own, so any version is
+        # added until the memory is in mem0
+        if not claimed and not model_class.transition(
+            pk, "processing", condition=Q(mem0_memory_id__isnull=True)
+        ):
+            logger.info(
+                f"{memory_type} memory {pk} version {version} is gone, already "
+                f"in mem0 or being synced, skipping mem0 add"
+            )
+            return
+        claimed = True
+
         instance = model_class.objects.get(pk=pk)
-        instance.mark_as_processing()
+        if generation is None:
+            generation = instance.generation
+        elif instance.generation != generation:
+            logger.info(
+                f"{memory_type} memory {pk} was re-driven by the sweeper, "
+                f"skipping mem0 add"
+            )
+            return
+        content = instance.content
+        release_db_connection()
 
         # Create memory in mem0
         client = get_mem0_instance()
 
         user_id = f"{memory_type}_{pk}"
         message = [{"role": "user", "content": content}]
-        result = client.add(message, user_id=user_id)
+        rate_limit.acquire("add", max_wait=settings.MEM0_RATE_LIMIT_MAX_WAIT)
+        with concurrency.call_slot("add"), circuit_breaker.guard():
+            result = client.add(message, user_id=user_id)
 
         # Extract mem0_memory_id from result
         if result and "results" in result and len(result["results"]) > 0:
             mem0_id = result["results"][0]["id"]
 
             # Update the instance with mem0_memory_id and mark as completed
-            instance.mark_as_completed(mem0_memory_id=mem0_id)
+            if not instance.mark_as_completed(
+                mem0_memory_id=mem0_id, synced_content=content, generation=generation
+            ):
+                # Re-driven or deleted meanwhile: no memory refers to the
+                # mem0 memory just added
+                logger.info(
+                    f"{memory_type} memory {pk} changed hands during its mem0 "
+                    f"add, deleting mem0 memory {mem0_id}"
+                )
+                mem0_delete_task.apply_async((memory_type, pk, mem0_id), {"lane": lane})
+                return
 
             logger.info(
                 f"Successfully created mem0 memory for {memory_type} {pk}: {mem0_id}"
@@ -67,86 +150,284 @@ def mem0_add_task(self, memory_type, pk, content):
         else:
             raise Exception("Invalid response from mem0")
 
+    except rate_limit.QuotaExhausted as exc:
+        # Not a failure: the task comes back once the quota has room
+        self.apply_async(
+            (memory_type, pk, version),
+            {"claimed": True, "lane": lane, "generation": generation},
+            countdown=exc.wait,
+        )
+
     except Exception as exc:
         logger.error(f"Error creating mem0 memory for {memory_type} {pk}: {str(exc)}")
 
-        # Get the instance and mark as failed
-        try:
-            instance = model_class.objects.get(pk=pk)
-            instance.mark_as_failed(str(exc))
-        except:
-            pass
-
-        # Retry if we haven't exceeded max_retries
+        # Retry if we haven't exceeded max_retries; a claim that failed
+        # (e.g. no pooled connection in time) is retried as well
         if self.request.retries < self.max_retries:
-            raise self.retry(exc=exc, countdown=10)
-        else:
-            raise exc
+            raise self.retry(
+                exc=exc,
+                countdown=circuit_breaker.get_retry_delay(self.request.retries),
+                kwargs={"claimed": claimed, "lane": lane, "generation": generation},
+            )
+        # Unclaimed memories are left to the sweeper
+        if claimed:
+            model_class.transition(
+                pk, "failed", generation=generation, error_message=str(exc)
+            )
+        raise exc
 
+    finally:
+        circuit_breaker.release_permit(permit)
 
-@shared_task(bind=True, max_retries=3)
-def mem0_update_task(self, memory_type, pk, mem0_id, content):
+
+@shared_task(bind=True, max_retries=3, ignore_result=True)
+def mem0_update_task(
+    self, memory_type, pk, version, claimed=False, lane="interactive", generation=None
+):
     """
     Update an existing memory in mem0 and update the status.
+
+    The task carries the memory version rather than its content, and exits
+    without calling mem0 once a newer version has superseded it. Retries
+    keep the memory claimed, so its status is only written once the update
+    succeeds or finally fails, and stay in the task's lane. They also carry
+    the generation of their claim, and stop once the sweeper has re-driven
+    the memory.
     """
+    model_class = get_model_class(memory_type)
+    permit = circuit_breaker.acquire_permit()
+    if permit is None and circuit_breaker.park_task(
+        self,
+        (memory_type, pk, version),
+        {"claimed": claimed, "lane": lane, "generation": generation},
+    ):
+        return
+
     try:
-        # Validate mem0_id
-        if not mem0_id:
-            return self.mem0_add_task(memory_type, pk, content)
-        # Get the appropriate model class
-        model_class = get_model_class(memory_type)
+        # Every later edit queued its own update, and memories whose content
+        # mem0 already has need none
+        if not claimed and not model_class.transition(
+            pk,
+            "processing",
+            version=version,
+            condition=Q(mem0_memory_id__isnull=False)
+            & ~Q(raw_content_hash=F("synced_content_hash")),
+        ):
+            logger.info(
+                f"{memory_type} memory {pk} version {version} is gone, "
+                f"superseded, already synced or being synced, skipping mem0 update"
+            )
+            return
+        claimed = True
 
-        # Get the instance and mark as processing
         instance = model_class.objects.get(pk=pk)
-        instance.mark_as_processing()
+        if generation is None:
+            generation = instance.generation
+        elif instance.generation != generation:
+            logger.info(
+                f"{memory_type} memory {pk} was re-driven by the sweeper, "
+                f"skipping mem0 update"
+            )
+            return
+        content = instance.content
+        mem0_id = instance.mem0_memory_id
+        release_db_connection()
 
         # Update memory in mem0
         client = get_mem0_instance()
-        client.update(memory_id=mem0_id, text=content)
+        rate_limit.acquire("update", max_wait=settings.MEM0_RATE_LIMIT_MAX_WAIT)
+        with concurrency.call_slot("update"), circuit_breaker.guard():
+            client.update(memory_id=mem0_id, text=content)
 
         # Mark as completed
-        instance.mark_as_completed(mem0_memory_id=mem0_id)
+        instance.mark_as_completed(
+            mem0_memory_id=mem0_id, synced_content=content, generation=generation
+        )
 
         logger.info(
             f"Successfully updated mem0 memory for {memory_type} {pk}: {mem0_id}"
         )
 
+    except rate_limit.QuotaExhausted as exc:
+        # Not a failure: the task comes back once the quota has room
+        self.apply_async(
+            (memory_type, pk, version),
+            {"claimed": True, "lane": lane, "generation": generation},
+            countdown=exc.wait,
+        )
+
     except Exception as exc:
         logger.error(f"Error updating mem0 memory for {memory_type} {pk}: {str(exc)}")
 
-        # Get the instance and mark as failed
-        try:
-            instance = model_class.objects.get(pk=pk)
-            instance.mark_as_failed(str(exc))
-        except:
-            pass
-
-        # Retry if we haven't exceeded max_retries
+        # Retry if we haven't exceeded max_retries; a claim that failed
+        # (e.g. no pooled connection in time) is retried as well
         if self.request.retries < self.max_retries:
-            raise self.retry(exc=exc, countdown=10)
-        else:
-            raise exc
+            raise self.retry(
+                exc=exc,
+                countdown=circuit_breaker.get_retry_delay(self.request.retries),
+                kwargs={"claimed": claimed, "lane": lane, "generation": generation},
+            )
+        # Unclaimed memories are left to the sweeper
+        if claimed:
+            model_class.transition(
+                pk, "failed", generation=generation, error_message=str(exc)
+            )
+        raise exc
+
+    finally:
+        circuit_breaker.release_permit(permit)
 
 
-@shared_task(bind=True, max_retries=3)
-def mem0_delete_task(self, memory_type, pk, mem0_id):
+@shared_task(bind=True, max_retries=3, ignore_result=True)
+def mem0_delete_task(self, memory_type, pk, mem0_id, lane="interactive"):
     """
     Delete a memory from mem0.
     """
+    permit = circuit_breaker.acquire_permit()
+    if permit is None and circuit_breaker.park_task(
+        self, (memory_type, pk, mem0_id), {"lane": lane}
+    ):
+        return
+
     try:
         # Delete memory from mem0
         client = get_mem0_instance()
-        client.delete(memory_id=mem0_id)
+        rate_limit.acquire("delete", max_wait=settings.MEM0_RATE_LIMIT_MAX_WAIT)
+        with concurrency.call_slot("delete"), circuit_breaker.guard():
+            client.delete(memory_id=mem0_id)
 
         logger.info(
             f"Successfully deleted mem0 memory for {memory_type} {pk}: {mem0_id}"
         )
 
+    except rate_limit.QuotaExhausted as exc:
+        # Not a failure: the task comes back once the quota has room
+        self.apply_async((memory_type, pk, mem0_id), {"lane": lane}, countdown=exc.wait)
+
     except Exception as exc:
         logger.error(f"Error deleting mem0 memory for {memory_type} {pk}: {str(exc)}")
 
         # Retry if we haven't exceeded max_retries
         if self.request.retries < self.max_retries:
-            raise self.retry(exc=exc, countdown=10)
+            raise self.retry(
+                exc=exc,
+                countdown=circuit_breaker.get_retry_delay(self.request.retries),
+                kwargs={"lane": lane},
+            )
         else:
             raise exc
+
+    finally:
+        circuit_breaker.release_permit(permit)
+
+
+@shared_task(bind=True)
+def mem0_flush_batch_task(
+    self, operation, memory_type, entries=None, lane="interactive"
+):
+    """
+    Flush the buffered mem0 adds, updates or deletes of a memory type in
+    batches, or process the given batch entries directly.
+
+    The lane, "interactive" or "bulk", picks the buffer and the queues of
+    the flush and its retries; see memvault.celery.route_task. A flush
+    probing a recovering mem0 only sends one entry, and parks the rest.
+    """
+    from .batching import flush_batches, get_flush_function
+
+    args = (
+        (operation, memory_type)
+        if entries is None
+        else (operation, memory_type, entries)
+    )
+    permit = circuit_breaker.acquire_permit()
+    if permit is None and circuit_breaker.park_task(self, args, {"lane": lane}):
+        return 0
+    probe = permit == circuit_breaker.PROBE
+
+    try:
+        if entries is not None:
+            if (
+                probe
+                and len(entries) > 1
+                and circuit_breaker.park_task(
+                    self, (operation, memory_type, entries[1:]), {"lane": lane}
+                )
+            ):
+                entries = entries[:1]
+            get_flush_function(operation)(memory_type, entries, lane=lane)
+            return len(entries)
+        return flush_batches(operation, memory_type, lane=lane, probe=probe)
+    finally:
+        # Entries claimed elsewhere or an empty buffer make no mem0 call
+        circuit_breaker.release_permit(permit)
+
+
+@shared_task(bind=True)
+def drain_parked_mem0_tasks_task(self):
+    """
+    Send the mem0 tasks parked while the circuit was open, ramping up.
+    """
+    return circuit_breaker.drain_parked_tasks(self.app)
+
+
+@shared_task
+def archive_old_memories_task():
+    """
+    Move old, completed memories into the archive table in bounded batches.
+    """
+    from .archive import archive_batch
+
+    total = 0
+    for memory_type in ("user", "team", "organization"):
+        model_class = get_model_class(memory_type)
+        for _ in range(settings.MEMORY_ARCHIVE_MAX_BATCHES):
+            archived = archive_batch(model_class, settings.MEMORY_ARCHIVE_BATCH_SIZE)
+            total += archived
+            if archived < settings.MEMORY_ARCHIVE_BATCH_SIZE:
+                break
+
+    logger.info(f"Archived {total} memories")
+    return total
+
+
+@shared_task
+def detect_near_duplicates_task():
+    """
+    Scan every scope for near-duplicate memories and record clusters for review.
+    """
+    from .consolidation import detect_near_duplicates
+
+    total = 0
+    for memory_type in ("user", "team", "organization"):
+        total += detect_near_duplicates(get_model_class(memory_type), memory_type)
+    return total
+
+
+@shared_task
+def sweep_stuck_memories_task():
+    """
+    Re-drive memories stuck pending, processing or failed in bounded batches,
+    and report the unsynced backlog of every scope.
+    """
+    from .sweeper import get_backlog_stats, sweep_batch
+
+    total = 0
+    for memory_type in ("user", "team", "organization"):
+        model_class = get_model_class(memory_type)
+        for _ in range(settings.MEMORY_SWEEP_MAX_BATCHES):
+            swept = sweep_batch(
+                model_class, memory_type, settings.MEMORY_SWEEP_BATCH_SIZE
+            )
+            total += swept
+            if swept < settings.MEMORY_SWEEP_BATCH_SIZE:
+                break
+
+        for status, stats in get_backlog_stats(model_class).items():
+            logger.info(
+                f"{memory_type} memory backlog: {stats['count']} {status}, "
+                f"oldest {stats['oldest_age']:.0f}s"
+            )
+
+    logger.info(f"Swept {total} stuck memories")
+    return total
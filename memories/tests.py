@@ -1,13 +1,85 @@
+import asyncio
+import base64
+import json
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+import httpx
+import redis
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import F
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from memvault.renderers import ORJSONRenderer, msgpack
+from memvault.testing import QueryCountAssertionsMixin
 from user.models import Organization, Team, TeamMembership
-from memories.models import UserMemory, TeamMemory, OrganizationMemory
+from memories.models import (
+    UserMemory,
+    TeamMemory,
+    OrganizationMemory,
+    ArchivedMemory,
+    NearDuplicateCluster,
+    Mem0OutboxEvent,
+)
+from memories.tasks import (
+    archive_old_memories_task,
+    detect_near_duplicates_task,
+    mem0_add_task,
+    mem0_flush_batch_task,
+    mem0_update_task,
+    sweep_stuck_memories_task,
+)
+from memories.async_mem0 import AsyncMem0Client
+from memories import backpressure, batching, circuit_breaker, concurrency, rate_limit
+from memories.batching import (
+    claim_for_sync,
+    flush_add_batch,
+    flush_delete_batch,
+    flush_update_batch,
+    publish_operations,
+)
+from memories.outbox import collapse_events, relay_outbox
+from memories.sweeper import get_backlog_stats
+from memories.compression import (
+    COMPRESSED_PREFIX,
+    compress_text,
+    decode_content,
+    encode_content,
+    is_compressed,
+)
+from memories.dedup import find_duplicate
+from memories.neardup import find_clusters
+from memories.serializers import TeamMemorySerializer, UserMemorySerializer
+
+try:
+    import fakeredis
+except ImportError:  # The Redis scripts are then only tested against Redis
+    fakeredis = None
 
 User = get_user_model()
 
 
+def redis_available():
+    try:
+        return redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.2).ping()
+    except redis.RedisError:
+        return False
+
+
+def get_lua_redis():
+    """Return an in-memory Redis of its own that runs Lua scripts."""
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer())
+
+
 class MemoryAPITest(APITestCase):
     """Test the Memory API endpoints."""
 
@@ -137,3 +209,2235 @@ class MemoryAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data["results"]), 1)
         self.assertIn("cats", response.data["results"][0]["content"])
+
+
+@override_settings(MEMORY_ARCHIVE_AFTER_DAYS=180)
+class MemoryArchiveTest(APITestCase):
+    """Test archival of old memories into cold storage."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="user1", password="testpass123")
+        self.organization = Organization.objects.create(
+            name="Test Org", admin=self.user
+        )
+        self.team = Team.objects.create(
+            name="Test Team", organization=self.organization
+        )
+        TeamMembership.objects.create(user=self.user, team=self.team)
+
+        self.old_memory = UserMemory.objects.create(
+            user=self.user, content="Old memory", status="completed"
+        )
+        self.new_memory = UserMemory.objects.create(
+            user=self.user, content="New memory", status="completed"
+        )
+        self.old_team_memory = TeamMemory.objects.create(
+            team=self.team, content="Old team memory", status="completed"
+        )
+        old = timezone.now() - timedelta(days=365)
+        synced = F("raw_content_hash")
+        UserMemory.objects.filter(pk=self.old_memory.pk).update(
+            created_at=old, synced_content_hash=synced
+        )
+        TeamMemory.objects.filter(pk=self.old_team_memory.pk).update(
+            created_at=old, synced_content_hash=synced
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_old_completed_memories_are_archived(self):
+        """Test that only old, completed memories leave the hot tables."""
+        archive_old_memories_task()
+
+        self.assertFalse(UserMemory.objects.filter(pk=self.old_memory.pk).exists())
+        self.assertTrue(UserMemory.objects.filter(pk=self.new_memory.pk).exists())
+        archived = ArchivedMemory.objects.get(
+            memory_type="user", original_id=self.old_memory.pk
+        )
+        self.assertEqual(archived.content, "Old memory")
+        self.assertEqual(archived.user, self.user)
+
+    def test_edited_memory_is_archived_once_synced(self):
+        """Test that a memory with an unsynced edit stays hot until it is synced."""
+        memory = UserMemory.objects.get(pk=self.old_memory.pk)
+        memory.content = "Edited old memory"
+        memory.save()
+
+        archive_old_memories_task()
+        self.assertTrue(UserMemory.objects.filter(pk=memory.pk).exists())
+
+        UserMemory.objects.filter(pk=memory.pk).update(
+            synced_content_hash=F("raw_content_hash")
+        )
+        archive_old_memories_task()
+        self.assertFalse(UserMemory.objects.filter(pk=memory.pk).exists())
+
+    def test_conflicting_archive_row_keeps_memory_hot(self):
+        """Test that a memory whose archive row could not be written is kept."""
+        stale = ArchivedMemory.from_memory(self.old_memory)
+        stale.content_blob = compress_text("Another memory")
+        stale.save()
+
+        archive_old_memories_task()
+
+        self.assertTrue(UserMemory.objects.filter(pk=self.old_memory.pk).exists())
+        self.assertEqual(
+            ArchivedMemory.objects.get(memory_type="user").content, "Another memory"
+        )
+        # Memories without a conflict are still archived
+        self.assertFalse(
+            TeamMemory.objects.filter(pk=self.old_team_memory.pk).exists()
+        )
+
+    @override_settings(MEMORY_ARCHIVE_AFTER_DAYS=0)
+    def test_list_spans_old_memories_while_archival_is_off(self):
+        """Test that without opting in, old memories stay listed and searchable."""
+        self.organization.memory_archive_after_days = None
+        self.organization.save()
+        archive_old_memories_task()
+
+        response = self.client.get("/api/memories/users/me/")
+        self.assertEqual(
+            {result["id"] for result in response.data["results"]},
+            {self.old_memory.pk, self.new_memory.pk},
+        )
+        response = self.client.get("/api/memories/users/me/", {"search": "old"})
+        self.assertEqual(
+            [result["id"] for result in response.data["results"]], [self.old_memory.pk]
+        )
+        self.assertFalse(ArchivedMemory.objects.exists())
+
+    def test_org_override_disables_archival(self):
+        """Test that an organization can opt out of archival."""
+        self.organization.memory_archive_after_days = 0
+        self.organization.save()
+
+        archive_old_memories_task()
+
+        self.assertTrue(TeamMemory.objects.filter(pk=self.old_team_memory.pk).exists())
+
+    def test_archived_memory_readable_through_detail_view(self):
+        """Test that archived memories are still served by the detail views."""
+        archive_old_memories_task()
+
+        response = self.client.get(f"/api/memories/users/me/{self.old_memory.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["content"], "Old memory")
+
+        response = self.client.get(
+            f"/api/memories/teams/{self.team.id}/{self.old_team_memory.pk}/"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["content"], "Old team memory")
+
+    def test_archived_memory_not_readable_by_other_users(self):
+        """Test that archive lookups stay scoped to the owner."""
+        archive_old_memories_task()
+        other = User.objects.create_user(username="user2", password="testpass123")
+        self.client.force_authenticate(user=other)
+
+        response = self.client.get(f"/api/memories/users/me/{self.old_memory.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_archived_memory_delete_removes_it_from_mem0(self):
+        """Test that deleting an archived memory records its mem0 delete."""
+        UserMemory.objects.filter(pk=self.old_memory.pk).update(mem0_memory_id="m1")
+        archive_old_memories_task()
+        # Archive row ids are unrelated to the ids of the hot tables
+        archived = ArchivedMemory.objects.filter(memory_type="user")
+        archived.update(id=F("id") + 1000)
+
+        response = self.client.delete(f"/api/memories/users/me/{self.old_memory.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(archived.exists())
+        event = Mem0OutboxEvent.objects.get(operation="delete")
+        self.assertEqual(
+            (event.memory_type, event.memory_id, event.mem0_memory_id),
+            ("user", self.old_memory.pk, "m1"),
+        )
+
+    def test_archived_memory_update_restores_it(self):
+        """Test that updating an archived memory moves it back and syncs it."""
+        UserMemory.objects.filter(pk=self.old_memory.pk).update(mem0_memory_id="m1")
+        archive_old_memories_task()
+
+        response = self.client.patch(
+            f"/api/memories/users/me/{self.old_memory.pk}/",
+            {"content": "Edited old memory"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(ArchivedMemory.objects.filter(memory_type="user").exists())
+        memory = UserMemory.objects.get(pk=self.old_memory.pk)
+        self.assertEqual(memory.content, "Edited old memory")
+        self.assertLess(memory.created_at, timezone.now() - timedelta(days=300))
+        event = Mem0OutboxEvent.objects.get(operation="update")
+        self.assertEqual((event.memory_id, event.mem0_memory_id), (memory.pk, "m1"))
+        self.assertFalse(Mem0OutboxEvent.objects.filter(operation="delete").exists())
+
+    def test_invalid_archived_memory_update_leaves_it_archived(self):
+        """Test that an update failing validation does not restore the memory."""
+        archive_old_memories_task()
+
+        response = self.client.patch(
+            f"/api/memories/users/me/{self.old_memory.pk}/", {"content": ""}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(
+            ArchivedMemory.objects.filter(original_id=self.old_memory.pk).exists()
+        )
+        self.assertFalse(UserMemory.objects.filter(pk=self.old_memory.pk).exists())
+
+
+@override_settings(MEMORY_CONTENT_COMPRESSION_THRESHOLD=100)
+class MemoryCompressionTest(APITestCase):
+    """Test transparent compression of large memory content."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="user1", password="testpass123")
+        self.large_content = "The user prefers morning meetings. " * 20
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def get_stored_content(self, memory):
+        return UserMemory.objects.values_list("content", flat=True).get(pk=memory.pk)
+
+    def test_large_content_is_stored_compressed(self):
+        """Test that large content is compressed at rest and read back as text."""
+        memory = UserMemory.objects.create(user=self.user, content=self.large_content)
+
+        stored = self.get_stored_content(memory)
+        self.assertTrue(is_compressed(stored))
+        self.assertLess(len(stored), len(self.large_content))
+        self.assertEqual(
+            UserMemory.objects.get(pk=memory.pk).content, self.large_content
+        )
+
+    def test_small_content_is_stored_plain(self):
+        """Test that content below the threshold is left uncompressed."""
+        memory = UserMemory.objects.create(user=self.user, content="Short memory")
+        self.assertEqual(self.get_stored_content(memory), "Short memory")
+
+    def test_api_returns_decompressed_content(self):
+        """Test that the API serializes the plain content."""
+        memory = UserMemory.objects.create(user=self.user, content=self.large_content)
+
+        response = self.client.get(f"/api/memories/users/me/{memory.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["content"], self.large_content)
+
+    def test_search_matches_compressed_content(self):
+        """Test that searching content finds memories stored compressed."""
+        memory = UserMemory.objects.create(
+            user=self.user, content=self.large_content + "Allergic to peanuts."
+        )
+        UserMemory.objects.create(user=self.user, content=self.large_content)
+        plain = UserMemory.objects.create(user=self.user, content="Peanuts are fine")
+        self.assertTrue(is_compressed(self.get_stored_content(memory)))
+
+        response = self.client.get("/api/memories/users/me/", {"search": "PEANUTS"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {result["id"] for result in response.data["results"]},
+            {memory.pk, plain.pk},
+        )
+
+    @override_settings(MEMORY_CONTENT_SEARCH_PREFIX=50)
+    def test_search_of_compressed_content_stops_at_its_prefix(self):
+        """Test that compressed content is only searched in its plain prefix."""
+        memory = UserMemory.objects.create(
+            user=self.user, content=self.large_content + "Allergic to peanuts."
+        )
+        self.assertEqual(memory.content_search_prefix, self.large_content[:50])
+
+        for search, expected in (("morning", [memory.pk]), ("peanuts", [])):
+            response = self.client.get("/api/memories/users/me/", {"search": search})
+            self.assertEqual(
+                [result["id"] for result in response.data["results"]], expected
+            )
+
+    def test_original_content_tracking(self):
+        """Test change tracking against compressed content."""
+        memory = UserMemory.objects.create(user=self.user, content=self.large_content)
+        memory = UserMemory.objects.get(pk=memory.pk)
+        self.assertEqual(memory._original_content, self.large_content)
+
+        memory.content = "Changed"
+        self.assertNotEqual(memory._original_content, memory.content)
+
+    def test_content_starting_with_the_marker_round_trips(self):
+        """Test that client content looking encoded is stored and read as is."""
+        payload = base64.b64encode(zlib.compress(b"Something else")).decode()
+        for content in (
+            f"{COMPRESSED_PREFIX}zlib:not-base64!!",
+            f"{COMPRESSED_PREFIX}zlib:{payload}",
+        ):
+            response = self.client.post("/api/memories/users/me/", {"content": content})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data["content"], content)
+
+            response = self.client.get(f"/api/memories/users/me/{response.data['id']}/")
+            self.assertEqual(response.data["content"], content)
+
+        response = self.client.get("/api/memories/users/me/", {"search": "base64"})
+        self.assertEqual(len(response.data["results"]), 1)
+
+    @override_settings(MEMORY_CONTENT_MAX_DECOMPRESSED_BYTES=1000)
+    def test_decompression_is_capped(self):
+        """Test that content decompressing past the limit is refused."""
+        stored = encode_content("a" * 1001)
+        self.assertTrue(is_compressed(stored))
+        with self.assertRaises(ValueError):
+            decode_content(stored)
+        self.assertEqual(decode_content(encode_content("a" * 1000)), "a" * 1000)
+
+    def test_backfill_command_compresses_existing_rows(self):
+        """Test that the backfill command rewrites rows into compressed form."""
+        with override_settings(MEMORY_CONTENT_COMPRESSION_THRESHOLD=0):
+            memory = UserMemory.objects.create(
+                user=self.user, content=self.large_content
+            )
+        self.assertFalse(is_compressed(self.get_stored_content(memory)))
+
+        call_command("compress_memory_content", stdout=open("/dev/null", "w"))
+
+        self.assertTrue(is_compressed(self.get_stored_content(memory)))
+        memory = UserMemory.objects.get(pk=memory.pk)
+        self.assertEqual(memory.content, self.large_content)
+        self.assertEqual(memory.content_search_prefix, self.large_content)
+
+
+class MemoryDedupTest(APITestCase):
+    """Test content-addressed deduplication of memories."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="user1", password="testpass123")
+        self.organization = Organization.objects.create(
+            name="Test Org", admin=self.user
+        )
+        self.original = UserMemory.objects.create(
+            user=self.user,
+            content="Likes  green tea",
+            status="completed",
+            mem0_memory_id="mem0-1",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_dedup_off_by_default(self):
+        """Test that duplicates are stored normally unless dedup is enabled."""
+        response = self.client.post(
+            "/api/memories/users/me/", {"content": "Likes green tea"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(response.data["duplicate_of"])
+        self.assertEqual(UserMemory.objects.filter(user=self.user).count(), 2)
+
+    def test_return_mode_returns_existing_memory(self):
+        """Test that return mode responds with the normalized-equal memory."""
+        response = self.client.post(
+            "/api/memories/users/me/?dedup=return", {"content": " likes GREEN tea "}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], self.original.pk)
+        self.assertEqual(response["X-Memory-Deduplicated"], "returned")
+        self.assertEqual(UserMemory.objects.filter(user=self.user).count(), 1)
+
+    def test_link_mode_reuses_mem0_memory(self):
+        """Test that link mode shares the original's mem0 memory."""
+        response = self.client.post(
+            "/api/memories/users/me/?dedup=link", {"content": "Likes green tea"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["duplicate_of"], self.original.pk)
+        self.assertEqual(response.data["mem0_memory_id"], "mem0-1")
+        self.assertEqual(response.data["status"], "completed")
+        self.assertFalse(
+            Mem0OutboxEvent.objects.filter(memory_id=response.data["id"]).exists()
+        )
+
+    def test_link_mode_picks_up_original_completed_before_insert(self):
+        """Test that a duplicate doesn't stay processing if its original completes."""
+        UserMemory.objects.filter(pk=self.original.pk).update(
+            status="processing", mem0_memory_id=None
+        )
+        lookup = find_duplicate
+
+        def find_then_complete(*args):
+            existing = lookup(*args)
+            UserMemory.objects.get(pk=self.original.pk).mark_as_completed("mem0-2")
+            return existing
+
+        with mock.patch("memories.views.find_duplicate", find_then_complete):
+            response = self.client.post(
+                "/api/memories/users/me/?dedup=link", {"content": "Likes green tea"}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["status"], "completed")
+        self.assertEqual(response.data["mem0_memory_id"], "mem0-2")
+        duplicate = UserMemory.objects.get(pk=response.data["id"])
+        self.assertEqual(duplicate.status, "completed")
+        self.assertEqual(duplicate.mem0_memory_id, "mem0-2")
+        self.assertEqual(duplicate.synced_content_hash, duplicate.raw_content_hash)
+
+    def test_org_dedup_mode(self):
+        """Test that the organization's dedup mode applies to its memories."""
+        self.organization.memory_dedup_mode = "return"
+        self.organization.save()
+        url = f"/api/memories/orgs/{self.organization.id}/"
+
+        first = self.client.post(url, {"content": "Quarterly goals"})
+        second = self.client.post(url, {"content": "quarterly goals"})
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data["id"], first.data["id"])
+
+    def test_invalid_dedup_mode(self):
+        """Test that unknown dedup modes are rejected."""
+        response = self.client.post(
+            "/api/memories/users/me/?dedup=maybe", {"content": "Anything"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deleting_linked_duplicate_keeps_shared_mem0_memory(self):
+        """Test that mem0 is only cleaned up once no row uses the memory."""
+        duplicate = UserMemory.objects.create(
+            user=self.user,
+            content="Likes green tea",
+            duplicate_of=self.original,
+            mem0_memory_id="mem0-1",
+            status="completed",
+        )
+        deletes = Mem0OutboxEvent.objects.filter(operation="delete")
+        duplicate.delete()
+        self.assertFalse(deletes.exists())
+        self.original.delete()
+        self.assertEqual(deletes.count(), 1)
+
+    def test_editing_linked_duplicate_detaches_it(self):
+        """Test that an edited duplicate gets its own mem0 memory."""
+        duplicate = UserMemory.objects.create(
+            user=self.user,
+            content="Likes green tea",
+            duplicate_of=self.original,
+            mem0_memory_id="mem0-1",
+            status="completed",
+        )
+        response = self.client.patch(
+            f"/api/memories/users/me/{duplicate.pk}/", {"content": "Likes coffee"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["duplicate_of"])
+        self.assertIsNone(response.data["mem0_memory_id"])
+        self.assertTrue(
+            Mem0OutboxEvent.objects.filter(
+                operation="add", memory_id=duplicate.pk
+            ).exists()
+        )
+
+    def test_editing_original_leaves_mem0_memory_to_duplicates(self):
+        """Test that an edited original does not change its duplicates' memory."""
+        first, second = [
+            UserMemory.objects.create(
+                user=self.user,
+                content="Likes green tea",
+                duplicate_of=self.original,
+                mem0_memory_id="mem0-1",
+                status="completed",
+            )
+            for _ in range(2)
+        ]
+        Mem0OutboxEvent.objects.all().delete()
+        response = self.client.patch(
+            f"/api/memories/users/me/{self.original.pk}/", {"content": "Likes coffee"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["mem0_memory_id"])
+        self.assertEqual(
+            list(Mem0OutboxEvent.objects.values_list("operation", "memory_id")),
+            [("add", self.original.pk)],
+        )
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertIsNone(first.duplicate_of_id)
+        self.assertEqual(second.duplicate_of_id, first.pk)
+        self.assertEqual(first.mem0_memory_id, "mem0-1")
+
+    def test_editing_unsynced_original_adds_duplicates(self):
+        """Test that duplicates of an original not yet in mem0 get their own add."""
+        UserMemory.objects.filter(pk=self.original.pk).update(
+            status="pending", mem0_memory_id=None
+        )
+        duplicate = UserMemory.objects.create(
+            user=self.user,
+            content="Likes green tea",
+            duplicate_of=self.original,
+            status="pending",
+        )
+        Mem0OutboxEvent.objects.all().delete()
+        self.original.refresh_from_db()
+        self.original.content = "Likes coffee"
+        self.original.save()
+
+        duplicate.refresh_from_db()
+        self.assertIsNone(duplicate.duplicate_of_id)
+        # The original's own edit syncs once its add has run
+        self.assertEqual(
+            list(Mem0OutboxEvent.objects.values_list("operation", "memory_id")),
+            [("add", duplicate.pk), ("update", self.original.pk)],
+        )
+
+    def test_editing_original_without_duplicates_updates_mem0(self):
+        """Test that an original no other memory shares is updated in place."""
+        Mem0OutboxEvent.objects.all().delete()
+        self.original.content = "Likes coffee"
+        self.original.save()
+
+        self.assertEqual(self.original.mem0_memory_id, "mem0-1")
+        self.assertEqual(
+            list(Mem0OutboxEvent.objects.values_list("operation", "memory_id")),
+            [("update", self.original.pk)],
+        )
+
+
+class NearDuplicateTest(APITestCase):
+    """Test near-duplicate detection and the review/merge endpoints."""
+
+    CONTENT = (
+        "The user prefers morning meetings with the design team on Mondays and "
+        "likes to review the quarterly roadmap before lunch, usually with "
+        "coffee and a printed agenda."
+    )
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="user1", password="testpass123")
+        self.original = UserMemory.objects.create(
+            user=self.user, content=self.CONTENT, mem0_memory_id="mem0-1"
+        )
+        self.punctuation = UserMemory.objects.create(
+            user=self.user,
+            content=self.CONTENT.replace(",", ";").replace(".", "!"),
+            mem0_memory_id="mem0-2",
+        )
+        self.one_word = UserMemory.objects.create(
+            user=self.user,
+            content=self.CONTENT.replace("coffee", "tea"),
+            mem0_memory_id="mem0-3",
+        )
+        self.unrelated = UserMemory.objects.create(
+            user=self.user, content="Has a dog named Rex who loves the beach."
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_signature_maintained_on_save(self):
+        """Test that signatures are computed on save and follow content edits."""
+        self.assertIsNotNone(self.original.simhash)
+        self.assertEqual(self.original.simhash, self.punctuation.simhash)
+
+        self.unrelated.content = self.CONTENT
+        self.unrelated.save()
+        self.assertEqual(self.unrelated.simhash, self.original.simhash)
+
+    def test_detection_clusters_near_duplicates(self):
+        """Test that the job groups near duplicates and leaves others out."""
+        detect_near_duplicates_task()
+
+        cluster = NearDuplicateCluster.objects.get(user=self.user)
+        self.assertEqual(
+            cluster.member_ids,
+            [self.original.pk, self.punctuation.pk, self.one_word.pk],
+        )
+        self.assertEqual(cluster.canonical_id, self.original.pk)
+
+    def test_detection_backfills_missing_signatures(self):
+        """Test that memories saved without a signature get one during the scan."""
+        UserMemory.objects.update(simhash=None)
+
+        detect_near_duplicates_task()
+
+        self.assertFalse(UserMemory.objects.filter(simhash__isnull=True).exists())
+        self.assertEqual(NearDuplicateCluster.objects.count(), 1)
+
+    def test_list_and_merge_cluster(self):
+        """Test reviewing a cluster and merging it into one memory."""
+        detect_near_duplicates_task()
+
+        response = self.client.get("/api/memories/users/me/duplicates/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+        cluster = response.data["results"][0]
+        self.assertEqual(len(cluster["members"]), 3)
+
+        response = self.client.post(
+            f"/api/memories/users/me/duplicates/{cluster['id']}/merge/",
+            {"keep": self.one_word.pk},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], self.one_word.pk)
+        self.assertEqual(
+            list(UserMemory.objects.values_list("pk", flat=True).order_by("pk")),
+            [self.one_word.pk, self.unrelated.pk],
+        )
+        self.assertEqual(Mem0OutboxEvent.objects.filter(operation="delete").count(), 2)
+        self.assertEqual(
+            NearDuplicateCluster.objects.get(pk=cluster["id"]).status, "merged"
+        )
+
+    def test_dismissed_cluster_is_not_reopened(self):
+        """Test that dismissing a cluster keeps later scans from reopening it."""
+        detect_near_duplicates_task()
+        cluster = NearDuplicateCluster.objects.get(user=self.user)
+
+        response = self.client.delete(
+            f"/api/memories/users/me/duplicates/{cluster.pk}/"
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        detect_near_duplicates_task()
+        self.assertFalse(NearDuplicateCluster.objects.filter(status="open").exists())
+
+    def test_other_users_cannot_see_clusters(self):
+        """Test that clusters are scoped to their owner."""
+        detect_near_duplicates_task()
+        other = User.objects.create_user(username="user2", password="testpass123")
+        self.client.force_authenticate(user=other)
+
+        response = self.client.get("/api/memories/users/me/duplicates/")
+        self.assertEqual(len(response.data["results"]), 0)
+
+    def get_crowded_signatures(self):
+        """Return signatures crowding one LSH bucket: copies and close variants."""
+        base = 0x0123456789ABCDEF
+        variants = [base ^ (1 << bit) ^ (1 << (bit + 20)) for bit in range(40)]
+        signatures = [base] * 30 + variants + [~base & (2**64 - 1)]
+        return [value - 2**64 if value >= 2**63 else value for value in signatures]
+
+    @mock.patch("memories.neardup.MAX_BUCKET_SIZE", 10)
+    def test_large_buckets_are_split(self):
+        """Test that near duplicates in oversized LSH buckets are still found."""
+        signatures = self.get_crowded_signatures()
+
+        clusters = find_clusters(list(range(len(signatures))), signatures)
+        self.assertEqual(clusters, [list(range(len(signatures) - 1))])
+
+    @mock.patch("memories.neardup.MAX_BUCKET_SIZE", 2)
+    def test_capped_buckets_are_logged(self):
+        """Test that buckets too large to split are capped with a warning."""
+        signatures = self.get_crowded_signatures()
+
+        with self.assertLogs("memories.neardup", "WARNING") as logs:
+            find_clusters(list(range(len(signatures))), signatures)
+        self.assertIn("near duplicates in them may be missed", logs.output[0])
+
+
+class FastListSerializationTest(QueryCountAssertionsMixin, APITestCase):
+    """Test the list fast path and the alternative renderers."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="user1", password="testpass123")
+        self.organization = Organization.objects.create(
+            name="Test Org", admin=self.user
+        )
+        self.team = Team.objects.create(
+            name="Test Team", organization=self.organization
+        )
+        TeamMembership.objects.create(user=self.user, team=self.team)
+        for index in range(3):
+            TeamMemory.objects.create(
+                team=self.team, content=f"Team memory {index}", status="completed"
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_fast_path_matches_model_serializer(self):
+        """Test that fast path rows render exactly like the ModelSerializer."""
+        queryset = TeamMemory.objects.order_by("-created_at")
+
+        expected = JSONRenderer().render(TeamMemorySerializer(queryset, many=True).data)
+        fast = ORJSONRenderer().render(
+            TeamMemorySerializer.fast_data(TeamMemorySerializer.fast_values(queryset))
+        )
+        self.assertEqual(fast, expected)
+
+    @override_settings(MEMORY_CONTENT_COMPRESSION_THRESHOLD=10)
+    def test_fast_path_decompresses_content(self):
+        """Test that compressed content is decoded in list responses."""
+        content = "A long memory that is stored compressed. " * 5
+        TeamMemory.objects.create(team=self.team, content=content)
+
+        response = self.client.get(f"/api/memories/teams/{self.team.id}/")
+        self.assertEqual(response.json()["results"][0]["content"], content)
+
+    def test_list_renders_json_with_orjson(self):
+        """Test that list responses are rendered as JSON by default."""
+        response = self.client.get(f"/api/memories/teams/{self.team.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.json()["count"], 3)
+        self.assertTrue(response.json()["results"][0]["created_at"].endswith("Z"))
+
+    def test_list_queries_are_independent_of_page_size(self):
+        """Test that listing memories runs no query per memory."""
+
+        def add_memories(number):
+            for index in range(number):
+                TeamMemory.objects.create(team=self.team, content=f"More {index}")
+
+        self.assertQueriesIndependentOfPageSize(
+            f"/api/memories/teams/{self.team.id}/", add_memories
+        )
+
+    @skipUnless(msgpack, "msgpack is not installed")
+    def test_list_renders_msgpack_when_requested(self):
+        """Test MessagePack content negotiation."""
+        response = self.client.get(
+            f"/api/memories/teams/{self.team.id}/",
+            HTTP_ACCEPT="application/msgpack",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content)["count"], 3)
+
+
+class FakeMem0Client:
+    """Stand-in for mem0's MemoryClient returning predictable ids."""
+
+    def __init__(self, fail_for=()):
+        self.fail_for = set(fail_for)
+        self.calls = []
+
+    def add(self, messages, user_id):
+        self.calls.append(user_id)
+        if user_id in self.fail_for:
+            raise Exception("mem0 unavailable")
+        return {"results": [{"id": f"mem0-{user_id}"}]}
+
+    def update(self, memory_id, text):
+        self.calls.append(memory_id)
+        if memory_id in self.fail_for:
+            raise Exception("mem0 unavailable")
+
+    def delete(self, memory_id):
+        self.calls.append(memory_id)
+        if memory_id in self.fail_for:
+            raise Exception("mem0 unavailable")
+
+    def batch_update(self, memories):
+        self.calls.append(("batch_update", len(memories)))
+        if any(memory["memory_id"] in self.fail_for for memory in memories):
+            raise Exception("Batch rejected")
+
+    def batch_delete(self, memories):
+        self.calls.append(("batch_delete", len(memories)))
+        if any(memory["memory_id"] in self.fail_for for memory in memories):
+            raise Exception("Batch rejected")
+
+
+@mock.patch("memories.circuit_breaker.get_retry_delay", lambda retries: 10)
+class MemoryAddBatchingTest(TestCase):
+    """Test micro-batching of mem0 adds."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="user1", password="testpass123")
+        self.memories = [
+            UserMemory.objects.create(user=self.user, content=f"Memory {index}")
+            for index in range(3)
+        ]
+        self.duplicate = UserMemory.objects.create(
+            user=self.user, content="Memory 0", duplicate_of=self.memories[0]
+        )
+
+    def test_flush_maps_results_back_to_rows(self):
+        """Test that each mem0 result is written to its own memory."""
+        client = FakeMem0Client(fail_for={f"user_{self.memories[2].pk}"})
+        pks = [memory.pk for memory in self.memories]
+        with mock.patch(
+            "memories.tasks.get_mem0_instance", return_value=client
+        ), mock.patch("memories.tasks.mem0_add_task.apply_async") as retry:
+            flush_add_batch("user", [{"pk": pk} for pk in pks])
+
+        self.assertEqual(len(client.calls), 3)
+        first, second, third = UserMemory.objects.in_bulk(pks).values()
+        self.assertEqual(first.status, "completed")
+        self.assertEqual(first.mem0_memory_id, f"mem0-user_{first.pk}")
+        self.assertEqual(second.mem0_memory_id, f"mem0-user_{second.pk}")
+        # Failed adds stay claimed for their retry
+        self.assertEqual(third.status, "processing")
+        retry.assert_called_once_with(
+            ("user", third.pk, 1),
+            {"claimed": True, "lane": "interactive", "generation": 0},
+            countdown=10,
+        )
+
+        # Linked duplicates share the original's mem0 memory
+        self.duplicate.refresh_from_db()
+        self.assertEqual(self.duplicate.mem0_memory_id, first.mem0_memory_id)
+        self.assertEqual(self.duplicate.status, "completed")
+
+    def publish(self, groups, execute_result=None):
+        """Publish groups with a mocked Redis pipeline, returning the pipeline."""
+        redis_client = mock.Mock()
+        pipeline = redis_client.pipeline.return_value
+        pipeline.execute.return_value = execute_result
+        with mock.patch("memories.batching.get_redis", return_value=redis_client):
+            publish_operations(groups)
+        return pipeline
+
+    def test_first_entries_schedule_flush_after_window(self):
+        """Test that buffered adds are flushed after the batching window."""
+        with mock.patch("memories.tasks.mem0_flush_batch_task.apply_async") as flush:
+            pipeline = self.publish(
+                {("add", "user"): [{"pk": self.memories[0].pk}]}, [1, 1, True]
+            )
+
+        pipeline.rpush.assert_called_once_with(
+            "mem0:batch:add:user:tenant:default", f'{{"pk": {self.memories[0].pk}}}'
+        )
+        pipeline.sadd.assert_called_once_with("mem0:batch:add:user:tenants", "default")
+        self.assertEqual(pipeline.execute.call_count, 1)
+        self.assertEqual(
+            flush.call_args.args, (("add", "user"), {"lane": "interactive"})
+        )
+        self.assertEqual(flush.call_args.kwargs["countdown"], 0.5)
+
+    @override_settings(MEM0_BULK_LANE_THRESHOLD=3)
+    def test_large_groups_are_published_to_bulk_lane(self):
+        """Test that large groups are buffered and flushed on the bulk lane."""
+        with mock.patch("memories.tasks.mem0_flush_batch_task.apply_async") as flush:
+            pipeline = self.publish(
+                {
+                    ("add", "user"): [{"pk": memory.pk} for memory in self.memories],
+                    ("delete", "team"): [{"pk": 1, "mem0_id": "mem0-1"}],
+                },
+                [3, 1, True, 1, 1, True],
+            )
+
+        keys = [call.args[0] for call in pipeline.rpush.call_args_list]
+        self.assertEqual(
+            keys,
+            [
+                "mem0:batch:bulk:add:user:tenant:default",
+                "mem0:batch:delete:team:tenant:default",
+            ],
+        )
+        self.assertEqual(
+            [call.args for call in flush.call_args_list],
+            [
+                (("add", "user"), {"lane": "bulk"}),
+                (("delete", "team"), {"lane": "interactive"}),
+            ],
+        )
+
+    @override_settings(MEM0_BATCH_SIZE=2)
+    def test_full_batch_flushes_immediately(self):
+        """Test that a full buffer is flushed without waiting for the window."""
+        with mock.patch("memories.tasks.mem0_flush_batch_task.apply_async") as flush:
+            self.publish(
+                {
+                    ("add", "user"): [{"pk": memory.pk} for memory in self.memories],
+                    ("delete", "team"): [{"pk": 1, "mem0_id": "mem0-1"}],
+                },
+                [3, 1, False, 1, 1, False],
+            )
+
+        # The pending team delete waits for the flush scheduled earlier
+        flush.assert_called_once()
+        self.assertEqual(
+            flush.call_args.args, (("add", "user"), {"lane": "interactive"})
+        )
+        self.assertNotIn("countdown", flush.call_args.kwargs)
+
+    def test_publish_without_redis_sends_entries_with_task(self):
+        """Test that batches are published as tasks when Redis is unavailable."""
+        entries = [{"pk": memory.pk} for memory in self.memories]
+        with mock.patch("memories.batching.get_redis", return_value=None), mock.patch(
+            "memories.tasks.mem0_flush_batch_task.apply_async"
+        ) as flush:
+            publish_operations({("add", "user"): entries})
+
+        self.assertEqual(
+            flush.call_args.args,
+            (("add", "user", entries), {"lane": "interactive"}),
+        )
+        self.assertIsNone(flush.call_args.kwargs["compression"])
+
+    @override_settings(MEM0_TASK_COMPRESSION_THRESHOLD=64)
+    def test_large_task_payloads_are_compressed(self):
+        """Test that flush tasks carrying many entries are sent compressed."""
+        entries = [{"pk": pk} for pk in range(100)]
+        with mock.patch("memories.batching.get_redis", return_value=None), mock.patch(
+            "memories.tasks.mem0_flush_batch_task.apply_async"
+        ) as flush:
+            publish_operations({("add", "user"): entries})
+
+        self.assertEqual(flush.call_args.kwargs["compression"], "zlib")
+
+    @override_settings(MEM0_BATCH_SIZE=2)
+    def test_publish_without_redis_alternates_tenants(self):
+        """Test that one tenant's chunks do not all go out ahead of another's."""
+        entries = [{"pk": pk, "tenant": "7"} for pk in range(4)] + [{"pk": 9}]
+        with mock.patch("memories.batching.get_redis", return_value=None), mock.patch(
+            "memories.tasks.mem0_flush_batch_task.apply_async"
+        ) as flush:
+            publish_operations({("add", "user"): entries})
+
+        self.assertEqual(
+            [call.args[0][2] for call in flush.call_args_list],
+            [entries[0:2], [{"pk": 9}], entries[2:4]],
+        )
+
+    @skipUnless(redis_available(), "Redis is not reachable")
+    @override_settings(MEM0_BATCH_SIZE=4, MEM0_TENANT_QUANTUM=1)
+    def test_batches_take_turns_between_tenants(self):
+        """Test that a tenant's backlog does not hold back other tenants."""
+        client = redis.Redis.from_url(settings.REDIS_URL)
+        client.delete(*client.keys("mem0:batch:*"), circuit_breaker.OPEN_KEY)
+        entries = [{"pk": pk, "tenant": "1"} for pk in range(6)]
+        entries += [{"pk": 10, "tenant": "2"}, {"pk": 20}]
+        with mock.patch("memories.tasks.mem0_flush_batch_task.apply_async"):
+            publish_operations({("add", "user"): entries}, lane="interactive")
+
+        batches = []
+        with mock.patch(
+            "memories.batching.flush_add_batch",
+            side_effect=lambda memory_type, batch, lane: batches.append(
+                [entry["pk"] for entry in batch]
+            ),
+        ):
+            self.assertEqual(batching.flush_batches("add", "user"), 8)
+
+        self.assertEqual(batches, [[0, 10, 20, 1], [2, 3, 4, 5]])
+
+    @skipUnless(fakeredis, "fakeredis is not installed")
+    @override_settings(MEM0_BATCH_SIZE=3, MEM0_TENANT_QUANTUM=2)
+    def test_batch_script_takes_turns_without_redis(self):
+        """Test the tenant round-robin script on an in-memory Redis."""
+        client = get_lua_redis()
+        entries = [{"pk": pk, "tenant": "1"} for pk in range(5)]
+        entries += [{"pk": 10, "tenant": "2"}, {"pk": 20}]
+        batches = []
+        with mock.patch(
+            "memories.batching.get_redis", return_value=client
+        ), mock.patch(
+            "memories.circuit_breaker.get_redis", return_value=client
+        ), mock.patch(
+            "memories.tasks.mem0_flush_batch_task.apply_async"
+        ), mock.patch(
+            "memories.batching.flush_add_batch",
+            side_effect=lambda memory_type, batch, lane: batches.append(
+                [entry["pk"] for entry in batch]
+            ),
+        ):
+            publish_operations({("add", "user"): entries}, lane="interactive")
+            self.assertEqual(batching.flush_batches("add", "user"), 7)
+
+        # Each batch resumes after the tenant served last
+        self.assertEqual(batches, [[0, 1, 10], [20, 2, 3], [4]])
+        queue_key = batching.get_queue_key("add", "user")
+        self.assertEqual(client.smembers(batching.get_tenants_key(queue_key)), set())
+
+
+class Mem0OutboxTest(APITestCase):
+    """Test the transactional mem0 outbox."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="user1", password="testpass123")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_memory_changes_record_outbox_events(self):
+        """Test that creating, editing and deleting memories record events."""
+        with mock.patch("memories.tasks.mem0_add_task.delay") as add_delay:
+            response = self.client.post(
+                "/api/memories/users/me/", {"content": "Likes tea"}
+            )
+        add_delay.assert_not_called()
+        memory = UserMemory.objects.get(pk=response.data["id"])
+        memory.mark_as_processing()
+        memory.mark_as_completed(mem0_memory_id="mem0-1")
+
+        self.client.patch(
+            f"/api/memories/users/me/{memory.pk}/", {"content": "Likes coffee"}
+        )
+        self.client.delete(f"/api/memories/users/me/{memory.pk}/")
+
+        self.assertEqual(
+            list(
+                Mem0OutboxEvent.objects.values_list(
+                    "operation", "memory_id", "mem0_memory_id"
+                )
+            ),
+            [
+                ("add", memory.pk, None),
+                ("update", memory.pk, "mem0-1"),
+                ("delete", memory.pk, "mem0-1"),
+            ],
+        )
+
+    def test_rolled_back_change_leaves_no_event(self):
+        """Test that events are only kept for committed memory changes."""
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            UserMemory.objects.create(user=self.user, content="Never committed")
+            raise RuntimeError
+
+        self.assertFalse(Mem0OutboxEvent.objects.exists())
+
+    def test_relay_publishes_grouped_events(self):
+        """Test that the relay publishes a batch per group and clears the outbox."""
+        memories = [
+            UserMemory.objects.create(user=self.user, content=f"Memory {index}")
+            for index in range(3)
+        ]
+        deleted_pk = memories[0].pk
+        memories[0].mark_as_processing()
+        memories[0].mark_as_completed(mem0_memory_id="mem0-0")
+        memories[0].delete()
+
+        with mock.patch("memories.outbox.publish_operations") as publish:
+            relayed = relay_outbox(batch_size=2)
+
+        self.assertEqual(relayed, 4)
+        self.assertEqual(publish.call_count, 2)
+        self.assertEqual(
+            publish.call_args_list[0].args[0],
+            {("add", "user"): [{"pk": deleted_pk}, {"pk": memories[1].pk}]},
+        )
+        self.assertEqual(
+            publish.call_args_list[1].args[0],
+            {
+                ("add", "user"): [{"pk": memories[2].pk}],
+                ("delete", "user"): [{"pk": deleted_pk, "mem0_id": "mem0-0"}],
+            },
+        )
+        self.assertFalse(Mem0OutboxEvent.objects.exists())
+
+    def test_failed_publish_keeps_events(self):
+        """Test that events stay in the outbox when publishing fails."""
+        UserMemory.objects.create(user=self.user, content="Memory")
+
+        with mock.patch(
+            "memories.outbox.publish_operations", side_effect=ConnectionError
+        ), self.assertRaises(ConnectionError):
+            relay_outbox()
+
+        self.assertEqual(Mem0OutboxEvent.objects.count(), 1)
+
+    @override_settings(MEM0_OUTBOX_POLL_INTERVAL=7)
+    def test_relay_command_survives_failed_relays(self):
+        """Test that the relay loop backs off after an error and keeps going."""
+        with mock.patch(
+            "memories.management.commands.relay_mem0_outbox.relay_outbox",
+            side_effect=[ConnectionError, 3, 0],
+        ) as relay, mock.patch(
+            "memories.management.commands.relay_mem0_outbox.time.sleep",
+            side_effect=[None, KeyboardInterrupt],
+        ) as sleep, self.assertLogs(
+            "memories.management.commands.relay_mem0_outbox", level="ERROR"
+        ):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command("relay_mem0_outbox", stdout=open("/dev/null", "w"))
+
+        self.assertEqual(relay.call_count, 3)
+        self.assertEqual(sleep.call_args_list, [mock.call(7), mock.call(7)])
+
+    def test_events_are_attributed_to_owning_organization(self):
+        """Test that team and organization memories carry their org as tenant."""
+        organization = Organization.objects.create(name="Org", admin=self.user)
+        team = Team.objects.create(name="Team", organization=organization)
+        UserMemory.objects.create(user=self.user, content="Likes tea")
+        TeamMemory.objects.create(team=team, content="Ships on Fridays")
+        OrganizationMemory.objects.create(
+            organization=organization, content="Founded in 2020"
+        )
+
+        self.assertEqual(
+            [event.tenant for event in Mem0OutboxEvent.objects.all()],
+            ["default", str(organization.pk), str(organization.pk)],
+        )
+        self.assertEqual(
+            Mem0OutboxEvent.objects.last().to_entry()["tenant"], str(organization.pk)
+        )
+
+
+@override_settings(
+    MEMORY_BACKPRESSURE_CACHE_SECONDS=0,
+    MEMORY_BACKPRESSURE_DEFER_DEPTH=2,
+    MEMORY_BACKPRESSURE_REJECT_AGE=600,
+    MEMORY_BACKPRESSURE_RETRY_AFTER=30,
+)
+class MemoryBackpressureTest(APITestCase):
+    """Test backpressure on memory writes under a mem0 sync backlog."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="user1", password="testpass123")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.memory = UserMemory.objects.create(user=self.user, content="Likes tea")
+        # Later tests must not see this test's backlog
+        self.addCleanup(backpressure._backlogs.clear)
+
+    def create(self, content):
+        return self.client.post("/api/memories/users/me/", {"content": content})
+
+    def test_writes_report_backlog(self):
+        """Test that writes below the limits are accepted with the backlog."""
+        response = self.create("Likes coffee")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response["X-Memory-Backlog"], "1")
+        self.assertNotIn("X-Memory-Sync", response)
+        self.assertFalse(Mem0OutboxEvent.objects.last().bulk)
+        self.assertNotIn("X-Memory-Backlog", self.client.get("/api/memories/users/me/"))
+
+    def test_writes_past_defer_limit_sync_on_bulk_lane(self):
+        """Test that writes are accepted but deferred past the defer limit."""
+        self.create("Likes coffee")
+        response = self.create("Likes cocoa")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response["X-Memory-Sync"], "deferred")
+        self.assertTrue(Mem0OutboxEvent.objects.last().bulk)
+        # The deferral ends with the request
+        self.assertFalse(backpressure.is_mem0_sync_deferred())
+
+    def test_writes_past_reject_limit_get_retry_after(self):
+        """Test that writes are shed with a 503 once the backlog is too old."""
+        UserMemory.objects.filter(pk=self.memory.pk).update(
+            updated_at=timezone.now() - timedelta(minutes=20)
+        )
+        response = self.create("Likes coffee")
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertEqual(response["X-Memory-Backlog"], "1")
+        self.assertEqual(UserMemory.objects.count(), 1)
+
+    def test_stuck_and_redriven_memories_are_left_to_sweeper(self):
+        """Test that memories the sweeper handles do not hold up writes."""
+        UserMemory.objects.filter(pk=self.memory.pk).update(
+            updated_at=timezone.now() - timedelta(hours=2)
+        )
+        redriven = UserMemory.objects.create(user=self.user, content="Likes cocoa")
+        UserMemory.objects.filter(pk=redriven.pk).update(
+            redriven=True, updated_at=timezone.now() - timedelta(minutes=20)
+        )
+        response = self.create("Likes coffee")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response["X-Memory-Backlog"], "0")
+
+    def test_backlog_of_other_tenants_is_ignored(self):
+        """Test that another user's backlog does not hold up writes."""
+        other = User.objects.create_user(username="user2", password="testpass123")
+        for index in range(3):
+            UserMemory.objects.create(user=other, content=f"Memory {index}")
+        UserMemory.objects.filter(user=other).update(
+            updated_at=timezone.now() - timedelta(minutes=20)
+        )
+        response = self.create("Likes coffee")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response["X-Memory-Backlog"], "1")
+        self.assertNotIn("X-Memory-Sync", response)
+
+    @override_settings(MEMORY_BACKPRESSURE_DEFER_DEPTH=0)
+    def test_wait_is_a_percentile(self):
+        """Test that a single slow memory does not trip the age limits."""
+        UserMemory.objects.filter(pk=self.memory.pk).update(
+            updated_at=timezone.now() - timedelta(minutes=20)
+        )
+        for index in range(19):
+            UserMemory.objects.create(user=self.user, content=f"Memory {index}")
+
+        depth, age = backpressure.get_backlog(
+            backpressure.get_tenant("user", self.user.pk)
+        )
+        self.assertEqual(depth, 20)
+        self.assertLess(age, 60)
+        self.assertEqual(self.create("Likes coffee").status_code, 201)
+
+
+@mock.patch("memories.circuit_breaker.get_retry_delay", lambda retries: 10)
+class MemoryBulkSyncTest(TestCase):
+    """Test mem0 batch updates and deletes."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="user1", password="testpass123")
+        self.memories = [
+            UserMemory.objects.create(
+                user=self.user,
+                content=f"Memory {index}",
+                status="completed",
+                mem0_memory_id=f"mem0-{index}",
+            )
+            for index in range(3)
+        ]
+
+    @override_settings(MEM0_BULK_BATCH_SIZE=2)
+    def test_updates_are_sent_in_chunks(self):
+        """Test that updates use the batch endpoint in chunks of the API limit."""
+        client = FakeMem0Client()
+        entries = [
+            {"pk": memory.pk, "mem0_id": memory.mem0_memory_id}
+            for memory in self.memories
+        ]
+        # Repeated updates of a memory collapse into one
+        entries.append(entries[0])
+        with mock.patch("memories.tasks.get_mem0_instance", return_value=client):
+            flush_update_batch("user", entries)
+
+        self.assertEqual(client.calls, [("batch_update", 2), ("batch_update", 1)])
+        self.assertEqual(
+            set(UserMemory.objects.values_list("status", flat=True)), {"completed"}
+        )
+
+    def test_rejected_update_batch_falls_back_to_single_updates(self):
+        """Test that only the memories that really fail are retried."""
+        client = FakeMem0Client(fail_for={"mem0-1"})
+        entries = [
+            {"pk": memory.pk, "mem0_id": memory.mem0_memory_id}
+            for memory in self.memories
+        ]
+        with mock.patch(
+            "memories.tasks.get_mem0_instance", return_value=client
+        ), mock.patch("memories.tasks.mem0_update_task.apply_async") as retry:
+            flush_update_batch("user", entries)
+
+        statuses = dict(UserMemory.objects.values_list("mem0_memory_id", "status"))
+        self.assertEqual(
+            statuses,
+            {"mem0-0": "completed", "mem0-1": "processing", "mem0-2": "completed"},
+        )
+        retry.assert_called_once_with(
+            ("user", self.memories[1].pk, self.memories[1].version),
+            {"claimed": True, "lane": "interactive", "generation": 0},
+            countdown=10,
+        )
+
+    def test_rejected_delete_batch_retries_failed_items(self):
+        """Test that deletes failing individually are retried as tasks."""
+        client = FakeMem0Client(fail_for={"mem0-2"})
+        entries = [
+            {"pk": memory.pk, "mem0_id": memory.mem0_memory_id}
+            for memory in self.memories
+        ]
+        with mock.patch(
+            "memories.tasks.get_mem0_instance", return_value=client
+        ), mock.patch("memories.tasks.mem0_delete_task.apply_async") as retry:
+            flush_delete_batch("user", entries)
+
+        self.assertEqual(client.calls[0], ("batch_delete", 3))
+        self.assertEqual(sorted(client.calls[1:]), ["mem0-0", "mem0-1", "mem0-2"])
+        retry.assert_called_once_with(
+            ("user", self.memories[2].pk, "mem0-2"),
+            {"lane": "interactive"},
+            countdown=10,
+        )
+
+    def test_batch_results_are_mapped_per_memory(self):
+        """Test that memories a batch response reports as failed are retried."""
+
+        class PartialClient(FakeMem0Client):
+            def batch_update(client, memories):
+                client.calls.append(("batch_update", len(memories)))
+                return {
+                    "results": [
+                        (
+                            {"memory_id": memory["memory_id"], "error": "Memory locked"}
+                            if memory["memory_id"] == "mem0-1"
+                            else {"memory_id": memory["memory_id"], "status": "success"}
+                        )
+                        for memory in memories
+                    ]
+                }
+
+            def batch_delete(client, memories):
+                client.calls.append(("batch_delete", len(memories)))
+                # mem0-2 is missing from the results
+                return {"results": [{"memory_id": "mem0-0"}, {"memory_id": "mem0-1"}]}
+
+        client = PartialClient(fail_for={"mem0-1"})
+        entries = [
+            {"pk": memory.pk, "mem0_id": memory.mem0_memory_id}
+            for memory in self.memories
+        ]
+        with mock.patch(
+            "memories.tasks.get_mem0_instance", return_value=client
+        ), mock.patch(
+            "memories.tasks.mem0_update_task.apply_async"
+        ) as retry_update, mock.patch(
+            "memories.tasks.mem0_delete_task.apply_async"
+        ) as retry_delete:
+            flush_update_batch("user", entries)
+            flush_delete_batch("user", entries)
+
+        statuses = dict(UserMemory.objects.values_list("mem0_memory_id", "status"))
+        self.assertEqual(
+            statuses,
+            {"mem0-0": "completed", "mem0-1": "processing", "mem0-2": "completed"},
+        )
+        self.assertEqual(
+            client.calls,
+            [("batch_update", 3), "mem0-1", ("batch_delete", 3), "mem0-2"],
+        )
+        self.assertEqual(retry_update.call_args[0][0][1], self.memories[1].pk)
+        retry_delete.assert_not_called()
+
+
+class AsyncMem0ClientTest(TestCase):
+    """Test the event-loop backed mem0 client."""
+
+    @mock.patch("mem0.client.main.capture_client_event")
+    def test_calls_from_many_threads_share_the_loop(self, capture_event):
+        """Test that concurrent calls are in flight together, up to the limit."""
+        in_flight = {"current": 0, "peak": 0}
+
+        async def handler(request):
+            in_flight["current"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["current"])
+            await asyncio.sleep(0.05)
+            in_flight["current"] -= 1
+            return httpx.Response(200, json=[{"id": "mem0-1"}])
+
+        with mock.patch("mem0.AsyncMemoryClient._validate_api_key"):
+            client = AsyncMem0Client(
+                api_key="test-key",
+                host="http://mem0.test",
+                max_in_flight=5,
+                transport=httpx.MockTransport(handler),
+            )
+        try:
+            with ThreadPoolExecutor(max_workers=20) as executor:
+                results = list(
+                    executor.map(
+                        lambda index: client.search("tea", user_id=f"user_{index}"),
+                        range(20),
+                    )
+                )
+        finally:
+            client.close()
+
+        self.assertEqual(len(results), 20)
+        self.assertEqual(in_flight["peak"], 5)
+
+
+class MemoryEditCoalescingTest(TestCase):
+    """Test that rapid edits collapse into one mem0 update without losing any."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="user1", password="testpass123")
+        self.memory = UserMemory.objects.create(user=self.user, content="Likes tea")
+        Mem0OutboxEvent.objects.all().delete()
+
+    def edit(self, content):
+        self.memory.refresh_from_db()
+        self.memory.content = content
+        self.memory.save()
+
+    def test_rapid_edits_collapse_into_one_update(self):
+        """Test that edits within the debounce window are published once."""
+        self.memory.mark_as_processing()
+        self.memory.mark_as_completed(mem0_memory_id="mem0-1", synced_content="x")
+        Mem0OutboxEvent.objects.all().delete()
+        for content in ("Likes coffee", "Likes green tea", "Likes black tea"):
+            self.edit(content)
+
+        with mock.patch("memories.outbox.publish_operations") as publish:
+            self.assertEqual(relay_outbox(), 0)
+            with override_settings(MEM0_UPDATE_DEBOUNCE=0):
+                self.assertEqual(relay_outbox(), 3)
+
+        publish.assert_called_once_with(
+            {("update", "user"): [{"pk": self.memory.pk, "mem0_id": "mem0-1"}]}
+        )
+
+    def test_updates_fold_into_pending_add(self):
+        """Test that updates published with the memory's add are dropped."""
+        events = [
+            Mem0OutboxEvent(operation="add", memory_type="user", memory_id=1),
+            Mem0OutboxEvent(
+                operation="update",
+                memory_type="user",
+                memory_id=1,
+                mem0_memory_id="mem0-1",
+            ),
+        ]
+        self.assertEqual(collapse_events(events), {("add", "user"): [{"pk": 1}]})
+
+    def test_edit_during_add_is_synced_afterwards(self):
+        """Test that content edited while the add is in flight gets an update."""
+        run_concurrently = batching.run_concurrently
+
+        def edit_then_run(func, items):
+            # The memory is edited after it was claimed for the add
+            self.edit("Likes coffee")
+            return run_concurrently(func, items)
+
+        with mock.patch(
+            "memories.tasks.get_mem0_instance", return_value=FakeMem0Client()
+        ), mock.patch("memories.batching.run_concurrently", edit_then_run):
+            flush_add_batch("user", [{"pk": self.memory.pk}])
+
+        self.memory.refresh_from_db()
+        self.assertEqual(self.memory.content, "Likes coffee")
+        self.assertNotEqual(
+            self.memory.synced_content_hash, self.memory.raw_content_hash
+        )
+        # Recorded by the edit and by the add's check, collapsed by the relay
+        self.assertEqual(
+            list(Mem0OutboxEvent.objects.values_list("operation", "memory_id")),
+            [("update", self.memory.pk), ("update", self.memory.pk)],
+        )
+
+    def test_edit_overlapping_a_sync_keeps_its_result(self):
+        """Test that an edit loaded before a sync completed does not undo it."""
+        serializer = UserMemorySerializer(
+            UserMemory.objects.get(pk=self.memory.pk),
+            data={"content": "Likes coffee"},
+            partial=True,
+        )
+        self.assertTrue(serializer.is_valid())
+        # A worker claims and completes the add before the edit is saved
+        self.assertEqual(UserMemory.transition(self.memory.pk, "processing"), 1)
+        self.memory.mark_as_completed(
+            mem0_memory_id="mem0-X", synced_content="Likes tea"
+        )
+        serializer.save()
+
+        self.memory.refresh_from_db()
+        self.assertEqual(
+            (self.memory.status, self.memory.mem0_memory_id, self.memory.content),
+            ("completed", "mem0-X", "Likes coffee"),
+        )
+        self.assertEqual(
+            list(Mem0OutboxEvent.objects.values_list("operation", "memory_id")),
+            [("update", self.memory.pk)],
+        )
+
+    def test_same_hash_save_overlapping_a_sync_keeps_its_result(self):
+        """Test that a save not changing the content hash keeps the sync state."""
+        self.memory.content = "hello world"
+        self.memory.save()
+        loaded = UserMemory.objects.get(pk=self.memory.pk)
+        # A worker claims and completes the add before the stale save
+        self.assertEqual(UserMemory.transition(self.memory.pk, "processing"), 1)
+        self.memory.mark_as_completed(
+            mem0_memory_id="mem0-X", synced_content="hello world"
+        )
+        loaded.content = "Hello  World"
+        loaded.save()
+
+        self.memory.refresh_from_db()
+        self.assertEqual(
+            (self.memory.status, self.memory.mem0_memory_id, self.memory.content),
+            ("completed", "mem0-X", "Hello  World"),
+        )
+
+    def test_edited_duplicate_overlapping_a_sync_gets_its_own_add(self):
+        """Test that an edited duplicate leaves the mem0 memory synced meanwhile."""
+        duplicate = UserMemory.objects.create(
+            user=self.user, content="Likes tea", duplicate_of=self.memory
+        )
+        loaded = UserMemory.objects.get(pk=duplicate.pk)
+        # The original's add completes and is shared with the duplicate
+        self.assertEqual(UserMemory.transition(self.memory.pk, "processing"), 1)
+        self.memory.mark_as_completed(
+            mem0_memory_id="mem0-X", synced_content="Likes tea"
+        )
+        Mem0OutboxEvent.objects.all().delete()
+        loaded.content = "Likes coffee"
+        loaded.save()
+
+        duplicate.refresh_from_db()
+        self.assertEqual(
+            (duplicate.status, duplicate.mem0_memory_id, duplicate.duplicate_of_id),
+            ("pending", None, None),
+        )
+        self.assertEqual(
+            UserMemory.objects.get(pk=self.memory.pk).mem0_memory_id, "mem0-X"
+        )
+        self.assertEqual(
+            list(Mem0OutboxEvent.objects.values_list("operation", "memory_id")),
+            [("add", duplicate.pk)],
+        )
+
+    def test_already_synced_update_is_skipped(self):
+        """Test that updates whose content mem0 already has make no call."""
+        self.memory.mark_as_processing()
+        self.memory.mark_as_completed(
+            mem0_memory_id="mem0-1", synced_content="Likes tea"
+        )
+        client = FakeMem0Client()
+        with mock.patch("memories.tasks.get_mem0_instance", return_value=client):
+            flush_update_batch("user", [{"pk": self.memory.pk, "mem0_id": "mem0-1"}])
+
+        self.assertEqual(client.calls, [])
+
+    def test_case_only_edit_is_synced(self):
+        """Test that an edit changing only case is versioned and sent to mem0."""
+        self.memory.mark_as_processing()
+        self.memory.mark_as_completed(
+            mem0_memory_id="mem0-1", synced_content="Likes tea"
+        )
+        self.edit("Likes Tea")
+        self.assertEqual(self.memory.version, 2)
+
+        client = FakeMem0Client()
+        with mock.patch("memories.tasks.get_mem0_instance", return_value=client):
+            flush_update_batch("user", [{"pk": self.memory.pk, "mem0_id": "mem0-1"}])
+
+        self.assertEqual(client.calls, [("batch_update", 1)])
+        self.memory.refresh_from_db()
+        self.assertEqual(self.memory.synced_content_hash, self.memory.raw_content_hash)
+
+    def test_case_only_edit_of_duplicate_leaves_original(self):
+        """Test that a duplicate edited to the same normalized content stays linked."""
+        self.memory.mark_as_processing()
+        self.memory.mark_as_completed(
+            mem0_memory_id="mem0-1", synced_content="Likes tea"
+        )
+        duplicate = UserMemory.objects.create(
+            user=self.user,
+            content="Likes tea",
+            duplicate_of=self.memory,
+            mem0_memory_id="mem0-1",
+            status="completed",
+        )
+        duplicate.content = "likes TEA"
+        duplicate.save()
+
+        client = FakeMem0Client()
+        with mock.patch("memories.tasks.get_mem0_instance", return_value=client):
+            flush_update_batch("user", [{"pk": duplicate.pk, "mem0_id": "mem0-1"}])
+
+        self.assertEqual(client.calls, [])
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.duplicate_of_id, self.memory.pk)
+
+
+class VersionedMem0TaskTest(TestCase):
+    """Test that mem0 tasks carry versions and read content when they run."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="user1", password="testpass123")
+        self.memory = UserMemory.objects.create(user=self.user, content="Likes tea")
+        self.client = FakeMem0Client()
+
+    def edit(self, content):
+        self.memory.refresh_from_db()
+        self.memory.content = content
+        self.memory.save()
+
+    def run_task(self, task, *args):
+        with mock.patch("memories.tasks.get_mem0_instance", return_value=self.client):
+            task.apply(args=args)
+        self.memory.refresh_from_db()
+
+    def test_content_changes_increment_version(self):
+        """Test that only content changes bump the version."""
+        self.assertEqual(self.memory.version, 1)
+        self.memory.mark_as_processing()
+        self.edit("Likes tea")
+        self.assertEqual(self.memory.version, 1)
+        self.edit("Likes coffee")
+        self.assertEqual(self.memory.version, 2)
+
+    def test_superseded_update_skips_mem0(self):
+        """Test that an update queued before a later edit makes no call."""
+        self.memory.mark_as_processing()
+        self.memory.mark_as_completed(
+            mem0_memory_id="mem0-1", synced_content="Likes tea"
+        )
+        self.edit("Likes coffee")
+        self.edit("Likes green tea")
+
+        self.run_task(mem0_update_task, "user", self.memory.pk, 2)
+        self.assertEqual(self.client.calls, [])
+
+        self.run_task(mem0_update_task, "user", self.memory.pk, 3)
+        self.assertEqual(self.client.calls, ["mem0-1"])
+        self.assertEqual(self.memory.status, "completed")
+        self.assertEqual(self.memory.synced_content_hash, self.memory.raw_content_hash)
+
+    def test_add_sends_current_content(self):
+        """Test that an add queued before an edit sends the edited content."""
+        self.edit("Likes coffee")
+        Mem0OutboxEvent.objects.all().delete()
+
+        self.run_task(mem0_add_task, "user", self.memory.pk, 1)
+        self.assertEqual(self.client.calls, [f"user_{self.memory.pk}"])
+        self.assertEqual(self.memory.synced_content_hash, self.memory.raw_content_hash)
+        self.assertFalse(Mem0OutboxEvent.objects.exists())
+
+        # A redelivered add finds the memory synced
+        self.run_task(mem0_add_task, "user", self.memory.pk, 1)
+        self.assertEqual(len(self.client.calls), 1)
+
+    def test_add_skips_memory_being_synced(self):
+        """Test that a memory claimed by another worker is not added twice."""
+        self.assertTrue(self.memory.mark_as_processing())
+        self.run_task(mem0_add_task, "user", self.memory.pk, 1)
+        self.assertEqual(self.client.calls, [])
+
+    def test_failed_claim_is_retried(self):
+        """Test that a claim failing on the database is retried."""
+        transition = UserMemory.transition
+        errors = [OperationalError("pool timeout")]
+
+        def claim(*args, **kwargs):
+            if errors:
+                raise errors.pop()
+            return transition(*args, **kwargs)
+
+        with mock.patch.object(UserMemory, "transition", side_effect=claim):
+            self.run_task(mem0_add_task, "user", self.memory.pk, 1)
+
+        self.assertEqual(self.client.calls, [f"user_{self.memory.pk}"])
+        self.assertEqual(self.memory.status, "completed")
+
+    def test_connection_is_released_before_mem0_call(self):
+        """Test that no database connection is held while mem0 is called."""
+        client = self.client
+
+        class CheckingClient(FakeMem0Client):
+            def add(self, messages, user_id):
+                connection.close.assert_called_once_with()
+                return client.add(messages, user_id)
+
+        self.client = CheckingClient()
+        with mock.patch("memories.tasks.connection") as connection:
+            connection.in_atomic_block = False
+            self.run_task(mem0_add_task, "user", self.memory.pk, 1)
+
+        self.assertEqual(client.calls, [f"user_{self.memory.pk}"])
+
+
+class MemoryStatusTransitionTest(TestCase):
+    """Test the conditional status transitions of the processing lifecycle."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="user1", password="testpass123")
+        self.memory = UserMemory.objects.create(user=self.user, content="Likes tea")
+
+    def test_only_one_worker_claims_a_memory(self):
+        """Test that a second claim of a processing memory updates nothing."""
+        self.assertEqual(UserMemory.transition(self.memory.pk, "processing"), 1)
+        self.assertEqual(UserMemory.transition(self.memory.pk, "processing"), 0)
+
+    def test_claim_checks_version(self):
+        """Test that a claim for a superseded version updates nothing."""
+        self.memory.content = "Likes coffee"
+        self.memory.save()
+        self.assertEqual(
+            UserMemory.transition(self.memory.pk, "processing", version=1), 0
+        )
+        self.assertEqual(
+            UserMemory.transition(self.memory.pk, "processing", version=2), 1
+        )
+
+    def test_unclaimed_memory_cannot_complete(self):
+        """Test that completing or failing requires a claimed memory."""
+        self.assertFalse(self.memory.mark_as_completed(mem0_memory_id="mem0-1"))
+        self.assertFalse(self.memory.mark_as_failed("mem0 unavailable"))
+        self.memory.refresh_from_db()
+        self.assertEqual(self.memory.status, "pending")
+        self.assertIsNone(self.memory.mem0_memory_id)
+
+        self.assertTrue(self.memory.mark_as_processing())
+        self.assertTrue(self.memory.mark_as_failed("mem0 unavailable"))
+        self.memory.refresh_from_db()
+        self.assertEqual(self.memory.status, "failed")
+        self.assertEqual(self.memory.error_message, "mem0 unavailable")
+
+
+class FakeRedis:
+    """In-memory stand-in for the few Redis commands the circuit breaker uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def expire(self, key, seconds):
+        return key in self.data
+
+    def rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(values)
+        return len(self.data[key])
+
+    def lpop(self, key, count):
+        items = self.data.get(key, [])
+        self.data[key] = items[count:]
+        return items[:count] or None
+
+    def pipeline(self, transaction=True):
+        redis_client = self
+
+        class Pipeline:
+            def __init__(self):
+                self.commands = []
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: self.commands.append(
+                    (name, args, kwargs)
+                )
+
+            def execute(self):
+                return [
+                    getattr(redis_client, name)(*args, **kwargs)
+                    for name, args, kwargs in self.commands
+                ]
+
+        return Pipeline()
+
+
+@override_settings(MEM0_CIRCUIT_FAILURE_THRESHOLD=2, MEM0_PARKED_RAMP_START=2)
+@mock.patch("memories.circuit_breaker.get_retry_delay", lambda retries: 0)
+class Mem0CircuitBreakerTest(TestCase):
+    """Test the shared circuit breaker around mem0 calls."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.redis = FakeRedis()
+        patcher = mock.patch(
+            "memories.circuit_breaker.get_redis", return_value=self.redis
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username="user1", password="testpass123")
+        self.memory = UserMemory.objects.create(user=self.user, content="Likes tea")
+
+    def trip(self):
+        for _ in range(2):
+            circuit_breaker.record_failure()
+
+    def test_open_circuit_parks_tasks(self):
+        """Test that tasks are parked without touching mem0 or the memory."""
+        self.trip()
+        self.assertFalse(circuit_breaker.allow_request())
+
+        client = FakeMem0Client()
+        with mock.patch("memories.tasks.get_mem0_instance", return_value=client):
+            mem0_add_task.apply(args=("user", self.memory.pk, 1))
+
+        self.assertEqual(client.calls, [])
+        self.memory.refresh_from_db()
+        self.assertEqual(self.memory.status, "pending")
+        self.assertEqual(len(self.redis.data[circuit_breaker.PARKED_KEY]), 1)
+
+    def test_half_open_circuit_lets_one_probe_through(self):
+        """Test that one call probes mem0 after the reset timeout."""
+        self.trip()
+        # The open period expired
+        self.redis.delete(circuit_breaker.OPEN_KEY)
+        self.assertTrue(circuit_breaker.allow_request())
+        self.assertFalse(circuit_breaker.allow_request())
+
+        circuit_breaker.record_success()
+        self.assertTrue(circuit_breaker.allow_request())
+        self.assertTrue(circuit_breaker.allow_request())
+
+    def test_probing_flush_sends_one_entry(self):
+        """Test that a flush holding the probe makes one call and parks the rest."""
+        memories = [self.memory] + [
+            UserMemory.objects.create(user=self.user, content=f"Likes {drink}")
+            for drink in ("coffee", "juice")
+        ]
+        entries = [{"pk": memory.pk} for memory in memories]
+        self.trip()
+        self.redis.delete(circuit_breaker.OPEN_KEY)
+
+        client = FakeMem0Client()
+        with mock.patch("memories.tasks.get_mem0_instance", return_value=client):
+            mem0_flush_batch_task.apply(args=("add", "user", entries))
+
+        self.assertEqual(client.calls, [f"user_{self.memory.pk}"])
+        parked = self.redis.data[circuit_breaker.PARKED_KEY]
+        parked = [json.loads(entry) for entry in parked]
+        self.assertEqual(
+            [entry["args"] for entry in parked], [["add", "user", entries[1:]]]
+        )
+
+    def test_probing_buffer_flush_takes_one_operation(self):
+        """Test that a buffer flush holding the probe takes a single operation."""
+        self.trip()
+        self.redis.delete(circuit_breaker.OPEN_KEY)
+        next_batch = mock.Mock(return_value=[json.dumps({"pk": self.memory.pk})])
+
+        with mock.patch(
+            "memories.batching.get_redis", return_value=self.redis
+        ), mock.patch(
+            "memories.batching.get_next_batch_script", return_value=next_batch
+        ), mock.patch(
+            "memories.batching.flush_add_batch"
+        ) as flush:
+            mem0_flush_batch_task.apply(args=("add", "user"))
+
+        flush.assert_called_once()
+        self.assertEqual(next_batch.call_args.kwargs["args"][1], 1)
+        parked = self.redis.data[circuit_breaker.PARKED_KEY]
+        parked = [json.loads(entry) for entry in parked]
+        self.assertEqual([entry["args"] for entry in parked], [["add", "user"]])
+
+    def test_probe_without_mem0_call_is_released(self):
+        """Test that a probing task that skips mem0 lets the next call probe."""
+        self.memory.mark_as_processing()
+        self.memory.mark_as_completed(
+            mem0_memory_id="mem0-1", synced_content="Likes tea"
+        )
+        self.trip()
+        self.redis.delete(circuit_breaker.OPEN_KEY)
+
+        client = FakeMem0Client()
+        with mock.patch("memories.tasks.get_mem0_instance", return_value=client):
+            # Already synced, so the update claims nothing
+            mem0_update_task.apply(args=("user", self.memory.pk, 1))
+
+        self.assertEqual(client.calls, [])
+        self.assertNotIn(circuit_breaker.PROBE_KEY, self.redis.data)
+        self.assertTrue(circuit_breaker.allow_request())
+
+    def test_empty_probing_flush_releases_probe(self):
+        """Test that a probing flush of an empty buffer releases the probe."""
+        self.trip()
+        self.redis.delete(circuit_breaker.OPEN_KEY)
+        next_batch = mock.Mock(return_value=[])
+
+        with mock.patch(
+            "memories.batching.get_redis", return_value=self.redis
+        ), mock.patch(
+            "memories.batching.get_next_batch_script", return_value=next_batch
+        ), mock.patch(
+            "memories.batching.flush_add_batch"
+        ) as flush:
+            mem0_flush_batch_task.apply(args=("add", "user"))
+
+        flush.assert_not_called()
+        self.assertNotIn(circuit_breaker.PROBE_KEY, self.redis.data)
+        self.assertTrue(circuit_breaker.allow_request())
+
+    def test_parked_tasks_drain_with_ramp_up(self):
+        """Test that the parked backlog is released in growing steps."""
+        self.trip()
+        for pk in range(10):
+            circuit_breaker.park_task(mem0_add_task, ("user", pk, 1))
+        app = mock.MagicMock()
+
+        self.assertEqual(circuit_breaker.drain_parked_tasks(app), 0)
+        self.redis.delete(circuit_breaker.OPEN_KEY)
+        # Half-open: a single task probes mem0
+        self.assertEqual(circuit_breaker.drain_parked_tasks(app), 1)
+        circuit_breaker.record_success()
+        self.assertEqual(
+            [circuit_breaker.drain_parked_tasks(app) for _ in range(3)], [2, 4, 3]
+        )
+        app.tasks[mem0_add_task.name].apply_async.assert_called_with(
+            ["user", 9, 1], {}, countdown=mock.ANY, producer=mock.ANY
+        )
+
+    def test_retries_keep_memory_claimed_until_final_failure(self):
+        """Test that failed status is only written after the last retry."""
+        self.memory.mark_as_processing()
+        self.memory.mark_as_completed(
+            mem0_memory_id="mem0-1", synced_content="Likes tea"
+        )
+        self.memory.content = "Likes coffee"
+        self.memory.save()
+        statuses = []
+
+        class FailingClient(FakeMem0Client):
+            def update(client, memory_id, text):
+                statuses.append(UserMemory.objects.get(pk=self.memory.pk).status)
+                raise Exception("mem0 unavailable")
+
+        with override_settings(MEM0_CIRCUIT_FAILURE_THRESHOLD=10), mock.patch(
+            "memories.tasks.get_mem0_instance", return_value=FailingClient()
+        ):
+            mem0_update_task.apply(args=("user", self.memory.pk, 2))
+
+        self.assertEqual(statuses, ["processing"] * 4)
+        self.memory.refresh_from_db()
+        self.assertEqual(self.memory.status, "failed")
+        self.assertEqual(self.memory.error_message, "mem0 unavailable")
+
+
+@override_settings(MEM0_RATE_LIMITS={"add": 10, "update": 10, "delete": 0})
+class Mem0RateLimitTest(TestCase):
+    """Test the cluster-wide mem0 rate limiter."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="user1", password="testpass123")
+        self.memory = UserMemory.objects.create(user=self.user, content="Likes tea")
+
+    def acquire_with(self, result, *args, **kwargs):
+        script = mock.Mock(return_value=result)
+        with mock.patch(
+            "memories.rate_limit.get_redis", return_value=mock.Mock()
+        ), mock.patch(
+            "memories.rate_limit.get_acquire_script", return_value=script
+        ), mock.patch(
+            "memories.rate_limit.time.sleep"
+        ) as sleep:
+            rate_limit.acquire(*args, **kwargs)
+        return script, sleep
+
+    def test_operations_without_quota_never_wait(self):
+        """Test that unlimited operations do not touch Redis."""
+        script, sleep = self.acquire_with([1, b"0"], "delete")
+        script.assert_not_called()
+        sleep.assert_not_called()
+
+    def test_acquire_waits_for_reserved_quota(self):
+        """Test that callers sleep until their reserved tokens are covered."""
+        script, sleep = self.acquire_with([1, b"0.25"], "add")
+        self.assertEqual(script.call_args.kwargs["keys"], ["mem0:ratelimit:add"])
+        self.assertEqual(script.call_args.kwargs["args"], [10, 10, 1, -1])
+        sleep.assert_called_once_with(0.25)
+
+    def test_task_is_requeued_when_quota_is_exhausted(self):
+        """Test that tasks wait for quota in the queue instead of failing."""
+        self.memory.mark_as_processing()
+        self.memory.mark_as_completed(
+            mem0_memory_id="mem0-1", synced_content="Likes tea"
+        )
+        self.memory.content = "Likes coffee"
+        self.memory.save()
+        client = FakeMem0Client()
+        script = mock.Mock(return_value=[0, b"30"])
+
+        with mock.patch(
+            "memories.rate_limit.get_redis", return_value=mock.Mock()
+        ), mock.patch(
+            "memories.rate_limit.get_acquire_script", return_value=script
+        ), mock.patch(
+            "memories.tasks.get_mem0_instance", return_value=client
+        ), mock.patch.object(
+            mem0_update_task, "apply_async"
+        ) as requeue:
+            mem0_update_task.apply(args=("user", self.memory.pk, 2))
+
+        self.assertEqual(client.calls, [])
+        requeue.assert_called_once_with(
+            ("user", self.memory.pk, 2),
+            {"claimed": True, "lane": "interactive", "generation": 0},
+            countdown=30.0,
+        )
+        self.memory.refresh_from_db()
+        self.assertEqual(self.memory.status, "processing")
+
+    @skipUnless(redis_available(), "Redis is not reachable")
+    def test_token_bucket_paces_reservations(self):
+        """Test that the Redis token bucket queues callers at the quota."""
+        redis.Redis.from_url(settings.REDIS_URL).delete("mem0:ratelimit:add")
+        with override_settings(MEM0_RATE_LIMITS={"add": 2}, MEM0_RATE_LIMIT_BURST=0.5):
+            waits = [rate_limit.reserve("add") for _ in range(3)]
+            with self.assertRaises(rate_limit.QuotaExhausted):
+                rate_limit.reserve("add", max_wait=1)
+
+        self.assertEqual(waits[0], 0)
+        self.assertAlmostEqual(waits[1], 0.5, delta=0.05)
+        self.assertAlmostEqual(waits[2], 1.0, delta=0.05)
+
+    @skipUnless(fakeredis, "fakeredis is not installed")
+    def test_token_bucket_script_without_redis(self):
+        """Test the token bucket script on an in-memory Redis."""
+        client = get_lua_redis()
+        with mock.patch(
+            "memories.rate_limit.get_redis", return_value=client
+        ), override_settings(MEM0_RATE_LIMITS={"add": 2}, MEM0_RATE_LIMIT_BURST=1):
+            waits = [rate_limit.reserve("add") for _ in range(4)]
+            with self.assertRaises(rate_limit.QuotaExhausted) as exhausted:
+                rate_limit.reserve("add", max_wait=1)
+
+        # The burst of two is free, then reservations queue at the quota
+        self.assertEqual(waits[:2], [0, 0])
+        self.assertAlmostEqual(waits[2], 0.5, delta=0.05)
+        self.assertAlmostEqual(waits[3], 1.0, delta=0.05)
+        self.assertAlmostEqual(exhausted.exception.wait, 1.5, delta=0.05)
+        tokens = float(client.hget(rate_limit.get_bucket_key("add"), "tokens"))
+        self.assertAlmostEqual(tokens, -2, delta=0.1)
+        self.assertGreater(client.ttl(rate_limit.get_bucket_key("add")), 0)
+
+
+@override_settings(MEM0_ADAPTIVE_CONCURRENCY=True, MEM0_CONCURRENCY_LATENCY_TARGET=5)
+class Mem0AdaptiveConcurrencyTest(TestCase):
+    """Test the cluster-wide AIMD limit on concurrent mem0 calls."""
+
+    def test_call_slot_reports_congestion(self):
+        """Test that failed or slow calls are released as congested."""
+        with mock.patch(
+            "memories.concurrency.acquire_lease", return_value="lease-1"
+        ), mock.patch("memories.concurrency.release_lease") as release:
+            with concurrency.call_slot("add"):
+                pass
+            with self.assertRaises(ValueError), concurrency.call_slot("add"):
+                raise ValueError("mem0 unavailable")
+            with override_settings(MEM0_CONCURRENCY_LATENCY_TARGET=0):
+                with concurrency.call_slot("add"):
+                    pass
+
+        self.assertEqual(
+            [call.kwargs["congested"] for call in release.call_args_list],
+            [False, True, True],
+        )
+        self.assertGreaterEqual(concurrency.get_concurrency_stats()["calls"], 3)
+
+    def test_acquire_waits_for_a_free_slot(self):
+        """Test that callers poll until the limit has room."""
+        script = mock.Mock(side_effect=[0, 0, 1])
+        with mock.patch(
+            "memories.concurrency.get_redis", return_value=mock.Mock()
+        ), mock.patch(
+            "memories.concurrency.get_script", return_value=script
+        ), mock.patch(
+            "memories.concurrency.time.sleep"
+        ) as sleep:
+            lease = concurrency.acquire_lease()
+
+        self.assertIsNotNone(lease)
+        self.assertEqual(script.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_disabled_without_redis(self):
+        """Test that calls are not limited when Redis is unavailable."""
+        with mock.patch("memories.concurrency.get_redis", return_value=None):
+            self.assertIsNone(concurrency.acquire_lease())
+            self.assertIsNone(concurrency.release_lease("lease-1", congested=True))
+
+    @skipUnless(redis_available(), "Redis is not reachable")
+    @override_settings(
+        MEM0_CONCURRENCY_INITIAL=4, MEM0_CONCURRENCY_DECREASE_COOLDOWN=60
+    )
+    def test_limit_increases_additively_and_decreases_multiplicatively(self):
+        """Test the AIMD adjustments of the shared limit."""
+        redis.Redis.from_url(settings.REDIS_URL).delete(
+            concurrency.LEASES_KEY, concurrency.LIMIT_KEY, concurrency.DECREASE_KEY
+        )
+        lease = concurrency.acquire_lease()
+        self.assertEqual(concurrency.release_lease(lease, congested=False), 4.25)
+        self.assertEqual(concurrency.release_lease("x", congested=True), 2.125)
+        # One decrease per cooldown
+        self.assertEqual(concurrency.release_lease("y", congested=True), 2.125)
+
+    @skipUnless(fakeredis, "fakeredis is not installed")
+    @override_settings(
+        MEM0_CONCURRENCY_INITIAL=2, MEM0_CONCURRENCY_DECREASE_COOLDOWN=60
+    )
+    def test_lease_scripts_without_redis(self):
+        """Test the AIMD lease scripts on an in-memory Redis."""
+        client = get_lua_redis()
+        with mock.patch("memories.concurrency.get_redis", return_value=client):
+            leases = [concurrency.acquire_lease() for _ in range(2)]
+            # The limit is reached, so the third caller waits for a release
+            with mock.patch(
+                "memories.concurrency.time.sleep",
+                side_effect=lambda delay: concurrency.release_lease(
+                    leases[0], congested=False
+                ),
+            ) as sleep:
+                leases.append(concurrency.acquire_lease())
+            self.assertEqual(sleep.call_count, 1)
+            self.assertEqual(client.zcard(concurrency.LEASES_KEY), 2)
+
+            self.assertEqual(concurrency.release_lease(leases[1], congested=True), 1.25)
+            self.assertEqual(concurrency.release_lease(leases[2], congested=True), 1.25)
+
+        self.assertEqual(client.zcard(concurrency.LEASES_KEY), 0)
+
+
+class MemorySweeperTest(TestCase):
+    """Test re-driving memories stuck without a completed mem0 sync."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="user1", password="testpass123")
+        self.memories = [
+            UserMemory.objects.create(user=self.user, content=f"Memory {index}")
+            for index in range(5)
+        ]
+        Mem0OutboxEvent.objects.all().delete()
+        stale = timezone.now() - timedelta(hours=2)
+
+        def stick(memory, **fields):
+            UserMemory.objects.filter(pk=memory.pk).update(updated_at=stale, **fields)
+
+        first, second, third, fourth, _ = self.memories
+        stick(first, status="pending")
+        stick(second, status="processing", mem0_memory_id="mem0-1")
+        stick(
+            third,
+            status="failed",
+            mem0_memory_id="mem0-2",
+            synced_content_hash=third.raw_content_hash,
+        )
+        stick(fourth, status="pending", duplicate_of=first)
+
+    def test_stuck_memories_are_re_enqueued(self):
+        """Test that stale memories get outbox events or are completed."""
+        self.assertEqual(sweep_stuck_memories_task(), 3)
+
+        first, second, third, fourth, fifth = UserMemory.objects.in_bulk(
+            [memory.pk for memory in self.memories]
+        ).values()
+        self.assertEqual(
+            list(
+                Mem0OutboxEvent.objects.values_list(
+                    "operation", "memory_id", "mem0_memory_id"
+                )
+            ),
+            [("add", first.pk, None), ("update", second.pk, "mem0-1")],
+        )
+        self.assertEqual(
+            [memory.status for memory in (first, second, third)],
+            ["pending", "pending", "completed"],
+        )
+        # Linked duplicates and recently changed memories are left alone
+        self.assertEqual(fourth.status, "pending")
+        self.assertLess(timezone.now() - fifth.updated_at, timedelta(minutes=1))
+
+        # Swept memories are not swept again right away
+        self.assertEqual(sweep_stuck_memories_task(), 0)
+
+    @override_settings(MEM0_UPDATE_DEBOUNCE=0)
+    def test_swept_events_are_relayed_on_bulk_lane(self):
+        """Test that re-driven memories do not share the interactive lane."""
+        sweep_stuck_memories_task()
+        Mem0OutboxEvent.objects.create(
+            operation="delete", memory_type="user", memory_id=99, mem0_memory_id="m"
+        )
+        with mock.patch("memories.outbox.publish_operations") as publish:
+            relay_outbox()
+
+        first, second = self.memories[:2]
+        self.assertEqual(
+            publish.call_args_list,
+            [
+                mock.call({("delete", "user"): [{"pk": 99, "mem0_id": "m"}]}),
+                mock.call(
+                    {
+                        ("add", "user"): [{"pk": first.pk}],
+                        ("update", "user"): [{"pk": second.pk, "mem0_id": "mem0-1"}],
+                    },
+                    lane="bulk",
+                ),
+            ],
+        )
+
+    def test_backlog_stats_by_status(self):
+        """Test that the backlog is reported per status with its oldest age."""
+        stats = get_backlog_stats(UserMemory)
+        self.assertEqual(stats["pending"]["count"], 3)
+        self.assertEqual(stats["processing"]["count"], 1)
+        self.assertGreater(stats["processing"]["oldest_age"], 7000)
+        self.assertNotIn("completed", stats)
+
+    def test_late_sync_cannot_complete_swept_memory(self):
+        """Test that a sync claimed before a sweep is fenced out."""
+        late = UserMemory.objects.get(pk=self.memories[1].pk)
+        sweep_stuck_memories_task()
+
+        self.assertFalse(
+            late.mark_as_completed(
+                mem0_memory_id="mem0-1",
+                synced_content=late.content,
+                generation=late.generation,
+            )
+        )
+        client = FakeMem0Client()
+        with mock.patch("memories.tasks.get_mem0_instance", return_value=client):
+            mem0_update_task.apply(
+                args=("user", late.pk, late.version),
+                kwargs={"claimed": True, "generation": late.generation},
+            )
+        self.assertEqual(client.calls, [])
+        self.assertEqual(UserMemory.objects.get(pk=late.pk).status, "pending")
+
+    def test_add_in_flight_during_sweep_is_deleted(self):
+        """Test that an add finishing after a sweep leaves no mem0 memory."""
+        first = self.memories[0]
+
+        class SweptClient(FakeMem0Client):
+            def add(client, messages, user_id):
+                # The sweeper re-drives the memory while the add is in flight
+                UserMemory.objects.filter(pk=first.pk).update(
+                    updated_at=timezone.now() - timedelta(hours=2)
+                )
+                sweep_stuck_memories_task()
+                return super().add(messages, user_id)
+
+        with mock.patch(
+            "memories.tasks.get_mem0_instance", return_value=SweptClient()
+        ), mock.patch("memories.tasks.mem0_delete_task.apply_async") as delete:
+            mem0_add_task.apply(args=("user", first.pk, 1))
+
+        delete.assert_called_once_with(
+            ("user", first.pk, f"mem0-user_{first.pk}"), {"lane": "interactive"}
+        )
+        first.refresh_from_db()
+        self.assertEqual(first.status, "pending")
+        self.assertIsNone(first.mem0_memory_id)
+
+    def test_batch_add_in_flight_during_sweep_is_deleted(self):
+        """Test that batch results are fenced out by a sweep."""
+        first, fifth = self.memories[0], self.memories[4]
+
+        def claim_then_sweep(model_class, pks):
+            instances = claim_for_sync(model_class, pks)
+            UserMemory.objects.filter(pk=first.pk).update(
+                status="pending", generation=1
+            )
+            return instances
+
+        with mock.patch(
+            "memories.batching.claim_for_sync", side_effect=claim_then_sweep
+        ), mock.patch(
+            "memories.tasks.get_mem0_instance", return_value=FakeMem0Client()
+        ), mock.patch(
+            "memories.tasks.mem0_delete_task.apply_async"
+        ) as delete:
+            flush_add_batch("user", [{"pk": first.pk}, {"pk": fifth.pk}])
+
+        delete.assert_called_once_with(
+            ("user", first.pk, f"mem0-user_{first.pk}"), {"lane": "interactive"}
+        )
+        first.refresh_from_db()
+        fifth.refresh_from_db()
+        self.assertEqual(first.status, "pending")
+        self.assertEqual(fifth.status, "completed")
@@ -6,7 +6,41 @@ from .views import (
     TeamMemoryDetailView,
     OrganizationMemoryListCreateView,
     OrganizationMemoryDetailView,
+    NearDuplicateClusterListView,
+    NearDuplicateClusterDetailView,
+    NearDuplicateClusterMergeView,
 )
+from .permissions import (
+    UserMemoryPermission,
+    TeamMemoryPermission,
+    OrganizationMemoryPermission,
+)
+
+
+def near_duplicate_urls(prefix, name, memory_type, permission_class):
+    """Build the near-duplicate review endpoints for one memory scope."""
+    view_kwargs = {
+        "memory_type": memory_type,
+        "permission_classes": [permission_class],
+    }
+    return [
+        path(
+            f"{prefix}duplicates/",
+            NearDuplicateClusterListView.as_view(**view_kwargs),
+            name=f"{name}-duplicate-list",
+        ),
+        path(
+            f"{prefix}duplicates/<int:cluster_id>/",
+            NearDuplicateClusterDetailView.as_view(**view_kwargs),
+            name=f"{name}-duplicate-detail",
+        ),
+        path(
+            f"{prefix}duplicates/<int:cluster_id>/merge/",
+            NearDuplicateClusterMergeView.as_view(**view_kwargs),
+            name=f"{name}-duplicate-merge",
+        ),
+    ]
+
 
 urlpatterns = [
     # User memory endpoints
@@ -40,4 +74,13 @@ urlpatterns = [
         OrganizationMemoryDetailView.as_view(),
         name="organization-memory-detail",
     ),
+    # Near-duplicate review endpoints
+    *near_duplicate_urls("users/me/", "user", "user", UserMemoryPermission),
+    *near_duplicate_urls("teams/<int:team_id>/", "team", "team", TeamMemoryPermission),
+    *near_duplicate_urls(
+        "orgs/<int:org_id>/",
+        "organization",
+        "organization",
+        OrganizationMemoryPermission,
+    ),
 ]
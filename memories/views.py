@@ -1,17 +1,33 @@
 from rest_framework import generics, status, filters
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 
 from authentication.authentication import APIKeyAuthentication
 
-from .models import UserMemory, TeamMemory, OrganizationMemory
+from .models import (
+    UserMemory,
+    TeamMemory,
+    OrganizationMemory,
+    ArchivedMemory,
+    NearDuplicateCluster,
+    MEMORY_MODELS,
+)
+from . import backpressure
+from .compression import get_content_search_filter
+from .dedup import DEDUP_MODES, get_dedup_mode, find_duplicate
+from .consolidation import merge_cluster
 from .serializers import (
     UserMemorySerializer,
     TeamMemorySerializer,
     OrganizationMemorySerializer,
+    NearDuplicateClusterSerializer,
+    NearDuplicateMergeSerializer,
 )
 from .permissions import (
     UserMemoryPermission,
@@ -24,10 +40,167 @@ from user.models import User, Team, Organization, TeamMembership
 class BaseMemoryViewSet:
     """Base mixin for memory views with common functionality."""
 
+    # Memory type served by the view, used for archive lookups
+    memory_type = None
+    # Methods that write memories, subject to backpressure
+    write_methods = ("POST", "PUT", "PATCH")
+    # mem0 sync backlog and how it applies to the current write
+    backlog = None
+    write_action = None
+    defer_token = None
+
     def get_queryset(self):
         """Override in subclasses to provide proper filtering."""
         raise NotImplementedError
 
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # A deferral lasts only as long as the request
+            if self.defer_token is not None:
+                backpressure.end_mem0_sync_deferral(self.defer_token)
+
+    def initial(self, request, *args, **kwargs):
+        """
+        Apply backpressure to writes while the mem0 sync backlog is large.
+
+        Past the defer limits, writes are accepted and their mem0 syncs go
+        to the bulk lane; past the reject limits, writes get a 503 with
+        Retry-After.
+        """
+        super().initial(request, *args, **kwargs)
+        if request.method not in self.write_methods:
+            return
+        self.backlog = backpressure.get_backlog(self.get_backlog_tenant())
+        self.write_action = backpressure.get_write_action(self.backlog)
+        if self.write_action == "reject":
+            raise backpressure.IngestionBacklogged(
+                settings.MEMORY_BACKPRESSURE_RETRY_AFTER
+            )
+        if self.write_action == "defer":
+            self.defer_token = backpressure.defer_mem0_sync()
+
+    def get_backlog_tenant(self):
+        """Return the tenant whose mem0 sync backlog applies to writes."""
+        (owner,) = self.get_scope_filter().values()
+        return backpressure.get_tenant(self.memory_type, getattr(owner, "pk", owner))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Report the mem0 sync backlog of the tenant on writes."""
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.backlog is not None:
+            depth, age = self.backlog
+            response["X-Memory-Backlog"] = str(depth)
+            response["X-Memory-Backlog-Age"] = f"{age:.0f}"
+            if self.write_action == "defer":
+                response["X-Memory-Sync"] = "deferred"
+        return response
+
+    def get_scope_filter(self):
+        """Override in subclasses to return the owner filter for the scope."""
+        raise NotImplementedError
+
+    def list(self, request, *args, **kwargs):
+        """List memories through the serializer's read-only fast path."""
+        serializer_class = self.get_serializer_class()
+        rows = serializer_class.fast_values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer_class.fast_data(page))
+        return Response(serializer_class.fast_data(rows))
+
+    def get_dedup_organization(self):
+        """Return the organization whose dedup setting applies, if any."""
+        return None
+
+    def create(self, request, *args, **kwargs):
+        """Create a memory, handling duplicates according to the dedup mode."""
+        requested = request.query_params.get("dedup")
+        if requested and requested not in DEDUP_MODES:
+            raise ValidationError(
+                {"dedup": f"Must be one of: {', '.join(DEDUP_MODES)}."}
+            )
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        mode = get_dedup_mode(requested, self.get_dedup_organization())
+        existing = None
+        if mode != "off":
+            existing = find_duplicate(
+                MEMORY_MODELS[self.memory_type],
+                self.get_scope_filter(),
+                serializer.validated_data["content"],
+            )
+
+        if existing and mode == "return":
+            response = Response(
+                self.get_serializer(existing).data, status=status.HTTP_200_OK
+            )
+            response["X-Memory-Deduplicated"] = "returned"
+            return response
+
+        if existing:
+            # Link to the original and share its mem0 memory
+            serializer.validated_data.update(
+                duplicate_of=existing,
+                mem0_memory_id=existing.mem0_memory_id,
+                status="completed" if existing.mem0_memory_id else existing.status,
+            )
+
+        self.perform_create(serializer)
+        if existing and not existing.mem0_memory_id:
+            serializer.instance.copy_original_sync_state()
+        headers = self.get_success_headers(serializer.data)
+        response = Response(
+            serializer.data, status=status.HTTP_201_CREATED, headers=headers
+        )
+        if existing:
+            response["X-Memory-Deduplicated"] = "linked"
+        return response
+
+    def get_object(self):
+        """
+        Fall back to the archive for memories no longer in hot tables.
+
+        Reads render the archived memory and deletes remove its archive row,
+        which records the mem0 delete. Updates are validated against the
+        archived memory and restore it to the hot table when saved, so they
+        go through the regular mem0 sync.
+        """
+        try:
+            return super().get_object()
+        except Http404:
+            archived = self.get_archived_object()
+            if self.request.method == "DELETE":
+                return archived
+            memory = archived.to_memory()
+            if self.request.method not in SAFE_METHODS:
+                memory._archived = archived
+            return memory
+
+    def perform_update(self, serializer):
+        """Restore an archived memory in the transaction saving its update."""
+        archived = getattr(serializer.instance, "_archived", None)
+        if archived is None:
+            return super().perform_update(serializer)
+        with transaction.atomic():
+            serializer.instance = archived.restore()
+            super().perform_update(serializer)
+
+    def get_archived_object(self):
+        """Return the archive row of the memory, checking access as a memory."""
+        archived = get_object_or_404(
+            ArchivedMemory,
+            memory_type=self.memory_type,
+            original_id=self.kwargs[self.lookup_url_kwarg],
+            **self.get_scope_filter(),
+        )
+        self.check_object_permissions(self.request, archived.to_memory())
+        return archived
+
     def apply_filters(self, queryset):
         """Apply common filters to queryset."""
         # Filter by status
@@ -35,10 +208,10 @@ class BaseMemoryViewSet:
         if status_filter:
             queryset = queryset.filter(status=status_filter)
 
-        # Search in content
+        # Search in content, including the content stored compressed
         search = self.request.query_params.get("search")
         if search:
-            queryset = queryset.filter(content__icontains=search)
+            queryset = queryset.filter(get_content_search_filter(search))
 
         return queryset
 
@@ -58,10 +231,14 @@ class UserMemoryListCreateView(BaseMemoryViewSet, generics.ListCreateAPIView):
     filterset_fields = ["status"]
     ordering_fields = ["created_at", "updated_at"]
     ordering = ["-created_at"]
+    memory_type = "user"
+
+    def get_scope_filter(self):
+        return {"user": self.request.user}
 
     def get_queryset(self):
         """Return only current user's memories."""
-        queryset = UserMemory.objects.filter(user=self.request.user)
+        queryset = UserMemory.objects.filter(**self.get_scope_filter())
         return self.apply_filters(queryset)
 
 
@@ -75,10 +252,14 @@ class UserMemoryDetailView(BaseMemoryViewSet, generics.RetrieveUpdateDestroyAPIV
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [UserMemoryPermission]
     lookup_url_kwarg = "memory_id"
+    memory_type = "user"
+
+    def get_scope_filter(self):
+        return {"user": self.request.user}
 
     def get_queryset(self):
         """Return only current user's memories."""
-        return UserMemory.objects.filter(user=self.request.user)
+        return UserMemory.objects.filter(**self.get_scope_filter())
 
 
 # Team Memory Views
@@ -96,11 +277,20 @@ class TeamMemoryListCreateView(BaseMemoryViewSet, generics.ListCreateAPIView):
     filterset_fields = ["status"]
     ordering_fields = ["created_at", "updated_at"]
     ordering = ["-created_at"]
+    memory_type = "team"
+
+    def get_scope_filter(self):
+        return {"team_id": self.kwargs.get("team_id")}
+
+    def get_dedup_organization(self):
+        team = get_object_or_404(
+            Team.objects.select_related("organization"), id=self.kwargs.get("team_id")
+        )
+        return team.organization
 
     def get_queryset(self):
         """Return memories for the specified team if user has access."""
-        team_id = self.kwargs.get("team_id")
-        queryset = TeamMemory.objects.filter(team_id=team_id)
+        queryset = TeamMemory.objects.filter(**self.get_scope_filter())
         return self.apply_filters(queryset)
 
     def perform_create(self, serializer):
@@ -120,11 +310,14 @@ class TeamMemoryDetailView(BaseMemoryViewSet, generics.RetrieveUpdateDestroyAPIV
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [TeamMemoryPermission]
     lookup_url_kwarg = "memory_id"
+    memory_type = "team"
+
+    def get_scope_filter(self):
+        return {"team_id": self.kwargs.get("team_id")}
 
     def get_queryset(self):
         """Return memories for the specified team if user has access."""
-        team_id = self.kwargs.get("team_id")
-        return TeamMemory.objects.filter(team_id=team_id)
+        return TeamMemory.objects.filter(**self.get_scope_filter())
 
 
 # Organization Memory Views
@@ -142,11 +335,17 @@ class OrganizationMemoryListCreateView(BaseMemoryViewSet, generics.ListCreateAPI
     filterset_fields = ["status"]
     ordering_fields = ["created_at", "updated_at"]
     ordering = ["-created_at"]
+    memory_type = "organization"
+
+    def get_scope_filter(self):
+        return {"organization_id": self.kwargs.get("org_id")}
+
+    def get_dedup_organization(self):
+        return get_object_or_404(Organization, id=self.kwargs.get("org_id"))
 
     def get_queryset(self):
         """Return memories for the specified organization if user has access."""
-        org_id = self.kwargs.get("org_id")
-        queryset = OrganizationMemory.objects.filter(organization_id=org_id)
+        queryset = OrganizationMemory.objects.filter(**self.get_scope_filter())
         return self.apply_filters(queryset)
 
     def perform_create(self, serializer):
@@ -168,8 +367,121 @@ class OrganizationMemoryDetailView(
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [OrganizationMemoryPermission]
     lookup_url_kwarg = "memory_id"
+    memory_type = "organization"
+
+    def get_scope_filter(self):
+        return {"organization_id": self.kwargs.get("org_id")}
 
     def get_queryset(self):
         """Return memories for the specified organization if user has access."""
-        org_id = self.kwargs.get("org_id")
-        return OrganizationMemory.objects.filter(organization_id=org_id)
+        return OrganizationMemory.objects.filter(**self.get_scope_filter())
+
+
+# Near-duplicate Review Views
+class NearDuplicateClusterMixin:
+    """
+    Common functionality for near-duplicate cluster views.
+
+    The scope is configured per URL through as_view(memory_type=...,
+    permission_classes=[...]), reusing the memory permissions of the scope.
+    """
+
+    authentication_classes = [APIKeyAuthentication]
+    memory_type = None
+
+    def get_scope_filter(self):
+        """Return the owner filter for the scope of this view."""
+        if self.memory_type == "user":
+            return {"user": self.request.user}
+        if self.memory_type == "team":
+            return {"team_id": self.kwargs.get("team_id")}
+        return {"organization_id": self.kwargs.get("org_id")}
+
+    def get_queryset(self):
+        """Return clusters in the current scope."""
+        return NearDuplicateCluster.objects.filter(
+            memory_type=self.memory_type, **self.get_scope_filter()
+        )
+
+
+class NearDuplicateClusterListView(NearDuplicateClusterMixin, generics.ListAPIView):
+    """
+    List near-duplicate clusters awaiting review in a scope.
+    GET /memories/users/me/duplicates
+    GET /memories/teams/<team_id>/duplicates
+    GET /memories/orgs/<org_id>/duplicates
+    """
+
+    serializer_class = NearDuplicateClusterSerializer
+
+    def get_queryset(self):
+        """Return clusters with the requested status, open ones by default."""
+        status_filter = self.request.query_params.get("status", "open")
+        return super().get_queryset().filter(status=status_filter).order_by("-id")
+
+    def list(self, request, *args, **kwargs):
+        """List clusters, loading the member memories of a page in one query."""
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        member_ids = {pk for cluster in page for pk in cluster.member_ids}
+        context = self.get_serializer_context()
+        context["members"] = MEMORY_MODELS[self.memory_type].objects.in_bulk(member_ids)
+        serializer = self.get_serializer_class()(page, many=True, context=context)
+        return self.get_paginated_response(serializer.data)
+
+
+class NearDuplicateClusterDetailView(
+    NearDuplicateClusterMixin, generics.RetrieveDestroyAPIView
+):
+    """
+    Review or dismiss a near-duplicate cluster.
+    GET/DELETE /memories/<scope>/duplicates/<cluster_id>
+    """
+
+    serializer_class = NearDuplicateClusterSerializer
+    lookup_url_kwarg = "cluster_id"
+
+    def perform_destroy(self, instance):
+        """Dismiss the cluster so later scans do not reopen it."""
+        instance.status = "dismissed"
+        instance.save(update_fields=["status", "updated_at"])
+
+
+class NearDuplicateClusterMergeView(NearDuplicateClusterMixin, generics.GenericAPIView):
+    """
+    Collapse a near-duplicate cluster into one memory.
+    POST /memories/<scope>/duplicates/<cluster_id>/merge
+    """
+
+    lookup_url_kwarg = "cluster_id"
+
+    def get_queryset(self):
+        """Only open clusters can be merged."""
+        return super().get_queryset().filter(status="open")
+
+    def post(self, request, *args, **kwargs):
+        """Keep one memory of the cluster and delete the others."""
+        cluster = self.get_object()
+        serializer = NearDuplicateMergeSerializer(
+            data=request.data, context={"cluster": cluster}
+        )
+        serializer.is_valid(raise_exception=True)
+
+        model_class = MEMORY_MODELS[self.memory_type]
+        keep_id = serializer.validated_data.get("keep", cluster.canonical_id)
+        try:
+            kept = merge_cluster(cluster, model_class, keep_id)
+        except model_class.DoesNotExist:
+            return Response(
+                {"keep": ["Memory no longer exists."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        memory_serializers = {
+            "user": UserMemorySerializer,
+            "team": TeamMemorySerializer,
+            "organization": OrganizationMemorySerializer,
+        }
+        data = memory_serializers[self.memory_type](
+            kept, context=self.get_serializer_context()
+        ).data
+        return Response(data, status=status.HTTP_200_OK)
@@ -1,5 +1,13 @@
 import os
 from celery import Celery
+from celery.signals import task_postrun, worker_init, worker_process_init
+from kombu import Queue
+
+# Also registers the web process pool stats reporting
+from .db_pool import close_pools, discard_pools, report_pool_stats
+
+# Registers the task metrics signal handlers
+from . import metrics  # noqa: F401
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "memvault.settings")
@@ -14,6 +22,86 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
 
+@worker_init.connect
+def close_database_pools(**kwargs):
+    """Close pools opened in the main worker process before it forks children."""
+    close_pools()
+
+
+@worker_process_init.connect
+def reset_database_pools(**kwargs):
+    """Give each prefork child its own pool instead of the inherited one."""
+    discard_pools()
+
+
+@task_postrun.connect
+def report_database_pool_stats(**kwargs):
+    report_pool_stats()
+
+
+# mem0 operations with a queue of their own per lane
+MEM0_OPERATIONS = ("add", "update", "delete")
+MEM0_LANES = ("interactive", "bulk")
+# Periodic tasks, kept off the mem0 queues
+MAINTENANCE_TASKS = {
+    "memories.tasks.archive_old_memories_task",
+    "memories.tasks.detect_near_duplicates_task",
+    "memories.tasks.sweep_stuck_memories_task",
+    "memories.tasks.drain_parked_mem0_tasks_task",
+}
+# Redis serves lower priority numbers first
+FLUSH_PRIORITY = 0
+SINGLE_TASK_PRIORITY = 5
+
+
+def get_mem0_queue(operation, lane="interactive"):
+    """Return the queue of a mem0 operation in a lane."""
+    if lane == "interactive":
+        return f"mem0.{operation}"
+    return f"mem0.{operation}.{lane}"
+
+
+# Every queue route_task sends tasks to
+app.conf.task_queues = [
+    *(
+        Queue(get_mem0_queue(operation, lane))
+        for operation in MEM0_OPERATIONS
+        for lane in MEM0_LANES
+    ),
+    Queue("maintenance"),
+    Queue(app.conf.task_default_queue),
+]
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """
+    Route mem0 tasks to a queue per operation and lane.
+
+    Tasks take a "lane" keyword: "interactive" for changes made through the
+    API, "bulk" for large batches and re-drives. Every queue has a worker of
+    its own, so a slow operation or a backfill never holds the threads of
+    another queue. Within a queue, batch flushes go ahead of single-memory
+    retries.
+    """
+    lane = (kwargs or {}).get("lane", "interactive")
+    if name == "memories.tasks.mem0_flush_batch_task":
+        operation = args[0] if args else kwargs["operation"]
+        return {"queue": get_mem0_queue(operation, lane), "priority": FLUSH_PRIORITY}
+
+    prefix, suffix = "memories.tasks.mem0_", "_task"
+    if name.startswith(prefix) and name.endswith(suffix):
+        operation = name[len(prefix) : -len(suffix)]
+        if operation in MEM0_OPERATIONS:
+            return {
+                "queue": get_mem0_queue(operation, lane),
+                "priority": SINGLE_TASK_PRIORITY,
+            }
+
+    if name in MAINTENANCE_TASKS:
+        return {"queue": "maintenance"}
+    return None
+
+
 @app.task(bind=True)
 def debug_task(self):
     print(f"Request: {self.request!r}")
@@ -0,0 +1,92 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# Monotonic time of the last stats report in this process
+_last_report = 0.0
+
+
+def get_pool(alias=DEFAULT_DB_ALIAS):
+    """Return the psycopg connection pool of a database, or None if unpooled."""
+    return getattr(connections[alias], "pool", None)
+
+
+def get_pool_stats(alias=DEFAULT_DB_ALIAS):
+    """
+    Return the pool stats of a database in this process, or None if unpooled.
+
+    Adds "in_use", "saturation" (the share of max_size checked out) and
+    "avg_wait_ms" (the mean wait of requests that had to queue) to the
+    psycopg_pool counters.
+    """
+    pool = get_pool(alias)
+    if pool is None:
+        return None
+
+    stats = pool.get_stats()
+    in_use = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+    queued = stats.get("requests_queued", 0)
+    stats["in_use"] = in_use
+    stats["saturation"] = in_use / stats["pool_max"] if stats.get("pool_max") else 0.0
+    stats["avg_wait_ms"] = stats.get("requests_wait_ms", 0) / queued if queued else 0.0
+    return stats
+
+
+def report_pool_stats(force=False):
+    """
+    Log the pool stats of every pooled database, at most once per interval.
+
+    Saturated pools, or pools with requests waiting, are logged as warnings.
+    """
+    global _last_report
+    now = time.monotonic()
+    if not force and now - _last_report < settings.DATABASE_POOL_STATS_INTERVAL:
+        return
+    _last_report = now
+
+    for alias in connections:
+        stats = get_pool_stats(alias)
+        if stats is None:
+            continue
+        message = (
+            f"Database pool {alias}: {stats['in_use']}/{stats.get('pool_max', 0)} "
+            f"in use, {stats.get('requests_waiting', 0)} waiting, "
+            f"saturation {stats['saturation']:.2f}, "
+            f"avg wait {stats['avg_wait_ms']:.1f}ms"
+        )
+        saturated = stats["saturation"] >= settings.DATABASE_POOL_SATURATION_WARNING
+        if saturated or stats.get("requests_waiting", 0):
+            logger.warning(message)
+        else:
+            logger.info(message)
+
+
+def close_pools():
+    """Close the pools of every database in this process."""
+    for connection in connections.all():
+        if getattr(connection, "pool", None) is not None:
+            connection.close_pool()
+
+
+def discard_pools():
+    """
+    Forget pools inherited from a parent process without closing them.
+
+    Closing would terminate the parent's server connections, since they
+    share sockets with the child after fork.
+    """
+    for connection in connections.all():
+        pools = getattr(connection, "_connection_pools", None)
+        if pools:
+            pools.pop(connection.alias, None)
+
+
+@receiver(request_finished)
+def report_pool_stats_after_request(sender, **kwargs):
+    report_pool_stats()
@@ -0,0 +1,48 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Reads only go to a replica while this is set. It is only ever set by
+# ReplicaRoutingMiddleware for safe requests, so everything else, including
+# Celery tasks, reads from the primary.
+_read_from_replica = ContextVar("read_from_replica", default=False)
+
+
+@contextmanager
+def use_replicas():
+    """Route reads inside the block to a read replica, if any are configured."""
+    token = _read_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def is_reading_from_replica():
+    """Check whether reads are currently routed to a replica."""
+    return _read_from_replica.get()
+
+
+class PrimaryReplicaRouter:
+    """
+    Database router sending opt-in reads to replicas and everything else to
+    the primary ("default") database.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _read_from_replica.get() and settings.REPLICA_DATABASES:
+            return random.choice(settings.REPLICA_DATABASES)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so objects from any of them can relate
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        return db not in settings.REPLICA_DATABASES
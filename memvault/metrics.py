@@ -0,0 +1,320 @@
+import logging
+import os
+import time
+
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    worker_process_shutdown,
+    worker_ready,
+)
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import connections
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from .db_pool import get_pool_stats
+
+try:
+    import prometheus_client
+    from prometheus_client import (
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        multiprocess,
+    )
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:  # Metrics are optional
+    prometheus_client = None
+
+logger = logging.getLogger(__name__)
+
+# Message header holding the time a task was published
+PUBLISHED_AT_HEADER = "published_at"
+
+# Monotonic start times of the tasks running in this process, by task id
+_task_started = {}
+
+if prometheus_client is not None:
+    HTTP_REQUESTS = Counter(
+        "memvault_http_requests_total",
+        "HTTP requests by view, memory scope, method and status.",
+        ["view", "scope", "method", "status"],
+    )
+    HTTP_REQUEST_DURATION = Histogram(
+        "memvault_http_request_duration_seconds",
+        "HTTP request latency by view, memory scope and method.",
+        ["view", "scope", "method"],
+    )
+    HTTP_REQUEST_QUERIES = Histogram(
+        "memvault_http_request_queries",
+        "Database queries per HTTP request by view.",
+        ["view"],
+        buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+    )
+    HTTP_REQUEST_DB_DURATION = Histogram(
+        "memvault_http_request_db_seconds",
+        "Database time per HTTP request by view.",
+        ["view"],
+    )
+    TASKS = Counter(
+        "memvault_celery_tasks_total",
+        "Celery tasks run by task name and final state.",
+        ["task", "state"],
+    )
+    TASK_DURATION = Histogram(
+        "memvault_celery_task_duration_seconds",
+        "Celery task runtime by task name.",
+        ["task"],
+        buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+    )
+    TASK_QUEUE_LAG = Histogram(
+        "memvault_celery_task_queue_lag_seconds",
+        "Seconds from publishing a Celery task to its start, by task and queue.",
+        ["task", "queue"],
+        buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600),
+    )
+    MEM0_CALLS = Counter(
+        "memvault_mem0_calls_total",
+        "mem0 API calls by operation and outcome.",
+        ["operation", "outcome"],
+    )
+    MEM0_CALL_DURATION = Histogram(
+        "memvault_mem0_call_duration_seconds",
+        "mem0 API call latency by operation.",
+        ["operation"],
+        buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+    )
+    MEM0_SLOT_WAIT = Histogram(
+        "memvault_mem0_slot_wait_seconds",
+        "Wait for a slot under the mem0 concurrency limit, by operation.",
+        ["operation"],
+        buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+    )
+    # Pools are per process: connections in use add up across processes,
+    # saturation and wait report the worst live process
+    DB_POOL_IN_USE = Gauge(
+        "memvault_db_pool_connections_in_use",
+        "Pooled database connections checked out, by database.",
+        ["database"],
+        multiprocess_mode="livesum",
+    )
+    DB_POOL_SATURATION = Gauge(
+        "memvault_db_pool_saturation",
+        "Share of a process's database pool checked out, by database.",
+        ["database"],
+        multiprocess_mode="livemax",
+    )
+    DB_POOL_WAIT = Gauge(
+        "memvault_db_pool_wait_avg_seconds",
+        "Mean wait of database pool requests that had to queue, by database.",
+        ["database"],
+        multiprocess_mode="livemax",
+    )
+
+
+def is_multiprocess():
+    """Check whether metrics are aggregated across processes."""
+    return bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def observe_request(view, scope, method, status, duration, recorder):
+    """Record an HTTP request and the queries recorded while serving it."""
+    if prometheus_client is None:
+        return
+    HTTP_REQUESTS.labels(view, scope, method, status).inc()
+    HTTP_REQUEST_DURATION.labels(view, scope, method).observe(duration)
+    HTTP_REQUEST_QUERIES.labels(view).observe(recorder.count)
+    HTTP_REQUEST_DB_DURATION.labels(view).observe(recorder.duration)
+
+
+def observe_mem0_call(operation, duration, failed):
+    """Record a mem0 API call."""
+    if prometheus_client is None:
+        return
+    MEM0_CALLS.labels(operation, "error" if failed else "ok").inc()
+    MEM0_CALL_DURATION.labels(operation).observe(duration)
+
+
+def observe_mem0_slot_wait(operation, wait):
+    """Record the wait of a mem0 call for a concurrency slot."""
+    if prometheus_client is None:
+        return
+    MEM0_SLOT_WAIT.labels(operation).observe(wait)
+
+
+def observe_pool_stats():
+    """Set the database pool gauges from the pools of this process."""
+    if prometheus_client is None:
+        return
+    for alias in connections:
+        stats = get_pool_stats(alias)
+        if stats is None:
+            continue
+        DB_POOL_IN_USE.labels(alias).set(stats["in_use"])
+        DB_POOL_SATURATION.labels(alias).set(stats["saturation"])
+        DB_POOL_WAIT.labels(alias).set(stats["avg_wait_ms"] / 1000)
+
+
+def get_queue_depths():
+    """Return the messages waiting in each Celery queue, by queue name."""
+    from .celery import app
+
+    depths = {}
+    with app.connection_for_read() as connection:
+        channel = connection.default_channel
+        for queue in [queue.name for queue in app.conf.task_queues]:
+            try:
+                depths[queue] = channel.queue_declare(queue, passive=True).message_count
+            except connection.channel_errors:
+                # Brokers drop queues once they are empty
+                depths[queue] = 0
+    return depths
+
+
+class BacklogCollector:
+    """
+    Collect the gauges measured when scraped.
+
+    These are cluster-wide, so only the web /metrics endpoint serves them:
+    broker queue depths, unsynced memories by type and status, and the
+    adaptive mem0 concurrency limit. Completed memories are not counted,
+    as that would scan every memory table on each scrape.
+    """
+
+    def collect(self):
+        from memories.concurrency import get_concurrency_stats
+        from memories.models import MEMORY_MODELS
+        from memories.sweeper import get_backlog_stats
+
+        try:
+            depths = get_queue_depths()
+        except Exception as exc:
+            logger.warning(f"Could not measure the broker queues: {exc}")
+        else:
+            gauge = GaugeMetricFamily(
+                "memvault_broker_queue_depth",
+                "Messages waiting in each Celery queue.",
+                labels=["queue"],
+            )
+            for queue, depth in depths.items():
+                gauge.add_metric([queue], depth)
+            yield gauge
+
+        memories = GaugeMetricFamily(
+            "memvault_memories_unsynced",
+            "Memories not yet synced to mem0 by memory type and status.",
+            labels=["memory_type", "status"],
+        )
+        oldest = GaugeMetricFamily(
+            "memvault_memories_unsynced_oldest_age_seconds",
+            "Age of the oldest unsynced memory by memory type and status.",
+            labels=["memory_type", "status"],
+        )
+        try:
+            for memory_type, model_class in MEMORY_MODELS.items():
+                for status, stats in get_backlog_stats(model_class).items():
+                    memories.add_metric([memory_type, status], stats["count"])
+                    oldest.add_metric([memory_type, status], stats["oldest_age"])
+        except Exception as exc:
+            logger.warning(f"Could not measure the memory backlog: {exc}")
+        else:
+            yield memories
+            yield oldest
+
+        stats = get_concurrency_stats()
+        if stats["limit"] is not None:
+            yield GaugeMetricFamily(
+                "memvault_mem0_concurrency_limit",
+                "Cluster-wide limit of concurrent mem0 calls.",
+                value=stats["limit"],
+            )
+            yield GaugeMetricFamily(
+                "memvault_mem0_in_flight",
+                "mem0 calls in flight across the cluster.",
+                value=stats["in_flight"],
+            )
+
+
+def get_registry(backlog=True):
+    """
+    Return a registry of the metrics of every process of this service.
+
+    With PROMETHEUS_MULTIPROC_DIR set, the metrics files of all gunicorn or
+    prefork processes are aggregated; otherwise this process's are used.
+    """
+    registry = CollectorRegistry()
+    if is_multiprocess():
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(prometheus_client.REGISTRY)
+    if backlog:
+        registry.register(BacklogCollector())
+    return registry
+
+
+def metrics_view(request):
+    """Serve the metrics in the Prometheus text format."""
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse(status=401)
+    observe_pool_stats()
+    return HttpResponse(
+        prometheus_client.generate_latest(get_registry()),
+        content_type=prometheus_client.CONTENT_TYPE_LATEST,
+    )
+
+
+@before_task_publish.connect
+def stamp_published_at(headers=None, **kwargs):
+    if headers is not None:
+        headers[PUBLISHED_AT_HEADER] = time.time()
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, task=None, **kwargs):
+    if prometheus_client is None:
+        return
+    _task_started[task_id] = time.monotonic()
+    published_at = getattr(task.request, PUBLISHED_AT_HEADER, None)
+    if published_at is not None:
+        queue = (task.request.delivery_info or {}).get("routing_key") or ""
+        TASK_QUEUE_LAG.labels(task.name, queue).observe(
+            max(0.0, time.time() - published_at)
+        )
+
+
+@task_postrun.connect
+def observe_task(task_id=None, task=None, state=None, **kwargs):
+    if prometheus_client is None:
+        return
+    started = _task_started.pop(task_id, None)
+    TASKS.labels(task.name, state or "UNKNOWN").inc()
+    if started is not None:
+        TASK_DURATION.labels(task.name).observe(time.monotonic() - started)
+    observe_pool_stats()
+
+
+@receiver(request_finished)
+def observe_pool_stats_after_request(sender, **kwargs):
+    observe_pool_stats()
+
+
+@worker_ready.connect
+def serve_worker_metrics(**kwargs):
+    """Serve the metrics of this worker and its pool on METRICS_WORKER_PORT."""
+    if prometheus_client is None or not settings.METRICS_WORKER_PORT:
+        return
+    prometheus_client.start_http_server(
+        settings.METRICS_WORKER_PORT, registry=get_registry(backlog=False)
+    )
+
+
+@worker_process_shutdown.connect
+def mark_worker_process_dead(pid=None, **kwargs):
+    """Drop the live gauges of an exited prefork child from the aggregation."""
+    if prometheus_client is not None and is_multiprocess():
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,105 @@
+import hashlib
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from . import metrics
+from .db_routers import _read_from_replica
+from .query_metrics import QueryRecorder, record_request, report_query_stats
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route safe requests on the configured views to read replicas.
+
+    After a client writes, its reads stay on the primary for
+    REPLICA_STICKINESS_SECONDS so it always reads its own writes despite
+    replication lag. Clients are identified by API key, session or address.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request._replica_token is not None:
+                _read_from_replica.reset(request._replica_token)
+
+        if request.method not in SAFE_METHODS and settings.REPLICA_DATABASES:
+            cache.set(
+                self.get_pin_key(request), True, settings.REPLICA_STICKINESS_SECONDS
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in SAFE_METHODS
+            and settings.REPLICA_DATABASES
+            and self.is_routed_view(view_func)
+            and not cache.get(self.get_pin_key(request))
+        ):
+            request._replica_token = _read_from_replica.set(True)
+        return None
+
+    def is_routed_view(self, view_func):
+        """Check whether the view belongs to a module whose reads may use replicas."""
+        view_class = getattr(view_func, "view_class", None)
+        module = (view_class or view_func).__module__
+        return module in settings.REPLICA_ROUTED_VIEW_MODULES
+
+    def get_pin_key(self, request):
+        """Return the cache key pinning this client to the primary."""
+        identity = (
+            request.META.get("HTTP_X_API_KEY")
+            or (request.session.session_key if hasattr(request, "session") else None)
+            or request.META.get("REMOTE_ADDR", "")
+        )
+        digest = hashlib.sha256(identity.encode("utf-8")).hexdigest()
+        return f"replica-pin:{digest}"
+
+
+class QueryMetricsMiddleware:
+    """
+    Record the query count, database time and slowest statement of requests.
+
+    With QUERY_METRICS_HEADERS, as in development, they are returned as
+    X-DB-* response headers. Requests are also added to the per-view stats
+    of this process, which are logged every QUERY_METRICS_STATS_INTERVAL
+    seconds, and requests running QUERY_METRICS_WARN_QUERIES queries or more
+    are logged as warnings. Requests are also recorded in the Prometheus
+    metrics, labeled by view and memory scope.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        view_class = getattr(match.func, "view_class", None) if match else None
+        scope = getattr(view_class, "memory_type", None) or ""
+        record_request(view, recorder)
+        report_query_stats()
+        metrics.observe_request(
+            view, scope, request.method, response.status_code, duration, recorder
+        )
+        if settings.QUERY_METRICS_HEADERS:
+            for name, value in recorder.get_headers().items():
+                response[name] = value
+        return response
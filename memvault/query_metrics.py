@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+
+from memories.concurrency import percentile
+
+logger = logging.getLogger(__name__)
+
+# Monotonic time of the last stats report in this process
+_last_report = 0.0
+
+# Recent (query count, database seconds) per view of this process
+_samples = defaultdict(lambda: deque(maxlen=1000))
+_samples_lock = threading.Lock()
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper counting and timing the statements it runs.
+
+    Install it with connection.execute_wrapper() on every connection.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_duration = 0.0
+        self.slowest_sql = ""
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if elapsed >= self.slowest_duration:
+                self.slowest_duration, self.slowest_sql = elapsed, sql
+
+    def get_headers(self):
+        """Return the recorded metrics as response headers."""
+        # Header values must be latin-1, and statements may hold any text
+        slowest = " ".join(self.slowest_sql.split())[:200]
+        return {
+            "X-DB-Queries": str(self.count),
+            "X-DB-Time-Ms": f"{self.duration * 1000:.1f}",
+            "X-DB-Slowest-Ms": f"{self.slowest_duration * 1000:.1f}",
+            "X-DB-Slowest-Query": slowest.encode("ascii", "replace").decode(),
+        }
+
+
+def record_request(view, recorder):
+    """Add a request's query metrics to the stats of its view."""
+    with _samples_lock:
+        _samples[view].append((recorder.count, recorder.duration))
+
+    if recorder.count >= settings.QUERY_METRICS_WARN_QUERIES:
+        logger.warning(
+            f"{view} ran {recorder.count} queries in "
+            f"{recorder.duration * 1000:.1f}ms, slowest "
+            f"{recorder.slowest_duration * 1000:.1f}ms: {recorder.slowest_sql[:500]}"
+        )
+
+
+def get_query_stats():
+    """
+    Return the query stats of the recent requests of this process, per view.
+
+    Each view has its request count and the p50/p95/max of its query counts
+    and database time in milliseconds.
+    """
+    with _samples_lock:
+        samples = {view: list(view_samples) for view, view_samples in _samples.items()}
+
+    stats = {}
+    for view, view_samples in samples.items():
+        counts = [count for count, _ in view_samples]
+        durations = [duration * 1000 for _, duration in view_samples]
+        stats[view] = {
+            "requests": len(view_samples),
+            "queries_p50": percentile(counts, 0.5),
+            "queries_p95": percentile(counts, 0.95),
+            "queries_max": max(counts),
+            "db_time_p50_ms": percentile(durations, 0.5),
+            "db_time_p95_ms": percentile(durations, 0.95),
+            "db_time_max_ms": max(durations),
+        }
+    return stats
+
+
+def report_query_stats(force=False):
+    """Log the query stats of every view, at most once per interval."""
+    global _last_report
+    now = time.monotonic()
+    if not force and now - _last_report < settings.QUERY_METRICS_STATS_INTERVAL:
+        return
+    _last_report = now
+
+    for view, stats in sorted(get_query_stats().items()):
+        logger.info(
+            f"Queries of {view}: {stats['requests']} requests, "
+            f"queries p50/p95/max {stats['queries_p50']}/{stats['queries_p95']}/"
+            f"{stats['queries_max']}, database time p50/p95/max "
+            f"{stats['db_time_p50_ms']:.1f}/{stats['db_time_p95_ms']:.1f}/"
+            f"{stats['db_time_max_ms']:.1f}ms"
+        )
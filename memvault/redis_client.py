@@ -0,0 +1,42 @@
+import logging
+import time
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Shared Redis client per process
+_redis_client = None
+
+# Monotonic time until which Redis is treated as unavailable
+_unavailable_until = 0.0
+
+
+def get_redis():
+    """
+    Return the shared Redis client, or None while Redis is marked unavailable.
+
+    Callers fall back to working without Redis when this returns None or a
+    command raises redis.RedisError, and call mark_redis_unavailable() so
+    other callers skip Redis for REDIS_RETRY_AFTER seconds.
+    """
+    global _redis_client
+    if time.monotonic() < _unavailable_until:
+        return None
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+    return _redis_client
+
+
+def mark_redis_unavailable(exc):
+    """Skip Redis for a while after a failed command."""
+    global _unavailable_until
+    _unavailable_until = time.monotonic() + settings.REDIS_RETRY_AFTER
+    logger.warning(
+        f"Redis unavailable, retrying in {settings.REDIS_RETRY_AFTER}s: {str(exc)}"
+    )
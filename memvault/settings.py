@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -55,11 +56,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "memvault.middleware.QueryMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "memvault.middleware.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -101,6 +104,100 @@ if os.getenv("POSTGRES_DATABASE_URL"):
         default=os.getenv("POSTGRES_DATABASE_URL")
     )
 
+# Read replicas, as a comma separated list of database URLs
+# (e.g. "postgresql://...@replica1/memvault,sqlite:///replica.sqlite3")
+REPLICA_DATABASES = []
+if os.getenv("REPLICA_DATABASE_URLS"):
+    import dj_database_url
+
+    for index, url in enumerate(os.getenv("REPLICA_DATABASE_URLS").split(",")):
+        alias = f"replica_{index + 1}"
+        DATABASES[alias] = dj_database_url.parse(url.strip())
+        DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+        REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ["memvault.db_routers.PrimaryReplicaRouter"]
+
+# Safe requests to views in these modules read from a replica
+REPLICA_ROUTED_VIEW_MODULES = ["memories.views", "user.views"]
+
+# Seconds a client keeps reading from the primary after a write
+REPLICA_STICKINESS_SECONDS = int(os.getenv("REPLICA_STICKINESS_SECONDS", "5"))
+
+# Connection pooling (PostgreSQL only)
+# "psycopg" keeps a psycopg 3 pool in every process, sized per process type
+# through the environment. "pgbouncer" keeps persistent, health-checked
+# connections to a transaction-pooling PgBouncer instead. "off" opens a
+# connection per request or task.
+DATABASE_POOL_MODE = os.getenv("DATABASE_POOL_MODE", "psycopg")
+DATABASE_POOL_MIN_SIZE = int(os.getenv("DATABASE_POOL_MIN_SIZE", "1"))
+DATABASE_POOL_MAX_SIZE = int(os.getenv("DATABASE_POOL_MAX_SIZE", "4"))
+DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", "10"))
+DATABASE_POOL_MAX_IDLE = float(os.getenv("DATABASE_POOL_MAX_IDLE", "300"))
+
+# Seconds between pool stats reports, and the saturation that raises a warning
+DATABASE_POOL_STATS_INTERVAL = int(os.getenv("DATABASE_POOL_STATS_INTERVAL", "60"))
+DATABASE_POOL_SATURATION_WARNING = float(
+    os.getenv("DATABASE_POOL_SATURATION_WARNING", "0.8")
+)
+
+for database in DATABASES.values():
+    if database["ENGINE"] != "django.db.backends.postgresql":
+        continue
+    if DATABASE_POOL_MODE == "psycopg":
+        # Django requires persistent connections to be off when pooling
+        database["CONN_MAX_AGE"] = 0
+        # Django then verifies pooled connections on checkout, so ones broken
+        # by a database restart or network blip are replaced instead of
+        # failing a task
+        database["CONN_HEALTH_CHECKS"] = True
+        database.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": DATABASE_POOL_MIN_SIZE,
+            "max_size": DATABASE_POOL_MAX_SIZE,
+            "timeout": DATABASE_POOL_TIMEOUT,
+            "max_idle": DATABASE_POOL_MAX_IDLE,
+        }
+    elif DATABASE_POOL_MODE == "pgbouncer":
+        database["CONN_MAX_AGE"] = int(os.getenv("DATABASE_CONN_MAX_AGE", "60"))
+        database["CONN_HEALTH_CHECKS"] = True
+        # Server-side cursors do not survive transaction pooling
+        database["DISABLE_SERVER_SIDE_CURSORS"] = True
+
+# Per-request query metrics
+# Query count, database time and slowest statement are returned as X-DB-*
+# response headers when QUERY_METRICS_HEADERS is on (by default with DEBUG).
+# Per-view stats are logged every QUERY_METRICS_STATS_INTERVAL seconds, and
+# requests running QUERY_METRICS_WARN_QUERIES queries or more are logged.
+QUERY_METRICS_HEADERS = os.getenv("QUERY_METRICS_HEADERS", str(DEBUG)).lower() in (
+    "true",
+    "1",
+    "yes",
+    "on",
+)
+QUERY_METRICS_STATS_INTERVAL = float(os.getenv("QUERY_METRICS_STATS_INTERVAL", "60"))
+QUERY_METRICS_WARN_QUERIES = int(os.getenv("QUERY_METRICS_WARN_QUERIES", "50"))
+
+# Prometheus metrics
+# With prometheus_client installed, /metrics serves HTTP, Celery task and
+# mem0 call metrics, broker queue depths and unsynced memories. Set
+# PROMETHEUS_MULTIPROC_DIR to an empty directory per host to aggregate the
+# gunicorn and prefork worker processes. METRICS_TOKEN, when set, must be
+# sent as a bearer token. Celery workers serve their own metrics on
+# METRICS_WORKER_PORT (0 disables).
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_WORKER_PORT = int(os.getenv("METRICS_WORKER_PORT", "0"))
+
+# Cache
+# A shared cache is needed for state spanning processes, such as replica
+# stickiness; without REDIS_CACHE_URL each process uses local memory.
+if os.getenv("REDIS_CACHE_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_CACHE_URL"),
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -152,8 +249,14 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
-    ],
+        "memvault.renderers.ORJSONRenderer",
+    ]
+    + (
+        # Optional MessagePack responses via "Accept: application/msgpack"
+        ["memvault.renderers.MessagePackRenderer"]
+        if find_spec("msgpack")
+        else []
+    ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
 }
@@ -165,6 +268,238 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
+# mem0 tasks get a queue per operation, split into interactive and bulk
+# lanes, and maintenance tasks their own queue; see memvault.celery. Each
+# mem0 queue is consumed by its own worker (docker-compose.yml).
+CELERY_TASK_ROUTES = ("memvault.celery.route_task",)
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "queue_order_strategy": "priority",
+    "priority_steps": list(range(10)),
+}
+
+# Redis for coordination between processes (e.g. mem0 batching)
+REDIS_URL = os.getenv(
+    "REDIS_URL", os.getenv("REDIS_CACHE_URL", "redis://localhost:6379/1")
+)
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1"))
+# Seconds to skip Redis after a failed command
+REDIS_RETRY_AFTER = float(os.getenv("REDIS_RETRY_AFTER", "5"))
 
 # Mem0 Configuration
 MEM0_API_KEY = os.getenv("MEM0_API_KEY")
+# Base URL of the mem0 API; defaults to the mem0 platform. Point it at
+# benchmarks/fake_mem0.py to load test without a mem0 account.
+MEM0_HOST = os.getenv("MEM0_HOST") or None
+
+# Run mem0 calls on a per-process asyncio event loop with a shared
+# keep-alive connection pool. Meant for workers started with --pool=threads,
+# whose threads then wait on the loop instead of each holding a connection.
+MEM0_ASYNC_CLIENT = os.getenv("MEM0_ASYNC_CLIENT", "False").lower() in (
+    "true",
+    "1",
+    "yes",
+    "on",
+)
+MEM0_MAX_IN_FLIGHT = int(os.getenv("MEM0_MAX_IN_FLIGHT", "200"))
+MEM0_MAX_CONNECTIONS = int(os.getenv("MEM0_MAX_CONNECTIONS", "100"))
+MEM0_TIMEOUT = float(os.getenv("MEM0_TIMEOUT", "60"))
+
+# mem0 batching
+# Adds, updates and deletes are buffered in Redis per memory type and flushed
+# once a batch is full or MEM0_BATCH_WINDOW seconds after its first entry.
+# Adds run up to MEM0_BATCH_CONCURRENCY calls at a time; updates and deletes
+# use mem0's batch endpoints, which take at most 1000 memories per call.
+# A batch size of 1 disables batching.
+MEM0_BATCH_SIZE = int(os.getenv("MEM0_BATCH_SIZE", "50"))
+MEM0_BULK_BATCH_SIZE = int(os.getenv("MEM0_BULK_BATCH_SIZE", "1000"))
+MEM0_BATCH_WINDOW = float(os.getenv("MEM0_BATCH_WINDOW", "0.5"))
+MEM0_BATCH_CONCURRENCY = int(os.getenv("MEM0_BATCH_CONCURRENCY", "8"))
+# Batch flush tasks whose serialized entries reach this many bytes are sent
+# compressed with MEM0_TASK_COMPRESSION ("zlib", "gzip", "bzip2"; empty
+# disables). Other mem0 tasks carry only ids and versions.
+MEM0_TASK_COMPRESSION = os.getenv("MEM0_TASK_COMPRESSION", "zlib")
+MEM0_TASK_COMPRESSION_THRESHOLD = int(
+    os.getenv("MEM0_TASK_COMPRESSION_THRESHOLD", "4096")
+)
+
+# mem0 lanes
+# Groups of at least MEM0_BULK_LANE_THRESHOLD operations of one tenant
+# relayed together, and re-driven memories, are flushed on the bulk queues.
+MEM0_BULK_LANE_THRESHOLD = int(os.getenv("MEM0_BULK_LANE_THRESHOLD", "100"))
+
+# mem0 tenant fairness
+# Buffered operations are kept per organization and batches take up to
+# MEM0_TENANT_QUANTUM operations from each organization in turn, so one
+# organization's backlog delays another's work by at most one quantum per
+# organization with work pending.
+MEM0_TENANT_QUANTUM = int(os.getenv("MEM0_TENANT_QUANTUM", "10"))
+
+# mem0 outbox
+# Memory changes record mem0 sync events in the database; the
+# relay_mem0_outbox command publishes up to MEM0_OUTBOX_BATCH_SIZE of them at
+# a time and polls every MEM0_OUTBOX_POLL_INTERVAL seconds when idle.
+MEM0_OUTBOX_BATCH_SIZE = int(os.getenv("MEM0_OUTBOX_BATCH_SIZE", "500"))
+MEM0_OUTBOX_POLL_INTERVAL = float(os.getenv("MEM0_OUTBOX_POLL_INTERVAL", "0.2"))
+# Seconds updates wait in the outbox, so rapid edits collapse into one
+MEM0_UPDATE_DEBOUNCE = float(os.getenv("MEM0_UPDATE_DEBOUNCE", "1"))
+
+# mem0 rate limits
+# Requests per second allowed for each mem0 operation across all workers,
+# shared through token buckets in Redis (0 disables). Batch endpoint calls
+# count as one request. Up to MEM0_RATE_LIMIT_BURST seconds of quota can go
+# out at once, and tasks that would wait longer than MEM0_RATE_LIMIT_MAX_WAIT
+# seconds for quota are requeued instead of blocking a worker.
+MEM0_RATE_LIMITS = {
+    operation: float(os.getenv(f"MEM0_RATE_LIMIT_{operation.upper()}", "0"))
+    for operation in ("add", "update", "delete", "search")
+}
+MEM0_RATE_LIMIT_BURST = float(os.getenv("MEM0_RATE_LIMIT_BURST", "1"))
+MEM0_RATE_LIMIT_MAX_WAIT = float(os.getenv("MEM0_RATE_LIMIT_MAX_WAIT", "10"))
+
+# mem0 adaptive concurrency
+# When enabled, mem0 calls across all workers take leases in Redis under a
+# shared limit that starts at MEM0_CONCURRENCY_INITIAL. Each healthy call
+# raises it by 1/limit up to MEM0_CONCURRENCY_MAX. A failed call, or one
+# slower than MEM0_CONCURRENCY_LATENCY_TARGET seconds, multiplies it by
+# MEM0_CONCURRENCY_DECREASE_FACTOR, at most once per
+# MEM0_CONCURRENCY_DECREASE_COOLDOWN seconds and down to
+# MEM0_CONCURRENCY_MIN. Workers log the limit, latency and queue wait
+# percentiles every MEM0_CONCURRENCY_STATS_INTERVAL seconds.
+MEM0_ADAPTIVE_CONCURRENCY = os.getenv("MEM0_ADAPTIVE_CONCURRENCY", "False").lower() in (
+    "true",
+    "1",
+    "yes",
+    "on",
+)
+MEM0_CONCURRENCY_INITIAL = float(os.getenv("MEM0_CONCURRENCY_INITIAL", "10"))
+MEM0_CONCURRENCY_MIN = float(os.getenv("MEM0_CONCURRENCY_MIN", "1"))
+MEM0_CONCURRENCY_MAX = float(os.getenv("MEM0_CONCURRENCY_MAX", "200"))
+MEM0_CONCURRENCY_LATENCY_TARGET = float(
+    os.getenv("MEM0_CONCURRENCY_LATENCY_TARGET", "2")
+)
+MEM0_CONCURRENCY_DECREASE_FACTOR = float(
+    os.getenv("MEM0_CONCURRENCY_DECREASE_FACTOR", "0.5")
+)
+MEM0_CONCURRENCY_DECREASE_COOLDOWN = float(
+    os.getenv("MEM0_CONCURRENCY_DECREASE_COOLDOWN", "1")
+)
+# Leases of calls that never return expire after this many seconds
+MEM0_CONCURRENCY_LEASE_TIMEOUT = float(
+    os.getenv("MEM0_CONCURRENCY_LEASE_TIMEOUT", "90")
+)
+MEM0_CONCURRENCY_STATS_INTERVAL = float(
+    os.getenv("MEM0_CONCURRENCY_STATS_INTERVAL", "60")
+)
+
+# mem0 circuit breaker
+# After MEM0_CIRCUIT_FAILURE_THRESHOLD failed mem0 calls within
+# MEM0_CIRCUIT_FAILURE_WINDOW seconds, mem0 tasks are parked in Redis for
+# MEM0_CIRCUIT_RESET_TIMEOUT seconds before a single call probes mem0 again.
+MEM0_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("MEM0_CIRCUIT_FAILURE_THRESHOLD", "5"))
+MEM0_CIRCUIT_FAILURE_WINDOW = int(os.getenv("MEM0_CIRCUIT_FAILURE_WINDOW", "30"))
+MEM0_CIRCUIT_RESET_TIMEOUT = int(os.getenv("MEM0_CIRCUIT_RESET_TIMEOUT", "30"))
+# Parked tasks are released every MEM0_PARKED_DRAIN_INTERVAL seconds once mem0
+# recovers, starting at MEM0_PARKED_RAMP_START per drain and doubling up to
+# MEM0_PARKED_RAMP_MAX.
+MEM0_PARKED_DRAIN_INTERVAL = float(os.getenv("MEM0_PARKED_DRAIN_INTERVAL", "5"))
+MEM0_PARKED_RAMP_START = int(os.getenv("MEM0_PARKED_RAMP_START", "10"))
+MEM0_PARKED_RAMP_MAX = int(os.getenv("MEM0_PARKED_RAMP_MAX", "1000"))
+# Failed mem0 tasks retry after a random delay of up to
+# MEM0_RETRY_BASE_DELAY * 2^retries seconds, capped at MEM0_RETRY_MAX_DELAY.
+MEM0_RETRY_BASE_DELAY = float(os.getenv("MEM0_RETRY_BASE_DELAY", "10"))
+MEM0_RETRY_MAX_DELAY = float(os.getenv("MEM0_RETRY_MAX_DELAY", "300"))
+
+# Celery Beat Schedule
+CELERY_BEAT_SCHEDULE = {
+    "archive-old-memories": {
+        "task": "memories.tasks.archive_old_memories_task",
+        "schedule": float(os.getenv("MEMORY_ARCHIVE_INTERVAL_SECONDS", "3600")),
+    },
+    "detect-near-duplicates": {
+        "task": "memories.tasks.detect_near_duplicates_task",
+        "schedule": float(os.getenv("NEAR_DUPLICATE_INTERVAL_SECONDS", "86400")),
+    },
+    "sweep-stuck-memories": {
+        "task": "memories.tasks.sweep_stuck_memories_task",
+        "schedule": float(os.getenv("MEMORY_SWEEP_INTERVAL_SECONDS", "300")),
+    },
+    "drain-parked-mem0-tasks": {
+        "task": "memories.tasks.drain_parked_mem0_tasks_task",
+        "schedule": MEM0_PARKED_DRAIN_INTERVAL,
+    },
+}
+
+# Memory Archival (hot/cold tiering)
+# Completed memories older than this many days move to the archive table.
+# Archived memories are only served by the detail views, so they no longer
+# show up in list and search results. Organizations can override it. 0, the
+# default, disables archival, except for organizations with an override.
+MEMORY_ARCHIVE_AFTER_DAYS = int(os.getenv("MEMORY_ARCHIVE_AFTER_DAYS", "0"))
+MEMORY_ARCHIVE_BATCH_SIZE = int(os.getenv("MEMORY_ARCHIVE_BATCH_SIZE", "500"))
+MEMORY_ARCHIVE_MAX_BATCHES = int(os.getenv("MEMORY_ARCHIVE_MAX_BATCHES", "20"))
+
+# Stuck memory sweeper
+# Memories without a completed mem0 sync whose status has not changed for
+# MEMORY_SWEEP_STALE_AFTER seconds are re-enqueued through the outbox, up to
+# MEMORY_SWEEP_BATCH_SIZE * MEMORY_SWEEP_MAX_BATCHES per memory type and run.
+# Keep it above the longest retry schedule of a mem0 task.
+MEMORY_SWEEP_STALE_AFTER = int(os.getenv("MEMORY_SWEEP_STALE_AFTER", "3600"))
+MEMORY_SWEEP_BATCH_SIZE = int(os.getenv("MEMORY_SWEEP_BATCH_SIZE", "500"))
+MEMORY_SWEEP_MAX_BATCHES = int(os.getenv("MEMORY_SWEEP_MAX_BATCHES", "10"))
+
+# Write backpressure
+# Memory writes check the mem0 sync backlog of their tenant: the user for
+# user memories, the organization for team and organization memories. The
+# backlog is the tenant's memories pending or processing and the
+# MEMORY_BACKPRESSURE_AGE_PERCENTILE of their wait, measured at most once per
+# MEMORY_BACKPRESSURE_CACHE_SECONDS per process. Memories stuck past
+# MEMORY_SWEEP_STALE_AFTER or re-driven by the sweeper are not counted.
+# Past the DEFER limits writes are accepted with their mem0 syncs on the
+# bulk lane; past the REJECT limits they get a 503 with a Retry-After of
+# MEMORY_BACKPRESSURE_RETRY_AFTER seconds. Ages are in seconds and must be
+# below MEMORY_SWEEP_STALE_AFTER; 0 disables a limit.
+MEMORY_BACKPRESSURE_DEFER_DEPTH = int(
+    os.getenv("MEMORY_BACKPRESSURE_DEFER_DEPTH", "1000")
+)
+MEMORY_BACKPRESSURE_DEFER_AGE = int(os.getenv("MEMORY_BACKPRESSURE_DEFER_AGE", "300"))
+MEMORY_BACKPRESSURE_REJECT_DEPTH = int(
+    os.getenv("MEMORY_BACKPRESSURE_REJECT_DEPTH", "10000")
+)
+MEMORY_BACKPRESSURE_REJECT_AGE = int(
+    os.getenv("MEMORY_BACKPRESSURE_REJECT_AGE", "1800")
+)
+MEMORY_BACKPRESSURE_AGE_PERCENTILE = float(
+    os.getenv("MEMORY_BACKPRESSURE_AGE_PERCENTILE", "0.95")
+)
+MEMORY_BACKPRESSURE_CACHE_SECONDS = float(
+    os.getenv("MEMORY_BACKPRESSURE_CACHE_SECONDS", "1")
+)
+MEMORY_BACKPRESSURE_RETRY_AFTER = int(
+    os.getenv("MEMORY_BACKPRESSURE_RETRY_AFTER", "30")
+)
+
+# Memory content compression
+# Content of at least this many characters is stored compressed (0 disables).
+MEMORY_CONTENT_COMPRESSION_THRESHOLD = int(
+    os.getenv("MEMORY_CONTENT_COMPRESSION_THRESHOLD", "4096")
+)
+# "zlib" (stdlib) or "lz4" when the optional lz4 package is installed
+MEMORY_CONTENT_COMPRESSION_CODEC = os.getenv("MEMORY_CONTENT_COMPRESSION_CODEC", "zlib")
+# Searches match compressed content in its first this many characters only,
+# which are also kept in plain text
+MEMORY_CONTENT_SEARCH_PREFIX = int(os.getenv("MEMORY_CONTENT_SEARCH_PREFIX", "1024"))
+# Stored content decompressing to more bytes than this fails to load
+MEMORY_CONTENT_MAX_DECOMPRESSED_BYTES = int(
+    os.getenv("MEMORY_CONTENT_MAX_DECOMPRESSED_BYTES", str(16 * 1024 * 1024))
+)
+
+# Memory deduplication
+# "off", "return" (respond with the existing memory) or "link" (create a row
+# sharing the existing mem0 memory). Organizations and requests can override.
+MEMORY_DEDUP_MODE = os.getenv("MEMORY_DEDUP_MODE", "off")
+
+# Near-duplicate detection
+# Maximum SimHash Hamming distance for two memories to count as near duplicates.
+# Larger values find looser matches but make LSH buckets coarser.
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "6"))
+NEAR_DUPLICATE_BATCH_SIZE = int(os.getenv("NEAR_DUPLICATE_BATCH_SIZE", "2000"))
@@ -0,0 +1,33 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountAssertionsMixin:
+    """TestCase mixin asserting that endpoints run no per-row queries."""
+
+    def count_queries(self, path, **params):
+        """Return the queries of a GET of path, asserting it succeeds."""
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        return len(captured)
+
+    def assertQueriesIndependentOfPageSize(self, path, add_rows, sizes=(1, 5, 20)):
+        """
+        Assert that listing path runs as many queries for pages of each size.
+
+        add_rows(count) adds count rows to the listing, which is grown to
+        each size in turn, so sizes must fit on one page. A query per row,
+        as from a serializer field reading a relation, shows up as a count
+        growing with the page size.
+        """
+        counts, rows = {}, 0
+        for size in sizes:
+            add_rows(size - rows)
+            rows = size
+            counts[size] = self.count_queries(path, page_size=size)
+        self.assertEqual(
+            len(set(counts.values())),
+            1,
+            f"Queries of {path} grow with the page size: {counts}",
+        )
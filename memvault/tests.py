@@ -0,0 +1,366 @@
+import importlib
+import os
+import time
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+
+from memories import concurrency, tasks  # noqa: F401
+from memories.models import Mem0OutboxEvent, UserMemory
+from . import metrics
+from . import settings as project_settings
+from .celery import MEM0_LANES, app, route_task
+from .db_pool import get_pool_stats, report_pool_stats
+from .db_routers import PrimaryReplicaRouter, use_replicas
+from .middleware import QueryMetricsMiddleware, ReplicaRoutingMiddleware
+from .query_metrics import get_query_stats
+
+try:
+    import dj_database_url
+    import psycopg_pool
+except ImportError:  # Tests run on SQLite without the PostgreSQL drivers
+    dj_database_url = psycopg_pool = None
+
+
+def make_view(module):
+    """Build a view function that reports where memory reads are routed."""
+
+    def view(request):
+        return HttpResponse(PrimaryReplicaRouter().db_for_read(UserMemory))
+
+    view.__module__ = module
+    return view
+
+
+@override_settings(REPLICA_DATABASES=["replica_1"])
+class ReplicaRoutingTest(TestCase):
+    """Test read-replica routing and read-your-writes stickiness."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+
+    def dispatch(self, method, module="memories.views", api_key="key-1"):
+        """Run a request for a view in module through the middleware."""
+        view = make_view(module)
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        request = getattr(self.factory, method)("/", HTTP_X_API_KEY=api_key)
+        return middleware(request).content.decode()
+
+    def test_reads_default_to_primary(self):
+        """Test that reads outside a routed request use the primary."""
+        self.assertEqual(self.router.db_for_read(UserMemory), "default")
+        with use_replicas():
+            self.assertEqual(self.router.db_for_read(UserMemory), "replica_1")
+        self.assertEqual(self.router.db_for_read(UserMemory), "default")
+
+    def test_writes_always_use_primary(self):
+        """Test that writes go to the primary even when reads use replicas."""
+        with use_replicas():
+            self.assertEqual(self.router.db_for_write(UserMemory), "default")
+
+    def test_safe_requests_read_from_replica(self):
+        """Test that GETs on memory and user views read from a replica."""
+        self.assertEqual(self.dispatch("get"), "replica_1")
+        self.assertEqual(self.dispatch("get", module="user.views"), "replica_1")
+        self.assertEqual(self.dispatch("get", module="authentication.views"), "default")
+
+    def test_writes_pin_client_to_primary(self):
+        """Test that a client reads from the primary right after writing."""
+        self.assertEqual(self.dispatch("post"), "default")
+        self.assertEqual(self.dispatch("get"), "default")
+        # Other clients are not affected
+        self.assertEqual(self.dispatch("get", api_key="key-2"), "replica_1")
+
+    @override_settings(REPLICA_STICKINESS_SECONDS=0)
+    def test_pin_expires(self):
+        """Test that stickiness only lasts for the configured window."""
+        self.dispatch("post")
+        self.assertEqual(self.dispatch("get"), "replica_1")
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_no_replicas_configured(self):
+        """Test that everything uses the primary without replicas."""
+        self.assertEqual(self.dispatch("get"), "default")
+
+
+class FakePool:
+    """Stand-in for a psycopg_pool.ConnectionPool reporting fixed stats."""
+
+    def __init__(self, **stats):
+        self.stats = stats
+
+    def get_stats(self):
+        return dict(self.stats)
+
+
+class DatabasePoolStatsTest(TestCase):
+    """Test database pool stats reporting."""
+
+    def test_unpooled_database_has_no_stats(self):
+        """Test that databases without a pool report no stats."""
+        self.assertIsNone(get_pool_stats())
+
+    def test_pool_stats_derive_saturation_and_wait(self):
+        """Test that saturation and average wait are derived from the counters."""
+        pool = FakePool(
+            pool_max=4,
+            pool_size=4,
+            pool_available=1,
+            requests_queued=2,
+            requests_wait_ms=30,
+        )
+        with mock.patch.object(connections["default"], "pool", pool, create=True):
+            stats = get_pool_stats()
+
+        self.assertEqual(stats["in_use"], 3)
+        self.assertEqual(stats["saturation"], 0.75)
+        self.assertEqual(stats["avg_wait_ms"], 15)
+
+    @override_settings(DATABASE_POOL_SATURATION_WARNING=0.8)
+    def test_saturated_pool_logs_warning(self):
+        """Test that a fully checked out pool is reported as a warning."""
+        pool = FakePool(pool_max=2, pool_size=2, pool_available=0)
+        with mock.patch.object(connections["default"], "pool", pool, create=True):
+            with self.assertLogs("memvault.db_pool", level="WARNING") as logs:
+                report_pool_stats(force=True)
+
+        self.assertIn("2/2 in use", logs.output[0])
+
+    @skipUnless(psycopg_pool and dj_database_url, "PostgreSQL support is not installed")
+    def test_postgres_settings_build_a_pool(self):
+        """Test that the pooled PostgreSQL settings build a health-checked pool."""
+        env = {
+            "POSTGRES_DATABASE_URL": "postgres://memvault@localhost:5432/memvault",
+            "DATABASE_POOL_MODE": "psycopg",
+        }
+        try:
+            with mock.patch.dict(os.environ, env):
+                database = importlib.reload(project_settings).DATABASES["default"]
+        finally:
+            importlib.reload(project_settings)
+
+        # The pool is built without connecting, as Django opens it lazily
+        connection = ConnectionHandler({"default": database})["default"]
+        try:
+            pool = connection.pool
+            self.assertIsInstance(pool, psycopg_pool.ConnectionPool)
+            self.assertEqual(pool.max_size, project_settings.DATABASE_POOL_MAX_SIZE)
+            self.assertTrue(connection.settings_dict["CONN_HEALTH_CHECKS"])
+        finally:
+            connection.close_pool()
+
+
+class TaskRoutingTest(TestCase):
+    """Test routing of Celery tasks to queues."""
+
+    def route(self, name, args=(), kwargs=None):
+        return route_task(name, args, kwargs or {}, {})
+
+    def test_mem0_tasks_route_by_operation_and_lane(self):
+        """Test that each mem0 operation has an interactive and a bulk queue."""
+        self.assertEqual(
+            self.route("memories.tasks.mem0_update_task", ("user", 1, 2)),
+            {"queue": "mem0.update", "priority": 5},
+        )
+        self.assertEqual(
+            self.route(
+                "memories.tasks.mem0_delete_task", ("user", 1, "m"), {"lane": "bulk"}
+            ),
+            {"queue": "mem0.delete.bulk", "priority": 5},
+        )
+
+    def test_flushes_go_ahead_of_single_tasks(self):
+        """Test that batch flushes get the highest priority of their queue."""
+        self.assertEqual(
+            self.route(
+                "memories.tasks.mem0_flush_batch_task",
+                ("add", "team"),
+                {"lane": "bulk"},
+            ),
+            {"queue": "mem0.add.bulk", "priority": 0},
+        )
+
+    def test_tasks_route_to_the_declared_queues(self):
+        """Test that tasks are routed to every declared queue and no other."""
+        # Flushes are published for the operations of outbox events
+        flushed = [operation for operation, _ in Mem0OutboxEvent.OPERATION_CHOICES]
+        routed = set()
+        for name in app.tasks:
+            if name.startswith("celery."):
+                continue
+            for lane in MEM0_LANES:
+                operations = flushed if name.endswith("flush_batch_task") else [None]
+                for operation in operations:
+                    route = self.route(name, (operation, "user"), {"lane": lane})
+                    routed.add(route["queue"] if route else app.conf.task_default_queue)
+
+        self.assertEqual(routed, {queue.name for queue in app.conf.task_queues})
+
+    def test_maintenance_and_other_tasks(self):
+        """Test that periodic tasks are kept off the mem0 queues."""
+        self.assertEqual(
+            self.route("memories.tasks.sweep_stuck_memories_task"),
+            {"queue": "maintenance"},
+        )
+        self.assertIsNone(self.route("memvault.celery.debug_task"))
+
+
+class QueryMetricsTest(TestCase):
+    """Test per-request query metrics."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.factory = RequestFactory()
+
+    def dispatch(self, queries):
+        """Run a request running queries memory counts through the middleware."""
+
+        def get_response(request):
+            for _ in range(queries):
+                UserMemory.objects.count()
+            return HttpResponse()
+
+        request = self.factory.get("/")
+        request.resolver_match = mock.Mock(view_name="query-metrics-test")
+        return QueryMetricsMiddleware(get_response)(request)
+
+    @override_settings(QUERY_METRICS_HEADERS=True)
+    def test_headers_report_queries_and_slowest_statement(self):
+        """Test that query count, time and the slowest statement are returned."""
+        response = self.dispatch(3)
+
+        self.assertEqual(response["X-DB-Queries"], "3")
+        self.assertGreaterEqual(float(response["X-DB-Time-Ms"]), 0)
+        self.assertIn("memories_usermemory", response["X-DB-Slowest-Query"])
+
+    @override_settings(QUERY_METRICS_HEADERS=False, QUERY_METRICS_WARN_QUERIES=5)
+    def test_production_records_stats_and_warns(self):
+        """Test that without headers requests feed the stats and log warnings."""
+        self.dispatch(1)
+        with self.assertLogs("memvault.query_metrics", level="WARNING") as logs:
+            response = self.dispatch(5)
+
+        self.assertNotIn("X-DB-Queries", response)
+        self.assertIn("query-metrics-test ran 5 queries", logs.output[0])
+        stats = get_query_stats()["query-metrics-test"]
+        self.assertGreaterEqual(stats["requests"], 2)
+        self.assertEqual(stats["queries_max"], 5)
+
+
+class MetricsTest(TestCase):
+    """Test the Prometheus metrics of requests, tasks and mem0 calls."""
+
+    def test_requests_are_labeled_by_view_and_scope(self):
+        """Test that requests are recorded with their view and memory scope."""
+        user = get_user_model().objects.create_user(username="user1")
+        with mock.patch.object(metrics, "observe_request") as observe_request:
+            self.client.get(
+                "/api/memories/users/me/", HTTP_X_API_KEY=user.api_keys.primary_key
+            )
+
+        view, scope, method, status, duration, recorder = observe_request.call_args[0]
+        self.assertEqual((scope, method, status), ("user", "GET", 200))
+        self.assertIn("user", view)
+        self.assertGreater(recorder.count, 0)
+
+    def test_mem0_calls_are_recorded_by_operation(self):
+        """Test that mem0 calls are recorded with their operation and outcome."""
+        with mock.patch.object(metrics, "observe_mem0_call") as observe_mem0_call:
+            with concurrency.call_slot("batch_update"):
+                pass
+            with self.assertRaises(ValueError), concurrency.call_slot("delete"):
+                raise ValueError
+
+        calls = [call[0] for call in observe_mem0_call.call_args_list]
+        self.assertEqual(calls[0][0], "batch_update")
+        self.assertFalse(calls[0][2])
+        self.assertEqual(calls[1][0], "delete")
+        self.assertTrue(calls[1][2])
+
+    def test_mem0_slot_waits_are_recorded_by_operation(self):
+        """Test that the wait for a concurrency slot is recorded per operation."""
+
+        def acquire_lease():
+            time.sleep(0.01)
+            return None
+
+        with mock.patch.object(
+            metrics, "observe_mem0_slot_wait"
+        ) as observe_mem0_slot_wait, mock.patch.object(
+            concurrency, "acquire_lease", acquire_lease
+        ):
+            with concurrency.call_slot("add"):
+                pass
+
+        operation, wait = observe_mem0_slot_wait.call_args[0]
+        self.assertEqual(operation, "add")
+        self.assertGreaterEqual(wait, 0.01)
+
+    def test_published_tasks_are_stamped(self):
+        """Test that task messages carry their publish time for the queue lag."""
+        headers = {}
+        metrics.stamp_published_at(headers=headers)
+        self.assertIn(metrics.PUBLISHED_AT_HEADER, headers)
+
+    @skipUnless(metrics.prometheus_client, "prometheus_client is not installed")
+    def test_metrics_endpoint_serves_metrics(self):
+        """Test that /metrics serves the request, mem0 and backlog metrics."""
+        UserMemory.objects.create(
+            user=get_user_model().objects.create_user(username="user1"),
+            content="Pending memory",
+        )
+        with concurrency.call_slot("add"):
+            pass
+        with mock.patch.object(metrics, "get_queue_depths", return_value={"q": 3}):
+            response = self.client.get("/metrics")
+
+        body = response.content.decode()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('memvault_broker_queue_depth{queue="q"} 3.0', body)
+        self.assertIn('memvault_mem0_calls_total{operation="add",outcome="ok"}', body)
+        self.assertIn('memvault_mem0_slot_wait_seconds_count{operation="add"}', body)
+        self.assertIn('memvault_memories_unsynced{memory_type="user"', body)
+
+    @skipUnless(metrics.prometheus_client, "prometheus_client is not installed")
+    def test_pool_gauges_follow_pool_stats(self):
+        """Test that the database pool stats are exported as gauges."""
+        pool = FakePool(
+            pool_max=4,
+            pool_size=4,
+            pool_available=1,
+            requests_queued=2,
+            requests_wait_ms=30,
+        )
+        with mock.patch.object(connections["default"], "pool", pool, create=True):
+            with mock.patch.object(metrics, "get_queue_depths", return_value={}):
+                body = self.client.get("/metrics").content.decode()
+
+        self.assertIn(
+            'memvault_db_pool_connections_in_use{database="default"} 3.0', body
+        )
+        self.assertIn('memvault_db_pool_saturation{database="default"} 0.75', body)
+        self.assertIn(
+            'memvault_db_pool_wait_avg_seconds{database="default"} 0.015', body
+        )
+
+    @skipUnless(metrics.prometheus_client, "prometheus_client is not installed")
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_endpoint_requires_token(self):
+        """Test that a configured token is required to read the metrics."""
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        with mock.patch.object(metrics, "get_queue_depths", return_value={}):
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
@@ -20,6 +20,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics_view, prometheus_client
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/auth/", include("authentication.urls")),
@@ -27,6 +29,9 @@ urlpatterns = [
     path("api/memories/", include("memories.urls")),
 ]
 
+if prometheus_client is not None:
+    urlpatterns.append(path("metrics", metrics_view, name="metrics"))
+
 # Serve static files during development
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
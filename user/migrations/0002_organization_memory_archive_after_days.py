@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organization",
+            name="memory_archive_after_days",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Archive completed memories older than this many days (falls back to MEMORY_ARCHIVE_AFTER_DAYS, 0 disables archival)",
+                null=True,
+            ),
+        ),
+    ]
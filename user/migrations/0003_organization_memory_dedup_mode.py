@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0002_organization_memory_archive_after_days"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organization",
+            name="memory_dedup_mode",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("", "Default"),
+                    ("off", "Off"),
+                    ("return", "Return existing memory"),
+                    ("link", "Link to existing memory"),
+                ],
+                help_text="How duplicate memories are handled (falls back to MEMORY_DEDUP_MODE)",
+                max_length=10,
+            ),
+        ),
+    ]
@@ -22,6 +22,13 @@ class User(AbstractUser):
 class Organization(models.Model):
     """Organization model that can nest and contain teams."""
 
+    DEDUP_MODE_CHOICES = [
+        ("", "Default"),
+        ("off", "Off"),
+        ("return", "Return existing memory"),
+        ("link", "Link to existing memory"),
+    ]
+
     id = models.BigAutoField(primary_key=True)
     name = models.CharField(max_length=255)
     admin = models.ForeignKey(
@@ -30,6 +37,19 @@ class Organization(models.Model):
         related_name="administered_orgs",
         help_text="Admin user who can manage this organization and its teams",
     )
+    memory_archive_after_days = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Archive completed memories older than this many days "
+        "(falls back to MEMORY_ARCHIVE_AFTER_DAYS, 0 disables archival)",
+    )
+    memory_dedup_mode = models.CharField(
+        max_length=10,
+        choices=DEDUP_MODE_CHOICES,
+        blank=True,
+        help_text="How duplicate memories are handled "
+        "(falls back to MEMORY_DEDUP_MODE)",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
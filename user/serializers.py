@@ -44,8 +44,8 @@ class TeamSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "organization", "created_at", "updated_at"]
 
     def get_member_count(self, obj):
-        """Get the number of members in the team."""
-        return obj.members.count()
+        """Get the number of members in the team, from prefetched members if any."""
+        return len(obj.teammembership_set.all())
 
 
 class TeamMembershipCreateSerializer(serializers.Serializer):
@@ -102,5 +102,7 @@ class OrganizationSerializer(serializers.ModelSerializer):
         return value.strip()
 
     def get_team_count(self, obj):
-        """Get the number of teams in the organization."""
+        """Get the number of teams in the organization, annotated on lists."""
+        if hasattr(obj, "team_count"):
+            return obj.team_count
         return obj.teams.count()
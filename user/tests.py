@@ -1,3 +1,76 @@
-from django.test import TestCase
+from itertools import count
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+
+from memvault.testing import QueryCountAssertionsMixin
+from .models import Organization, Team, TeamMembership
+
+User = get_user_model()
+
+
+class UserEndpointQueryCountTest(QueryCountAssertionsMixin, APITestCase):
+    """Test that organization and team endpoints run no per-row queries."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.admin = User.objects.create_user(username="admin")
+        self.organization = Organization.objects.create(name="Acme", admin=self.admin)
+        self.client.force_authenticate(user=self.admin)
+        self.names = count()
+
+    def add_teams(self, number, organization=None):
+        """Add teams, each with two members."""
+        for _ in range(number):
+            index = next(self.names)
+            team = Team.objects.create(
+                name=f"Team {index}", organization=organization or self.organization
+            )
+            for member in range(2):
+                user = User.objects.create_user(username=f"member-{index}-{member}")
+                TeamMembership.objects.create(team=team, user=user)
+
+    def add_organizations(self, number):
+        """Add organizations administered by the admin, each with a team."""
+        for _ in range(number):
+            organization = Organization.objects.create(
+                name=f"Organization {next(self.names)}", admin=self.admin
+            )
+            self.add_teams(1, organization)
+
+    def test_team_list_queries_are_independent_of_page_size(self):
+        """Test that listing teams prefetches their members."""
+        path = f"/api/user/organizations/{self.organization.id}/teams/"
+        self.assertQueriesIndependentOfPageSize(path, self.add_teams)
+
+        response = self.client.get(path)
+        team = response.data["results"][0]
+        self.assertEqual(team["member_count"], 2)
+        self.assertEqual(len(team["members"]), 2)
+
+    def test_organization_list_queries_are_independent_of_page_size(self):
+        """Test that listing organizations annotates their team counts."""
+        path = "/api/user/organizations/"
+        self.assertQueriesIndependentOfPageSize(path, self.add_organizations)
+
+        response = self.client.get(path)
+        team_counts = {
+            organization["name"]: organization["team_count"]
+            for organization in response.data["results"]
+        }
+        self.assertEqual(team_counts["Acme"], 0)
+        self.assertEqual(team_counts["Organization 0"], 1)
+
+    def test_team_detail_and_update_include_members(self):
+        """Test that team details read prefetched members, also after updates."""
+        self.add_teams(1)
+        team = Team.objects.get()
+        path = f"/api/user/organizations/{self.organization.id}/teams/{team.id}/"
+
+        response = self.client.get(path)
+        self.assertEqual(response.data["member_count"], 2)
+
+        response = self.client.patch(path, {"description": "Platform"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["description"], "Platform")
+        self.assertEqual(response.data["member_count"], 2)
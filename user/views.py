@@ -5,6 +5,7 @@ from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.db.models import Count, Prefetch
 
 from authentication.authentication import APIKeyAuthentication
 from .models import Organization, Team, TeamMembership
@@ -19,6 +20,20 @@ from .permissions import IsOrgAdminPermission, IsOrgAdminMixin
 User = get_user_model()
 
 
+def get_teams(organization):
+    """Return the teams of an organization with the rows TeamSerializer reads."""
+    return (
+        Team.objects.filter(organization=organization)
+        .select_related("organization")
+        .prefetch_related(
+            Prefetch(
+                "teammembership_set",
+                queryset=TeamMembership.objects.select_related("user"),
+            )
+        )
+    )
+
+
 class TeamPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = "page_size"
@@ -36,7 +51,11 @@ class UserOrganizationsListView(generics.ListAPIView):
 
     def get_queryset(self):
         """Return organizations that the user can manage."""
-        return Organization.get_orgs_administered_by_user(self.request.user)
+        return (
+            Organization.get_orgs_administered_by_user(self.request.user)
+            .select_related("admin")
+            .annotate(team_count=Count("teams"))
+        )
 
 
 class OrganizationCreateView(generics.CreateAPIView):
@@ -66,7 +85,7 @@ class TeamListCreateView(generics.ListCreateAPIView, IsOrgAdminMixin):
     def get_queryset(self):
         """Return teams for the specified organization."""
         organization = self.get_organization()
-        return Team.objects.filter(organization=organization).order_by("-created_at")
+        return get_teams(organization).order_by("-created_at")
 
     def perform_create(self, serializer):
         """Create a team in the specified organization."""
@@ -93,13 +112,12 @@ class TeamDetailView(generics.RetrieveUpdateDestroyAPIView, IsOrgAdminMixin):
     def get_queryset(self):
         """Return teams for the specified organization."""
         organization = self.get_organization()
-        return Team.objects.filter(organization=organization)
+        return get_teams(organization)
 
     def get_object(self):
         """Get the team object ensuring it belongs to the organization."""
-        organization = self.get_organization()
         team_id = self.kwargs.get("team_id")
-        return get_object_or_404(Team, id=team_id, organization=organization)
+        return get_object_or_404(self.get_queryset(), id=team_id)
 
     def perform_update(self, serializer):
         """Update team ensuring organization cannot be changed."""